@@ -1,5 +1,6 @@
 # Gunicorn configuration file
 import multiprocessing
+import os
 
 max_requests = 1000
 max_requests_jitter = 50
@@ -9,4 +10,16 @@ log_file = "-"
 bind = "0.0.0.0:8000"
 
 worker_class = "uvicorn.workers.UvicornWorker"
-workers = (multiprocessing.cpu_count() * 2) + 1
\ No newline at end of file
+workers = (multiprocessing.cpu_count() * 2) + 1
+
+# Cargar la app en el master antes de hacer fork: los workers heredan los módulos
+# importados y los agentes compilados, y arrancan mucho más rápido
+preload_app = os.getenv("GUNICORN_PRELOAD", "false").lower() in ("1", "true", "yes")
+
+
+def on_starting(server):
+    """Precalienta los agentes en el master cuando la app se carga antes del fork."""
+    if preload_app:
+        from react_agent.graph import warm_up
+
+        warm_up()
@@ -4,6 +4,15 @@ This module defines a custom reasoning and action agent graph.
 It invokes tools in a simple loop.
 """
 
-from react_agent.graph import question_agent
+from typing import Any
 
 __all__ = ["question_agent"]
+
+
+def __getattr__(name: str) -> Any:
+    # El grafo se importa y compila al pedirlo, no al importar el paquete
+    if name == "question_agent":
+        from react_agent.graph import get_agent
+
+        return get_agent(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
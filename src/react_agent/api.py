@@ -1,12 +1,67 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel, Field
-from react_agent.graph import question_agent, topics_agent, feedback_agent, content_agent
-from react_agent.state import QuestionState, TopicsState, FeedbackState, GenerateTopicsState
+from react_agent.graph import get_agent, get_topics_agent_with_memory, get_content_agent_with_checkpoints
+from react_agent.memory import conversation_config
+from react_agent.state import QuestionState, BulkQuestionState, TopicsState, FeedbackState, GenerateTopicsState
+from react_agent.clients import close_clients
+from react_agent.configuration import Config
+from react_agent.jobs import JobManager, JobStore, public_job
+from react_agent.instrumentation import HTTP_REQUEST_DURATION, metrics_payload, span
+from react_agent import prompt_registry
+from react_agent.streaming import stream_agent
+from contextlib import asynccontextmanager
+import asyncio
 import logging
 from typing import List, Dict, Any
+import time
 import traceback
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Arranca los workers de trabajos y cierra los clientes compartidos al apagar el worker."""
+    # Sin preload_app los prompts no se tokenizaron en el master de gunicorn
+    await asyncio.to_thread(prompt_registry.warm_up)
+    store = JobStore(Config.JOBS_DB_PATH)
+    app.state.topics_jobs = JobManager(
+        store,
+        "generate_topics",
+        run_topics_job,
+        workers=Config.JOBS_WORKERS,
+        max_per_tenant=Config.JOBS_MAX_PER_TENANT,
+    )
+    app.state.topics_jobs.start()
+    yield
+    await app.state.topics_jobs.stop()
+    store.close()
+    await close_clients()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.middleware("http")
+async def instrument_request(request: Request, call_next):
+    """Mide cada petición y abre su span raíz, del que cuelgan los spans de los nodos."""
+    start = time.perf_counter()
+    status = 500
+    with span(f"{request.method} {request.url.path}", method=request.method, path=request.url.path):
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            # Se etiqueta con la plantilla de la ruta para no disparar la cardinalidad con los ids
+            route = getattr(request.scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_DURATION.labels(request.method, route, str(status)).observe(time.perf_counter() - start)
+
+
+@app.get("/metrics")
+async def metrics():
+    """Métricas de latencia, tokens, coste y reintentos en formato Prometheus."""
+    payload, content_type = metrics_payload()
+    return Response(content=payload, media_type=content_type)
 
 # Definir el modelo Pydantic para el request
 class QuestionRequest(BaseModel):
@@ -14,16 +69,28 @@ class QuestionRequest(BaseModel):
     training_id: str
     topic_id: str
 
+class BulkQuestionRequest(BaseModel):
+    """Temas para la generación masiva de preguntas."""
+
+    items: List[QuestionRequest] = Field(..., description="Temas para los que se generarán preguntas")
+
 class ChatRequest(BaseModel):
     topic: str = Field(..., description="El tema sobre el que se pregunta")
     question: str | None = Field(None, description="La pregunta opcional dentro del tema")
     id_user: str
+    document_id: str | None = Field(None, description="Documento de la formación en el que buscar el contexto")
 
 class TopicsRequest(BaseModel):
     training_name: str
     description: str
     url: str
 
+class TopicsJobRequest(TopicsRequest):
+    """Generación de topics en segundo plano, limitada por tenant."""
+
+    tenant_id: str = Field("default", description="Tenant al que se limita la concurrencia de trabajos")
+    callback_url: str | None = Field(None, description="URL a la que se notificará el resultado")
+
 class FeedbackRequest(BaseModel):
     cuestionario: Dict[str, Any]
 
@@ -50,7 +117,7 @@ async def generate_questions(request: QuestionRequest):
     )
 
     # Ejecutar el agente y obtener el estado final
-    final_state = await question_agent.ainvoke(initial_state)
+    final_state = await get_agent("question_agent").ainvoke(initial_state)
 
     # Retornar las preguntas generadas
     return {
@@ -59,26 +126,56 @@ async def generate_questions(request: QuestionRequest):
     }
 
 
-@app.post("/chat")
-async def chat(request: ChatRequest):
-    """
-    Maneja la interacción con el usuario:
-    - Si solo se envía `topic`, devuelve la explicación del tema.
-    - Si se envía `topic` y `question`, responde en el contexto del tema.
+@app.post("/generate_questions/bulk")
+async def generate_questions_bulk(request: BulkQuestionRequest):
+    """Genera y guarda preguntas para muchos temas a la vez.
+
+    Returns:
+        status: saved, partial o error
+        results: estado de cada tema en el mismo orden de la petición
     """
-    initial_state = TopicsState(
+    initial_state = BulkQuestionState(
+        items=[item.model_dump() for item in request.items],
+        questions=[],
+        results=[],
+        status="start",
+    )
+
+    final_state = await get_agent("bulk_question_agent").ainvoke(initial_state)
+
+    return {
+        "status": final_state["status"],
+        "results": final_state["results"]
+    }
+
+
+def chat_initial_state(request: ChatRequest) -> TopicsState:
+    """Estado inicial del chat; el historial (messages) lo recupera el checkpointer de la conversación."""
+    return TopicsState(
         topic=request.topic,
         status="chatbot" if request.question else "initialize",
         response="",
         question=request.question if request.question else None,
         id_user=request.id_user,
-        messages=[]  # Inicializamos messages como una lista vacía si no existe
+        document_id=request.document_id,
     )
 
+
+@app.post("/chat")
+async def chat(request: ChatRequest):
+    """
+    Maneja la interacción con el usuario:
+    - Si solo se envía `topic`, devuelve la explicación del tema.
+    - Si se envía `topic` y `question`, responde en el contexto del tema.
+    """
+    initial_state = chat_initial_state(request)
+
     logging.info(f"Procesando request: {initial_state}")
     print(f"Procesando request: {initial_state}")
 
-    final_state = await topics_agent.ainvoke(initial_state)
+    final_state = await get_topics_agent_with_memory().ainvoke(
+        initial_state, conversation_config(request.id_user, request.topic)
+    )
     return {
         "topic": request.topic,
         "question": request.question,
@@ -86,6 +183,27 @@ async def chat(request: ChatRequest):
     }
 
 
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Igual que `/chat`, pero emite la respuesta token a token como Server-Sent Events.
+
+    Eventos: `token` con cada fragmento generado y `end` con la respuesta completa
+    una vez guardado el estado de la conversación.
+    """
+    initial_state = chat_initial_state(request)
+    events = stream_agent(
+        get_topics_agent_with_memory(),
+        initial_state,
+        lambda final_state: {
+            "topic": request.topic,
+            "question": request.question,
+            "response": final_state["response"],
+        },
+        conversation_config(request.id_user, request.topic),
+    )
+    return StreamingResponse(events, media_type="text/event-stream")
+
+
 @app.post("/generate_topics")
 async def generate_topics(request: TopicsRequest):
     """
@@ -103,10 +221,11 @@ async def generate_topics(request: TopicsRequest):
         )
         
         # Invocación del agente de contenido
-        final_state = await content_agent.ainvoke(initial_state)
+        final_state = await get_agent("content_agent").ainvoke(initial_state)
 
         return {
-            "topics_json": final_state["topics_json"]
+            "topics_json": final_state["topics_json"],
+            "document_id": final_state.get("document_id"),
         }
 
     except Exception as e:
@@ -114,6 +233,46 @@ async def generate_topics(request: TopicsRequest):
         logging.error(f"Ocurrió un error inesperado: {e}\nTraceback: {error_trace}")
         raise HTTPException(status_code=500, detail=f"Error interno del servidor: {str(e)}")
 
+async def run_topics_job(job_id: str, job_input: Dict[str, Any]) -> Dict[str, Any]:
+    """Ejecuta el agente de contenido para un trabajo, reanudándolo desde su último checkpoint."""
+    agent = get_content_agent_with_checkpoints()
+    config = {"configurable": {"thread_id": job_id}}
+    snapshot = await agent.aget_state(config)
+    if snapshot.next:
+        # Un worker anterior se detuvo a mitad del grafo: continuar desde el último nodo completado
+        final_state = await agent.ainvoke(None, config)
+    elif snapshot.values:
+        final_state = snapshot.values
+    else:
+        initial_state = GenerateTopicsState(
+            training_name=job_input["training_name"],
+            description=job_input["description"],
+            url=job_input["url"],
+            status="start",
+            topics_list=[],
+            topics_json=[]
+        )
+        final_state = await agent.ainvoke(initial_state, config)
+    return {
+        "topics_json": final_state["topics_json"],
+        "document_id": final_state.get("document_id"),
+    }
+
+@app.post("/generate_topics/jobs", status_code=202)
+async def submit_topics_job(request: TopicsJobRequest):
+    """Encola la generación de topics y devuelve el id del trabajo para consultar su estado."""
+    job_input = request.model_dump(include={"training_name", "description", "url"})
+    job_id = await app.state.topics_jobs.submit(request.tenant_id, job_input, request.callback_url)
+    return {"job_id": job_id, "status": "queued"}
+
+@app.get("/generate_topics/jobs/{job_id}")
+async def get_topics_job(job_id: str):
+    """Devuelve el estado del trabajo y, cuando ha terminado, su resultado o error."""
+    job = await app.state.topics_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return public_job(job)
+
 @app.post("/generate_feedback")
 async def generate_feedback(cuestionarioData: Dict):
     """
@@ -124,8 +283,22 @@ async def generate_feedback(cuestionarioData: Dict):
         status="start"
     )
 
-    final_state = await feedback_agent.ainvoke(initial_state)
+    final_state = await get_agent("feedback_agent").ainvoke(initial_state)
     return {
         "feedback": final_state["feedback"]
     }
 
+
+@app.post("/generate_feedback/stream")
+async def generate_feedback_stream(cuestionarioData: Dict):
+    """Igual que `/generate_feedback`, pero emite el feedback token a token como Server-Sent Events."""
+    initial_state = FeedbackState(
+        cuestionario=cuestionarioData,
+        status="start"
+    )
+    events = stream_agent(
+        get_agent("feedback_agent"),
+        initial_state,
+        lambda final_state: {"feedback": final_state["feedback"]},
+    )
+    return StreamingResponse(events, media_type="text/event-stream")
@@ -0,0 +1,19 @@
+"""Azure OpenAI chat model used by the agents.
+
+Kept apart from `clients` so that importing the client registry does not pull
+in `langchain_openai` and the OpenAI SDK; `get_chat_model` imports this module
+the first time a worker needs the model.
+"""
+
+from langchain_openai import AzureChatOpenAI
+
+from react_agent.clients import get_rate_limiter
+from react_agent.coalescing import SingleFlightChatModel
+from react_agent.rate_limiter import RateLimitedChatModel, SharedTokenBuckets
+
+
+class AzureChatModel(SingleFlightChatModel, RateLimitedChatModel, AzureChatOpenAI):
+    """`AzureChatOpenAI` que agrupa las llamadas idénticas en vuelo y respeta la cuota compartida del deployment."""
+
+    def _rate_limiter(self) -> SharedTokenBuckets:
+        return get_rate_limiter()
@@ -0,0 +1,345 @@
+"""Process-wide registry of pooled clients shared by the graph nodes."""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import inspect
+import logging
+import os
+import threading
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+import httpx
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from react_agent.configuration import Config
+from react_agent.embedding_cache import with_embedding_cache
+from react_agent.instrumentation import metrics_callback
+from react_agent.local_vector_store import LocalVectorStore
+from react_agent.rate_limiter import SharedTokenBuckets
+
+if TYPE_CHECKING:
+    # Los SDK de Azure y langchain_openai se importan en las factorías, en el primer uso
+    from azure.cosmos import ContainerProxy
+    from azure.cosmos.aio import ContainerProxy as AsyncContainerProxy
+    from langchain_community.vectorstores import AzureSearch
+    from langchain_openai import AzureChatOpenAI
+
+Closer = Callable[[], Union[None, Awaitable[None]]]
+
+ClientT = TypeVar("ClientT")
+
+
+def config_fingerprint(*values: Any) -> str:
+    """Calcula una huella de los valores de configuración usados por un cliente."""
+    return hashlib.sha256(repr(values).encode("utf-8")).hexdigest()
+
+
+def _http_limits() -> httpx.Limits:
+    """Límites del pool de conexiones keep-alive."""
+    return httpx.Limits(
+        max_connections=Config.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=Config.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=Config.HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+def _http_clients() -> Tuple[httpx.Client, httpx.AsyncClient, List[Closer]]:
+    """Crea un par de clientes httpx (sync y async) con pool de conexiones."""
+    sync_client = httpx.Client(limits=_http_limits(), timeout=Config.HTTP_TIMEOUT)
+    async_client = httpx.AsyncClient(limits=_http_limits(), timeout=Config.HTTP_TIMEOUT)
+    return sync_client, async_client, [sync_client.close, async_client.aclose]
+
+
+def _run_closer(name: str, closer: Closer) -> None:
+    """Ejecuta un cierre fuera de un contexto async, planificándolo si hay un loop activo."""
+    try:
+        result = closer()
+        if inspect.isawaitable(result):
+            try:
+                asyncio.get_running_loop().create_task(result)  # type: ignore[arg-type]
+            except RuntimeError:
+                asyncio.run(result)  # type: ignore[arg-type]
+    except Exception as e:
+        logging.warning(f"Error al cerrar el cliente {name}: {e}")
+
+
+class ClientRegistry:
+    """Registro perezoso de clientes compartidos dentro de un proceso worker.
+
+    Cada cliente se crea en su primer uso y se reutiliza mientras no cambie la
+    configuración con la que se creó; si cambia, se cierra y se vuelve a crear.
+    """
+
+    def __init__(self) -> None:
+        """Crea un registro vacío."""
+        self._lock = threading.RLock()
+        # nombre -> (huella de configuración, cliente, funciones de cierre)
+        self._entries: Dict[str, Tuple[str, Any, List[Closer]]] = {}
+
+    def get(self, name: str, fingerprint: str, factory: Callable[[], Tuple[ClientT, List[Closer]]]) -> ClientT:
+        """Devuelve el cliente `name`, creándolo o refrescándolo si es necesario."""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry[0] == fingerprint:
+                # Cada nombre se registra siempre con la factoría del mismo tipo
+                client: ClientT = entry[1]
+                return client
+            if entry is not None:
+                logging.info(f"Configuración modificada, recreando el cliente {name}")
+                for closer in entry[2]:
+                    _run_closer(name, closer)
+            client, closers = factory()
+            self._entries[name] = (fingerprint, client, closers)
+            return client
+
+    def discard(self, name: str, client: Any) -> None:
+        """Cierra y descarta `name` si sigue siendo `client` (el siguiente uso lo recrea)."""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or entry[1] is not client:
+                return
+            del self._entries[name]
+        for closer in entry[2]:
+            _run_closer(name, closer)
+
+    def clear(self) -> None:
+        """Cierra y descarta todos los clientes (los siguientes usos los recrean)."""
+        with self._lock:
+            entries, self._entries = self._entries, {}
+        for name, (_, _, closers) in entries.items():
+            for closer in closers:
+                _run_closer(name, closer)
+
+    async def aclose(self) -> None:
+        """Cierra todos los clientes desde un contexto async (apagado de la app)."""
+        with self._lock:
+            entries, self._entries = self._entries, {}
+        for name, (_, _, closers) in entries.items():
+            for closer in closers:
+                try:
+                    result = closer()
+                    if inspect.isawaitable(result):
+                        await result
+                except Exception as e:
+                    logging.warning(f"Error al cerrar el cliente {name}: {e}")
+        logging.info("Clientes compartidos cerrados")
+
+    def forget(self) -> None:
+        """Descarta los clientes sin cerrarlos, con un lock nuevo.
+
+        Se usa en el hijo tras un fork: los sockets, ficheros y locks heredados
+        pertenecen al proceso padre y cerrarlos desde aquí afectaría también a él.
+        """
+        self._lock = threading.RLock()
+        self._entries = {}
+
+
+registry = ClientRegistry()
+
+# Los workers de gunicorn con preload_app nacen de un fork del master: cada uno crea sus propios clientes
+os.register_at_fork(after_in_child=registry.forget)
+
+
+def get_rate_limiter() -> SharedTokenBuckets:
+    """Buckets de peticiones y tokens por minuto del deployment, compartidos entre workers."""
+    fingerprint = config_fingerprint(
+        Config.LLM_RATE_LIMIT_STATE_PATH,
+        Config.LLM_RATE_LIMIT_RPM,
+        Config.LLM_RATE_LIMIT_TPM,
+    )
+
+    def factory() -> Tuple[SharedTokenBuckets, List[Closer]]:
+        buckets = SharedTokenBuckets(
+            Config.LLM_RATE_LIMIT_STATE_PATH, Config.LLM_RATE_LIMIT_RPM, Config.LLM_RATE_LIMIT_TPM
+        )
+        return buckets, [buckets.close]
+
+    return registry.get("rate_limiter", fingerprint, factory)
+
+
+def get_chat_model() -> AzureChatOpenAI:
+    """Modelo de chat de Azure OpenAI compartido por el proceso."""
+    fingerprint = config_fingerprint(
+        Config.AZURE_OPENAI_ENDPOINT,
+        Config.AZURE_DEPLOYMENT_NAME,
+        Config.AZURE_OPENAI_API_VERSION,
+        Config.AZURE_OPENAI_API_KEY,
+        Config.HTTP_MAX_CONNECTIONS,
+        Config.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        Config.HTTP_KEEPALIVE_EXPIRY,
+        Config.HTTP_TIMEOUT,
+    )
+
+    def factory() -> Tuple[AzureChatOpenAI, List[Closer]]:
+        from react_agent.chat_model import AzureChatModel
+
+        http_client, http_async_client, closers = _http_clients()
+        # Las peticiones idénticas simultáneas comparten una sola llamada (LLM_COALESCING)
+        # y todas pasan por los buckets compartidos, que gestionan también los reintentos por 429
+        model = AzureChatModel(
+            azure_endpoint=Config.AZURE_OPENAI_ENDPOINT,
+            azure_deployment=Config.AZURE_DEPLOYMENT_NAME,
+            api_version=Config.AZURE_OPENAI_API_VERSION,
+            api_key=Config.AZURE_OPENAI_API_KEY,
+            temperature=0.7,
+            http_client=http_client,
+            http_async_client=http_async_client,
+            max_retries=0,
+            # Latencia, tokens y coste de cada llamada, etiquetados con el nodo que la hace
+            callbacks=[metrics_callback],
+        )
+        return model, closers
+
+    return registry.get("chat_model", fingerprint, factory)
+
+
+def get_embeddings() -> Embeddings:
+    """Modelo de embeddings de Azure OpenAI (con caché local) compartido por el proceso."""
+    fingerprint = config_fingerprint(
+        Config.AZURE_TEXT_EMBEDDING_ENDPOINT,
+        Config.AZURE_TEXT_EMBEDDING_DEPLOYMENT,
+        Config.AZURE_TEXT_EMBEDDING_API_VERSION,
+        Config.AZURE_TEXT_EMBEDDING_API_KEY,
+        Config.HTTP_MAX_CONNECTIONS,
+        Config.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        Config.HTTP_KEEPALIVE_EXPIRY,
+        Config.HTTP_TIMEOUT,
+        Config.EMBEDDING_CACHE_PATH,
+        Config.EMBEDDING_CACHE_MAX_ENTRIES,
+        Config.EMBEDDING_BATCH_SIZE,
+    )
+
+    def factory() -> Tuple[Embeddings, List[Closer]]:
+        from langchain_openai import AzureOpenAIEmbeddings
+
+        http_client, http_async_client, closers = _http_clients()
+        embeddings = AzureOpenAIEmbeddings(
+            azure_endpoint=Config.AZURE_TEXT_EMBEDDING_ENDPOINT,
+            azure_deployment=Config.AZURE_TEXT_EMBEDDING_DEPLOYMENT,
+            api_version=Config.AZURE_TEXT_EMBEDDING_API_VERSION,
+            api_key=Config.AZURE_TEXT_EMBEDDING_API_KEY,
+            chunk_size=Config.EMBEDDING_BATCH_SIZE,
+            http_client=http_client,
+            http_async_client=http_async_client,
+        )
+        cached, store = with_embedding_cache(
+            embeddings,
+            Config.EMBEDDING_CACHE_PATH,
+            Config.AZURE_TEXT_EMBEDDING_DEPLOYMENT or "",
+            Config.EMBEDDING_CACHE_MAX_ENTRIES,
+            Config.EMBEDDING_BATCH_SIZE,
+        )
+        if store is not None:
+            closers.append(store.close)
+        return cached, closers
+
+    return registry.get("embeddings", fingerprint, factory)
+
+
+def get_vector_store(embeddings: Optional[Embeddings] = None) -> VectorStore:
+    """Vector store compartido por el proceso, según `VECTOR_STORE_BACKEND`."""
+    if Config.VECTOR_STORE_BACKEND == "local":
+        return get_local_vector_store(embeddings)
+    return get_azure_vector_store(embeddings)
+
+
+def get_azure_vector_store(embeddings: Optional[Embeddings] = None) -> AzureSearch:
+    """Vector store de Azure Search compartido por el proceso."""
+    embeddings = embeddings or get_embeddings()
+    fingerprint = config_fingerprint(
+        Config.VECTOR_STORE_ADDRESS,
+        Config.VECTOR_STORE_PASSWORD,
+        Config.VECTOR_STORE_INDEX_NAME,
+        Config.VECTOR_STORE_DIMENSIONS,
+        id(embeddings),
+    )
+
+    def factory() -> Tuple[AzureSearch, List[Closer]]:
+        from langchain_community.vectorstores import AzureSearch
+
+        vector_store = AzureSearch(
+            azure_search_endpoint=Config.VECTOR_STORE_ADDRESS,
+            azure_search_key=Config.VECTOR_STORE_PASSWORD,
+            index_name=Config.VECTOR_STORE_INDEX_NAME,
+            # Se pasa el objeto Embeddings para que las búsquedas async usen aembed_query
+            embedding_function=embeddings,
+            vector_search_dimensions=Config.VECTOR_STORE_DIMENSIONS,
+        )
+        return vector_store, [vector_store.client.close, vector_store.async_client.close]
+
+    return registry.get("vector_store", fingerprint, factory)
+
+
+def get_local_vector_store(embeddings: Optional[Embeddings] = None) -> LocalVectorStore:
+    """Vector store local en `LOCAL_VECTOR_STORE_PATH` compartido por el proceso."""
+    embeddings = embeddings or get_embeddings()
+    fingerprint = config_fingerprint(Config.LOCAL_VECTOR_STORE_PATH, id(embeddings))
+
+    def factory() -> Tuple[LocalVectorStore, List[Closer]]:
+        return LocalVectorStore(Config.LOCAL_VECTOR_STORE_PATH, embeddings), []
+
+    return registry.get("local_vector_store", fingerprint, factory)
+
+
+def get_cosmos_container() -> ContainerProxy:
+    """Contenedor de Cosmos DB compartido por el proceso."""
+    fingerprint = config_fingerprint(
+        Config.COSMOS_ENDPOINT,
+        Config.COSMOS_KEY,
+        Config.COSMOS_DATABASE_NAME,
+        Config.COSMOS_CONTAINER_NAME,
+    )
+
+    def factory() -> Tuple[ContainerProxy, List[Closer]]:
+        from azure.cosmos import CosmosClient
+
+        client = CosmosClient(Config.COSMOS_ENDPOINT, credential=Config.COSMOS_KEY)
+        database = client.get_database_client(Config.COSMOS_DATABASE_NAME)
+        container = database.get_container_client(Config.COSMOS_CONTAINER_NAME)
+        return container, [lambda: client.__exit__(None, None, None)]
+
+    return registry.get("cosmos_container", fingerprint, factory)
+
+
+def get_async_cosmos_container() -> AsyncContainerProxy:
+    """Contenedor async de Cosmos DB compartido por el event loop actual.
+
+    La sesión aiohttp del cliente queda ligada al loop en el que se crea, por lo
+    que el loop forma parte de la huella.
+    """
+    fingerprint = config_fingerprint(
+        Config.COSMOS_ENDPOINT,
+        Config.COSMOS_KEY,
+        Config.COSMOS_DATABASE_NAME,
+        Config.COSMOS_CONTAINER_NAME,
+        id(asyncio.get_running_loop()),
+    )
+
+    def factory() -> Tuple[AsyncContainerProxy, List[Closer]]:
+        from azure.cosmos.aio import CosmosClient as AsyncCosmosClient
+
+        client = AsyncCosmosClient(Config.COSMOS_ENDPOINT, credential=Config.COSMOS_KEY)
+        database = client.get_database_client(Config.COSMOS_DATABASE_NAME)
+        container = database.get_container_client(Config.COSMOS_CONTAINER_NAME)
+        return container, [client.close]
+
+    return registry.get("async_cosmos_container", fingerprint, factory)
+
+
+async def close_clients() -> None:
+    """Cierra todos los clientes compartidos del proceso."""
+    await registry.aclose()
@@ -0,0 +1,172 @@
+"""Single-flight coalescing of identical in-flight calls.
+
+When many requests ask for the same thing at the same time (a class launching a
+chat on the same topic), only the first one calls the upstream service; the rest
+wait for that call and receive a copy of its result. Nothing is kept once the
+call finishes, so this complements the response cache instead of replacing it.
+"""
+
+import asyncio
+import copy
+import hashlib
+import json
+import threading
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatResult
+
+from react_agent.configuration import Config
+from react_agent.instrumentation import COALESCED_CALLS, current_node
+
+if TYPE_CHECKING:
+    # Para mypy el mixin extiende el modelo de OpenAI con el que se combina
+    from langchain_openai.chat_models.base import BaseChatOpenAI as _ChatModelBase
+else:
+    _ChatModelBase = object
+
+T = TypeVar("T")
+
+
+def coalescing_key(*parts: Any) -> str:
+    """Clave estable de una llamada a partir de sus partes serializables."""
+    payload = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """Agrupa las llamadas concurrentes con la misma clave en una sola ejecución."""
+
+    def __init__(self, operation: str) -> None:
+        """Crea el grupo de llamadas; `operation` etiqueta la métrica de llamadas agrupadas."""
+        self.operation = operation
+        self._lock = threading.Lock()
+        self._tasks: Dict[Tuple[int, str], asyncio.Future[Any]] = {}
+        self._calls: Dict[str, Tuple[threading.Event, List[Any]]] = {}
+
+    def _count_hit(self) -> None:
+        COALESCED_CALLS.labels(self.operation, *current_node()).inc()
+
+    async def ado(self, key: str, func: Callable[[], Awaitable[T]], shared: Callable[[T], T] = copy.deepcopy) -> T:
+        """Ejecuta `func` o, si ya hay una llamada en vuelo con la misma clave, espera su resultado.
+
+        Quien se suma a una llamada en vuelo recibe `shared(resultado)`, por defecto
+        una copia. La llamada corre en su propia tarea, así que cancelar al primer
+        solicitante no cancela la espera de los demás.
+        """
+        loop_key = (id(asyncio.get_running_loop()), key)
+        task = self._tasks.get(loop_key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._tasks[loop_key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(loop_key, None))
+            return await asyncio.shield(task)
+        self._count_hit()
+        return shared(await asyncio.shield(task))
+
+    def do(self, key: str, func: Callable[[], T], shared: Callable[[T], T] = copy.deepcopy) -> T:
+        """Versión síncrona de `ado` para llamadas desde varios hilos."""
+        with self._lock:
+            existing = self._calls.get(key)
+            leader = existing is None
+            if existing is None:
+                call = self._calls[key] = (threading.Event(), [])
+            else:
+                call = existing
+        done, outcome = call
+        if not leader:
+            self._count_hit()
+            done.wait()
+            result, error = outcome
+            if error is not None:
+                raise error
+            return shared(result)
+        try:
+            result = func()
+            outcome.extend((result, None))
+            return result
+        except BaseException as e:
+            outcome.extend((None, e))
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            done.set()
+
+
+def _normalize_message(message: BaseMessage) -> Dict[str, Any]:
+    content = message.content
+    if isinstance(content, str):
+        # Las diferencias de espacios no cambian la respuesta
+        content = " ".join(content.split())
+    return {"type": message.type, "content": content, "additional_kwargs": message.additional_kwargs}
+
+
+def _shared_result(result: ChatResult) -> ChatResult:
+    """Copia del resultado para otra petición, marcada para no contar dos veces sus tokens."""
+    shared = result.model_copy(deep=True)
+    shared.llm_output = {**(shared.llm_output or {}), "coalesced": True}
+    return shared
+
+
+class SingleFlightChatModel(_ChatModelBase):
+    """Mixin para modelos de chat que agrupa las generaciones idénticas en vuelo.
+
+    Dos llamadas son idénticas si coinciden los mensajes (con los espacios
+    normalizados) y todos los parámetros de invocación (modelo, temperatura,
+    formato de respuesta, herramientas...). Las llamadas en streaming no se
+    agrupan, porque cada cliente necesita sus propios tokens.
+    """
+
+    _flight = SingleFlight("llm")
+
+    def _coalescing_key(self, messages: List[BaseMessage], stop: Optional[List[str]], **kwargs: Any) -> str:
+        params = self._get_invocation_params(stop=stop, **kwargs)
+        return coalescing_key([_normalize_message(message) for message in messages], params)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if not Config.LLM_COALESCING:
+            return super()._generate(messages, stop, run_manager, **kwargs)
+        key = self._coalescing_key(messages, stop, **kwargs)
+        return self._flight.do(
+            key,
+            lambda: super(SingleFlightChatModel, self)._generate(messages, stop, run_manager, **kwargs),
+            _shared_result,
+        )
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if not Config.LLM_COALESCING:
+            return await super()._agenerate(messages, stop, run_manager, **kwargs)
+        key = self._coalescing_key(messages, stop, **kwargs)
+        return await self._flight.ado(
+            key,
+            lambda: super(SingleFlightChatModel, self)._agenerate(messages, stop, run_manager, **kwargs),
+            _shared_result,
+        )
+
@@ -0,0 +1,125 @@
+"""Bounded-concurrency helpers for fanning out LLM calls."""
+
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, List, Optional, Sequence, TypeVar
+
+from react_agent.instrumentation import record_retry
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """Indica si la excepción corresponde a un 429 (Too Many Requests)."""
+    if getattr(error, "status_code", None) == 429:
+        return True
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None) == 429
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Extrae el tiempo de espera de las cabeceras `retry-after(-ms)` de un 429."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+class AdaptiveLimiter:
+    """Limita las llamadas concurrentes y se adapta a los 429 del servicio.
+
+    Ante un 429 reduce a la mitad el límite y pausa a todas las tareas durante el
+    `retry-after` indicado; cada `limit` éxitos seguidos lo vuelve a subir en uno.
+    """
+
+    def __init__(self, max_concurrency: int) -> None:
+        """Empieza permitiendo `max_concurrency` llamadas a la vez, que es también el máximo."""
+        self.max_concurrency = max(1, max_concurrency)
+        self.limit = self.max_concurrency
+        self._active = 0
+        self._successes = 0
+        self._paused_until = 0.0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        """Espera a que haya hueco y no haya una pausa por 429 en curso."""
+        while True:
+            delay = self._paused_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            async with self._cond:
+                if self._active < self.limit and time.monotonic() >= self._paused_until:
+                    self._active += 1
+                    return
+                await self._cond.wait()
+
+    async def release(self) -> None:
+        """Libera un hueco y despierta a las tareas en espera."""
+        async with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    def record_success(self) -> None:
+        """Registra un éxito y recupera concurrencia de forma gradual."""
+        self._successes += 1
+        if self._successes >= self.limit and self.limit < self.max_concurrency:
+            self.limit += 1
+            self._successes = 0
+
+    def record_rate_limit(self, delay: float) -> None:
+        """Registra un 429: reduce el límite y pausa las nuevas llamadas."""
+        self.limit = max(1, self.limit // 2)
+        self._successes = 0
+        self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        logging.warning(f"429 recibido, concurrencia reducida a {self.limit} y pausa de {delay:.1f}s")
+
+
+async def gather_bounded(
+    func: Callable[[T], Awaitable[R]],
+    items: Sequence[T],
+    *,
+    max_concurrency: int,
+    max_retries: int = 3,
+    base_delay: float = 1.0,
+    return_exceptions: bool = False,
+) -> List[Any]:
+    """Ejecuta `func` sobre cada elemento con concurrencia acotada.
+
+    Los resultados se devuelven en el mismo orden que `items`. Un fallo en un
+    elemento no afecta a los demás: se registra y su resultado queda en None
+    (o la propia excepción si `return_exceptions` es True).
+    Los 429 se reintentan hasta `max_retries` veces con backoff adaptativo; con
+    funciones que llaman a un `RateLimitedChatModel`, que ya los reintenta, debe ser 0.
+    """
+    limiter = AdaptiveLimiter(max_concurrency)
+
+    async def run(index: int, item: T) -> Any:
+        for attempt in range(max_retries + 1):
+            await limiter.acquire()
+            try:
+                result = await func(item)
+            except Exception as e:
+                if is_rate_limit_error(e) and attempt < max_retries:
+                    delay = retry_after_seconds(e) or base_delay * 2**attempt * (1 + random.random())
+                    limiter.record_rate_limit(delay)
+                    record_retry()
+                    continue
+                logging.error(f"Error procesando el elemento {index}: {e}")
+                return e if return_exceptions else None
+            finally:
+                await limiter.release()
+            limiter.record_success()
+            return result
+        return None
+
+    return list(await asyncio.gather(*(run(i, item) for i, item in enumerate(items))))
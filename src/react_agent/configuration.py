@@ -30,3 +30,112 @@ class Config:
     AZURE_TEXT_EMBEDDING_API_VERSION = os.getenv("AZURE_TEXT_EMBEDDING_API_VERSION")
     AZURE_TEXT_EMBEDDING_DEPLOYMENT = os.getenv("AZURE_TEXT_EMBEDDING_DEPLOYMENT")
 
+    # Dimensión de los vectores del índice (evita una llamada de embedding al crear AzureSearch)
+    VECTOR_STORE_DIMENSIONS = int(os.getenv("VECTOR_STORE_DIMENSIONS", "0")) or None
+
+    # Backend del vector store: "azure" (Azure Search) o "local" (índice NumPy en disco)
+    VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "azure")
+    LOCAL_VECTOR_STORE_PATH = os.getenv("LOCAL_VECTOR_STORE_PATH", ".cache/vector_index")
+    LOCAL_VECTOR_STORE_IVF_MIN_ROWS = int(os.getenv("LOCAL_VECTOR_STORE_IVF_MIN_ROWS", "20000"))
+    LOCAL_VECTOR_STORE_NPROBE = int(os.getenv("LOCAL_VECTOR_STORE_NPROBE", "8"))
+
+    # Pool de conexiones HTTP compartido por los clientes de Azure OpenAI
+    HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+    HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+    HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "60"))
+
+    # Extracción de topics por fragmento en paralelo
+    TOPICS_MAX_CONCURRENCY = int(os.getenv("TOPICS_MAX_CONCURRENCY", "8"))
+    LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+
+    # Reducción jerárquica de los topics por fragmento antes de generar el JSON: similitud
+    # para fusionar temas, tokens por grupo de fusión, tokens máximos de la síntesis final
+    TOPICS_CLUSTER_THRESHOLD = float(os.getenv("TOPICS_CLUSTER_THRESHOLD", "0.9"))
+    TOPICS_REDUCE_GROUP_TOKENS = int(os.getenv("TOPICS_REDUCE_GROUP_TOKENS", "2000"))
+    TOPICS_REDUCE_MAX_TOKENS = int(os.getenv("TOPICS_REDUCE_MAX_TOKENS", "4000"))
+    TOPICS_REDUCE_MAX_LEVELS = int(os.getenv("TOPICS_REDUCE_MAX_LEVELS", "3"))
+
+    # Ingesta en streaming de PDFs
+    INGEST_EMBEDDING_BATCH_SIZE = int(os.getenv("INGEST_EMBEDDING_BATCH_SIZE", "64"))
+    INGEST_UPLOAD_BATCH_SIZE = int(os.getenv("INGEST_UPLOAD_BATCH_SIZE", "500"))
+    INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "2"))
+    # Manifiesto por URL de los fragmentos indexados, para reindexar solo los cambios
+    INGEST_MANIFEST_PATH = os.getenv("INGEST_MANIFEST_PATH", ".cache/ingest_manifest.sqlite3")
+
+    # Extracción de texto de PDFs en un pool de procesos (0 = un proceso por CPU) y caché
+    # del texto por hash del fichero (vacío para desactivarlo)
+    PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", "0"))
+    PDF_EXTRACT_PAGES_PER_TASK = int(os.getenv("PDF_EXTRACT_PAGES_PER_TASK", "8"))
+    PDF_EXTRACT_PAGE_TIMEOUT = float(os.getenv("PDF_EXTRACT_PAGE_TIMEOUT", "30"))
+    PDF_TEXT_CACHE_PATH = os.getenv("PDF_TEXT_CACHE_PATH", ".cache/pdf_text.sqlite3")
+    PDF_TEXT_CACHE_MAX_FILES = int(os.getenv("PDF_TEXT_CACHE_MAX_FILES", "500"))
+
+    # Caché en disco de los documentos descargados por URL (vacío para desactivarlo),
+    # revalidado con ETag/Last-Modified y limitado en bytes
+    FETCH_CACHE_PATH = os.getenv("FETCH_CACHE_PATH", ".cache/fetch")
+    FETCH_CACHE_MAX_BYTES = int(os.getenv("FETCH_CACHE_MAX_BYTES", str(2 * 1024**3)))
+
+    # Caché local de embeddings por hash de contenido (vacío para desactivarlo)
+    EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", ".cache/embeddings.sqlite3")
+    EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+    EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))
+
+    # Caché de respuestas del LLM: "memory", "redis" o "none"
+    RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+    RESPONSE_CACHE_URL = os.getenv("RESPONSE_CACHE_URL", "redis://localhost:6379/0")
+    RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+
+    # Memoria de conversaciones del chat (vacío para guardarla solo en memoria)
+    CHAT_MEMORY_PATH = os.getenv("CHAT_MEMORY_PATH", ".cache/conversations.sqlite3")
+    CHAT_HISTORY_MAX_TOKENS = int(os.getenv("CHAT_HISTORY_MAX_TOKENS", "3000"))
+    # Al compactar: turnos recientes que se conservan literales y longitud máxima del resumen
+    CHAT_HISTORY_RECENT_TOKENS = int(os.getenv("CHAT_HISTORY_RECENT_TOKENS", "1500"))
+    CHAT_HISTORY_SUMMARY_TOKENS = int(os.getenv("CHAT_HISTORY_SUMMARY_TOKENS", "400"))
+    TOKENIZER_ENCODING = os.getenv("TOKENIZER_ENCODING", "o200k_base")
+
+    # Generación masiva de preguntas
+    QUESTIONS_MAX_CONCURRENCY = int(os.getenv("QUESTIONS_MAX_CONCURRENCY", "8"))
+    COSMOS_MAX_CONCURRENCY = int(os.getenv("COSMOS_MAX_CONCURRENCY", "4"))
+    COSMOS_PARTITION_KEY_PATH = os.getenv("COSMOS_PARTITION_KEY_PATH", "")
+
+    # Recuperación de contexto para el chat
+    RETRIEVAL_CANDIDATES = int(os.getenv("RETRIEVAL_CANDIDATES", "20"))
+    RETRIEVAL_MAX_TOKENS = int(os.getenv("RETRIEVAL_MAX_TOKENS", "1500"))
+
+    # Coste por cada 1000 tokens del modelo de chat, para la métrica llm_cost_total
+    LLM_PROMPT_COST_PER_1K = float(os.getenv("LLM_PROMPT_COST_PER_1K", "0"))
+    LLM_COMPLETION_COST_PER_1K = float(os.getenv("LLM_COMPLETION_COST_PER_1K", "0"))
+    # Los tokens de entrada servidos del caché de prompts del proveedor; por defecto, al precio normal
+    LLM_CACHED_PROMPT_COST_PER_1K = float(os.getenv("LLM_CACHED_PROMPT_COST_PER_1K") or LLM_PROMPT_COST_PER_1K)
+
+    # Caché semántico de respuestas del chat: preguntas casi idénticas sobre el mismo tema
+    SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    SEMANTIC_CACHE_PATH = os.getenv("SEMANTIC_CACHE_PATH", ".cache/semantic_answers.sqlite3")
+    SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+    SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "86400"))
+    SEMANTIC_CACHE_MAX_PER_TOPIC = int(os.getenv("SEMANTIC_CACHE_MAX_PER_TOPIC", "500"))
+
+    # Cuota del deployment de chat compartida entre workers (0 = sin límite) y tokens
+    # de respuesta que se reservan cuando la llamada no fija max_tokens
+    LLM_RATE_LIMIT_RPM = float(os.getenv("LLM_RATE_LIMIT_RPM", "0"))
+    LLM_RATE_LIMIT_TPM = float(os.getenv("LLM_RATE_LIMIT_TPM", "0"))
+    LLM_RATE_LIMIT_COMPLETION_TOKENS = int(os.getenv("LLM_RATE_LIMIT_COMPLETION_TOKENS", "1000"))
+    LLM_RATE_LIMIT_STATE_PATH = os.getenv("LLM_RATE_LIMIT_STATE_PATH", ".cache/llm_rate_limit.bin")
+
+    # Agrupar llamadas idénticas simultáneas al LLM y al vector store en una sola
+    LLM_COALESCING = os.getenv("LLM_COALESCING", "true").lower() in ("1", "true", "yes")
+
+    # Salida estructurada: "json_mode", "function_calling" o "none" (texto libre reparado localmente)
+    STRUCTURED_OUTPUT_METHOD = os.getenv("STRUCTURED_OUTPUT_METHOD", "json_mode")
+
+    # Cola de trabajos en segundo plano para la generación de topics
+    JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", ".cache/jobs.sqlite3")
+    JOBS_CHECKPOINT_PATH = os.getenv("JOBS_CHECKPOINT_PATH", ".cache/job_checkpoints.sqlite3")
+    JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "2"))
+    JOBS_MAX_PER_TENANT = int(os.getenv("JOBS_MAX_PER_TENANT", "2"))
+    JOBS_POLL_INTERVAL = float(os.getenv("JOBS_POLL_INTERVAL", "1.0"))
+    JOBS_HEARTBEAT_INTERVAL = float(os.getenv("JOBS_HEARTBEAT_INTERVAL", "10"))
+    JOBS_STALE_AFTER = float(os.getenv("JOBS_STALE_AFTER", "60"))
+    JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", "3"))
@@ -0,0 +1,169 @@
+"""Content-addressed embedding cache backed by a local SQLite file."""
+
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+def embedding_key(deployment: str, text: str) -> str:
+    """Clave del caché: hash del despliegue de embeddings más el contenido."""
+    return hashlib.sha256(f"{deployment}\0{text}".encode()).hexdigest()
+
+
+class EmbeddingStore:
+    """Almacén en disco de vectores float32 con expulsión LRU.
+
+    Cada vector se guarda como BLOB junto a su último acceso; al superar
+    `max_entries` se eliminan los menos usados recientemente. El último acceso
+    es un contador creciente y no la hora, para que el orden no dependa de la
+    resolución del reloj.
+    """
+
+    def __init__(self, path: str, max_entries: int) -> None:
+        """Abre (o crea) el almacén en la base de datos SQLite `path`."""
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access)")
+        self._conn.commit()
+
+    def _next_access(self) -> float:
+        # MAX usa el índice; los procesos que comparten el fichero continúan el mismo contador
+        (last,) = self._conn.execute("SELECT COALESCE(MAX(last_access), 0) FROM embeddings").fetchone()
+        return float(last) + 1
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        """Devuelve los vectores encontrados y actualiza su último acceso."""
+        if not keys:
+            return {}
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            unique = list(dict.fromkeys(keys))
+            # SQLite limita el número de parámetros por consulta
+            for start in range(0, len(unique), 500):
+                part = unique[start : start + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", part
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+            if found:
+                access = self._next_access()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?", [(access, key) for key in found]
+                )
+                self._conn.commit()
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]) -> None:
+        """Guarda vectores nuevos y aplica la expulsión LRU."""
+        if not items:
+            return
+        with self._lock:
+            access = self._next_access()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes(), access) for key, vector in items.items()],
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_access LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+            self._conn.commit()
+
+    def close(self) -> None:
+        """Cierra la conexión a SQLite."""
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """Envuelve un modelo de embeddings con el caché por hash de contenido.
+
+    Solo los textos que no están en caché llegan al modelo, deduplicados y en
+    lotes de `batch_size` para respetar los límites del despliegue.
+    """
+
+    def __init__(self, embeddings: Embeddings, store: EmbeddingStore, deployment: str, batch_size: int) -> None:
+        """Envuelve `embeddings`, guardando sus vectores en `store` bajo el nombre del despliegue."""
+        self.embeddings = embeddings
+        self.store = store
+        self.deployment = deployment
+        self.batch_size = max(1, batch_size)
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, texts: List[str]) -> tuple[List[str], Dict[str, List[float]], List[str]]:
+        """Resuelve las claves y separa aciertos de textos pendientes (sin duplicados)."""
+        keys = [embedding_key(self.deployment, text) for text in texts]
+        cached = self.store.get_many(keys)
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in cached:
+                missing.setdefault(key, text)
+        self.hits += len(texts) - sum(1 for key in keys if key not in cached)
+        self.misses += len(missing)
+        return keys, cached, list(missing.values())
+
+    def _batches(self, texts: List[str]) -> List[List[str]]:
+        return [texts[i : i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embebe documentos reutilizando los vectores cacheados."""
+        keys, cached, missing = self._lookup(texts)
+        new: Dict[str, List[float]] = {}
+        for batch in self._batches(missing):
+            vectors = self.embeddings.embed_documents(batch)
+            new.update({embedding_key(self.deployment, text): vector for text, vector in zip(batch, vectors)})
+        self.store.put_many(new)
+        cached.update(new)
+        return [cached[key] for key in keys]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Versión async de `embed_documents`; el acceso a SQLite va en un hilo."""
+        keys, cached, missing = await asyncio.to_thread(self._lookup, texts)
+        new: Dict[str, List[float]] = {}
+        for batch in self._batches(missing):
+            vectors = await self.embeddings.aembed_documents(batch)
+            new.update({embedding_key(self.deployment, text): vector for text, vector in zip(batch, vectors)})
+        await asyncio.to_thread(self.store.put_many, new)
+        cached.update(new)
+        return [cached[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embebe una consulta reutilizando el vector cacheado."""
+        return self.embed_documents([text])[0]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Versión async de `embed_query`."""
+        return (await self.aembed_documents([text]))[0]
+
+
+def with_embedding_cache(
+    embeddings: Embeddings, path: Optional[str], deployment: str, max_entries: int, batch_size: int
+) -> tuple[Embeddings, Optional[EmbeddingStore]]:
+    """Envuelve el modelo con el caché si hay ruta configurada."""
+    if not path:
+        return embeddings, None
+    try:
+        store = EmbeddingStore(path, max_entries)
+    except sqlite3.Error as e:
+        logging.warning(f"No se pudo abrir el caché de embeddings en {path}: {e}")
+        return embeddings, None
+    return CachedEmbeddings(embeddings, store, deployment, batch_size), store
@@ -0,0 +1,183 @@
+"""Content-addressed disk cache for source documents fetched by URL.
+
+Downloads are streamed to disk while they are hashed, and stored under their
+SHA-256, so the same file behind several URLs is kept once. A URL that was
+fetched before is revalidated with a conditional GET (`If-None-Match` /
+`If-Modified-Since`): a 304 reuses the local copy without transferring the body.
+The cache is bounded in bytes and evicts the least recently used files. If the
+server cannot be reached, a previously downloaded copy is served instead.
+Readers use `checkout`, which hard-links the file into a private directory, so
+an eviction by another worker while the file is being read does not remove it.
+"""
+
+import contextlib
+import hashlib
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Iterator, List, Optional, Tuple
+
+import httpx
+
+from react_agent.clients import Closer, config_fingerprint, registry
+from react_agent.configuration import Config
+from react_agent.instrumentation import FETCH_CACHE_REQUESTS, track_call
+
+
+class FetchCache:
+    """Documentos descargados por URL en `directory`, por hash de contenido y con un máximo de `max_bytes`."""
+
+    def __init__(self, directory: str, max_bytes: int, client: httpx.Client) -> None:
+        """Abre (o crea) el índice y el directorio de ficheros del caché."""
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._client = client
+        self._blobs = os.path.join(directory, "blobs")
+        os.makedirs(self._blobs, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(directory, "index.sqlite3"), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS urls (url TEXT PRIMARY KEY, sha256 TEXT NOT NULL, etag TEXT, "
+            "last_modified TEXT, fetched_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS blobs (sha256 TEXT PRIMARY KEY, size INTEGER NOT NULL, used_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _blob_path(self, sha256: str) -> str:
+        return os.path.join(self._blobs, sha256)
+
+    def _entry(self, url: str) -> Optional[Tuple[str, Optional[str], Optional[str]]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sha256, etag, last_modified FROM urls WHERE url = ?", (url,)
+            ).fetchone()
+        # Un fichero borrado a mano o por otro proceso obliga a descargarlo de nuevo
+        if row is None or not os.path.exists(self._blob_path(row[0])):
+            return None
+        return row
+
+    def _touch(self, sha256: str) -> str:
+        with self._lock:
+            self._conn.execute("UPDATE blobs SET used_at = ? WHERE sha256 = ?", (time.time(), sha256))
+            self._conn.commit()
+        return self._blob_path(sha256)
+
+    def _download(self, response: httpx.Response) -> Tuple[str, int]:
+        """Escribe el cuerpo en disco por bloques mientras calcula su hash."""
+        digest = hashlib.sha256()
+        size = 0
+        fd, partial = tempfile.mkstemp(dir=self._blobs, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for block in response.iter_bytes():
+                    digest.update(block)
+                    f.write(block)
+                    size += len(block)
+            sha256 = digest.hexdigest()
+            os.replace(partial, self._blob_path(sha256))
+        except BaseException:
+            os.unlink(partial)
+            raise
+        return sha256, size
+
+    def _evict(self, keep: str) -> None:
+        """Elimina los ficheros usados hace más tiempo hasta volver a `max_bytes`."""
+        with self._lock:
+            rows = self._conn.execute("SELECT sha256, size FROM blobs ORDER BY used_at").fetchall()
+            total = sum(size for _, size in rows)
+            for sha256, size in rows:
+                if total <= self.max_bytes:
+                    break
+                if sha256 == keep:
+                    continue
+                self._conn.execute("DELETE FROM blobs WHERE sha256 = ?", (sha256,))
+                self._conn.execute("DELETE FROM urls WHERE sha256 = ?", (sha256,))
+                try:
+                    os.unlink(self._blob_path(sha256))
+                except FileNotFoundError:
+                    pass
+                total -= size
+            self._conn.commit()
+
+    def fetch(self, url: str) -> str:
+        """Ruta local del documento, descargándolo solo si no está en caché o ha cambiado."""
+        entry = self._entry(url)
+        headers = {}
+        if entry is not None:
+            if entry[1]:
+                headers["If-None-Match"] = entry[1]
+            if entry[2]:
+                headers["If-Modified-Since"] = entry[2]
+        try:
+            with track_call("http", "fetch"), self._client.stream("GET", url, headers=headers) as response:
+                if response.status_code == 304 and entry is not None:
+                    FETCH_CACHE_REQUESTS.labels("revalidated").inc()
+                    return self._touch(entry[0])
+                response.raise_for_status()
+                sha256, size = self._download(response)
+                etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+        except httpx.HTTPError as e:
+            if entry is None:
+                raise
+            logging.warning(f"No se pudo revalidar {url}, se usa la copia en caché: {e}")
+            FETCH_CACHE_REQUESTS.labels("stale").inc()
+            return self._touch(entry[0])
+
+        FETCH_CACHE_REQUESTS.labels("miss").inc()
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO blobs (sha256, size, used_at) VALUES (?, ?, ?)", (sha256, size, now)
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO urls (url, sha256, etag, last_modified, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                (url, sha256, etag, last_modified, now),
+            )
+            self._conn.commit()
+        self._evict(keep=sha256)
+        logging.info(f"{url} descargado ({size} bytes)")
+        return self._blob_path(sha256)
+
+    @contextlib.contextmanager
+    def checkout(self, url: str) -> Iterator[str]:
+        """Como `fetch`, pero la ruta sigue siendo válida hasta salir del bloque aunque se expulse el fichero.
+
+        El fichero se enlaza en un directorio temporal del propio caché, así que
+        no se copia y el espacio se libera al salir si ya no está en el caché.
+        """
+        with tempfile.TemporaryDirectory(dir=self.directory, prefix="checkout-") as directory:
+            path = os.path.join(directory, "document")
+            for attempt in range(2):
+                try:
+                    os.link(self.fetch(url), path)
+                    break
+                except FileNotFoundError:
+                    # Otro worker lo ha expulsado entre la consulta y el enlace: se descarga de nuevo
+                    if attempt:
+                        raise
+            yield path
+
+    def close(self) -> None:
+        """Cierra el índice SQLite."""
+        with self._lock:
+            self._conn.close()
+
+
+def get_fetch_cache() -> Optional[FetchCache]:
+    """Caché de descargas compartido por el proceso (None si está desactivado)."""
+    if not Config.FETCH_CACHE_PATH:
+        return None
+    fingerprint = config_fingerprint(Config.FETCH_CACHE_PATH, Config.FETCH_CACHE_MAX_BYTES, Config.HTTP_TIMEOUT)
+
+    def factory() -> Tuple[FetchCache, List[Closer]]:
+        client = httpx.Client(follow_redirects=True, timeout=Config.HTTP_TIMEOUT)
+        cache = FetchCache(Config.FETCH_CACHE_PATH, Config.FETCH_CACHE_MAX_BYTES, client)
+        return cache, [cache.close, client.close]
+
+    return registry.get("fetch_cache", fingerprint, factory)
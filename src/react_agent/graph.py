@@ -4,16 +4,29 @@ Works with a chat model with tool calling support.
 """
 import logging
 
-from typing import Dict, Any, List, Literal
+from typing import Dict, Any, List, Literal, Tuple
+from langgraph.config import get_stream_writer
 from langgraph.graph import StateGraph, END, START
-from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings
+from langgraph.graph.state import CompiledStateGraph
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, BaseMessage
-from react_agent.state import QuestionState, TopicsState, FeedbackState, GenerateTopicsState
+from react_agent.state import QuestionState, BulkQuestionState, TopicsState, FeedbackState, GenerateTopicsState
 from react_agent.configuration import Config
 from react_agent.prompts import *
 from react_agent.utils import *
-import json
-import uuid
+from react_agent.response_cache import get_response_cache, response_cache_key
+from react_agent.memory import acompact_history, get_checkpointer
+from react_agent.schemas import TrainingTopics
+from react_agent.structured_output import ainvoke_structured
+from react_agent.retrieval import aretrieve_context
+from react_agent.semantic_cache import asemantic_lookup, conversation_context
+from react_agent.clients import registry
+from react_agent.instrumentation import instrument_node
+from react_agent import prompt_registry
+from react_agent.prompt_registry import render_prompt
+import asyncio
+import hashlib
+import importlib
+import threading
 
 
 
@@ -21,7 +34,7 @@ def estado_inicial(state: QuestionState) -> QuestionState:
 
     return QuestionState(text=state["text"], questions={}, status="start", training_id=state["training_id"], topic_id=state["topic_id"])
 
-def generate_questions_node(state: QuestionState) -> QuestionState:
+async def generate_questions_node(state: QuestionState) -> QuestionState:
     """Generar preguntas de selección múltiple."""
     logging.info("Generando preguntas...")
     logging.info(state)
@@ -35,7 +48,7 @@ def generate_questions_node(state: QuestionState) -> QuestionState:
         # Crear un QuestionState temporal para pasar a la función de utils
         
         # Generar preguntas usando la función de utils
-        questions = generate_questions(nuevo_estado, model)
+        questions = await agenerate_questions(nuevo_estado, model)
         nuevo_estado["questions"] = questions
 
         logging.info("Preguntas generadas:")
@@ -57,7 +70,7 @@ async def save_questions_node(state: QuestionState) -> QuestionState:
     logging.info(state)
     nuevo_estado = state.copy()
     try:
-        save_to_cosmos(state)
+        await asave_to_cosmos(state)
         nuevo_estado["status"] = "saved"
         return nuevo_estado
 
@@ -78,10 +91,10 @@ async def result_node(state: QuestionState) -> QuestionState:
 workflow = StateGraph(QuestionState)
 
 # Agregar nodos
-workflow.add_node("estado_inicial", estado_inicial)
-workflow.add_node("generate_questions", generate_questions_node)  # Cambié el nombre de la función
-workflow.add_node("save_questions", save_questions_node)
-workflow.add_node("result", result_node)
+workflow.add_node("estado_inicial", instrument_node("question_agent", estado_inicial))
+workflow.add_node("generate_questions", instrument_node("question_agent", generate_questions_node))  # Cambié el nombre de la función
+workflow.add_node("save_questions", instrument_node("question_agent", save_questions_node))
+workflow.add_node("result", instrument_node("question_agent", result_node))
 # Configurar flujo de ejecución
 workflow.add_edge(START, "estado_inicial")
 workflow.add_edge("estado_inicial", "generate_questions")
@@ -89,157 +102,201 @@ workflow.add_edge("generate_questions", "save_questions")
 workflow.add_edge("save_questions", "result")
 workflow.add_edge("result", END)
 
-# Compilar el grafo
-question_agent = workflow.compile()
-question_agent.name = "Question Generation"
 
 # Crear el grafo
 #graph.draw_mermaid_png(output_file_path="../img/question_generation.png")
 
 
+# Flujo de generación masiva de preguntas
+async def generate_bulk_questions_node(state: BulkQuestionState) -> BulkQuestionState:
+    """Generar preguntas para muchos temas con concurrencia acotada."""
+    logging.info(f"Generando preguntas para {len(state['items'])} temas...")
+    nuevo_estado = state.copy()
+    model = load_model()
+
+    questions = await gather_bounded(
+        lambda item: agenerate_questions_or_raise(item, model),
+        state["items"],
+        max_concurrency=Config.QUESTIONS_MAX_CONCURRENCY,
+        # El modelo ya reintenta los 429 con su propio backoff
+        max_retries=0,
+        return_exceptions=True,
+    )
+    nuevo_estado["questions"] = [None if isinstance(q, Exception) else q for q in questions]
+    nuevo_estado["results"] = [
+        {
+            "training_id": item["training_id"],
+            "topic_id": item["topic_id"],
+            "id": None if isinstance(q, Exception) else q.get("id"),
+            "status": "error" if isinstance(q, Exception) else "generated",
+            **({"error": f"Error al generar preguntas: {q}"} if isinstance(q, Exception) else {}),
+        }
+        for item, q in zip(state["items"], questions)
+    ]
+    nuevo_estado["status"] = "generated"
+    return nuevo_estado
+
+
+async def save_bulk_questions_node(state: BulkQuestionState) -> BulkQuestionState:
+    """Guardar en Cosmos DB los cuestionarios generados, en batches por partición."""
+    nuevo_estado = state.copy()
+    results = [dict(result) for result in state["results"]]
+    pending = [i for i, questions in enumerate(state["questions"]) if questions is not None]
+
+    try:
+        statuses = await asave_questions_batch([state["questions"][i] for i in pending])
+    except Exception as e:
+        logging.error(f"Error guardando preguntas: {str(e)}")
+        statuses = [{"status": "error", "error": str(e)} for _ in pending]
+
+    for i, status in zip(pending, statuses):
+        results[i]["status"] = status["status"]
+        if "error" in status:
+            results[i]["error"] = status["error"]
+
+    nuevo_estado["results"] = results
+    failed = sum(1 for result in results if result["status"] != "saved")
+    nuevo_estado["status"] = "saved" if not failed else ("error" if failed == len(results) else "partial")
+    return nuevo_estado
+
+
+workflow_bulk_questions = StateGraph(BulkQuestionState)
+workflow_bulk_questions.add_node("generate_bulk_questions", instrument_node("bulk_question_agent", generate_bulk_questions_node))
+workflow_bulk_questions.add_node("save_bulk_questions", instrument_node("bulk_question_agent", save_bulk_questions_node))
+workflow_bulk_questions.add_edge(START, "generate_bulk_questions")
+workflow_bulk_questions.add_edge("generate_bulk_questions", "save_bulk_questions")
+workflow_bulk_questions.add_edge("save_bulk_questions", END)
+
+
 # Codigo para el chat
 # Función para inicializar el chatbot con el prompt del tema
-def initialize_chat(state: TopicsState):  
+async def initialize_chat(state: TopicsState):  
     print('entra initialize')  
     model = load_model()  
     topic = state["topic"]  
   
-    # Consultar en Azure Search AI usando el topic  
+    # Consultar en Azure Search AI usando el topic, limitado al documento de la formación
     vector_store = load_vector_store(load_text_embedding_model())  
-    query = topic  
-    search_type = "similarity"  # Ajustar según tu implementación de Azure Search AI  
-    try:  
-        search_results = vector_store.search(query=query, search_type=search_type)  
-    except Exception as e:  
-        logging.error(f"Error al buscar en Azure Search AI: {e}")  
-        search_results = []  
+    search_content = await aretrieve_context(vector_store, topic, state.get("document_id"))
   
     # Crear un mensaje del sistema  
     system_message = {"role": "system", "content": SYSTEM_PROMPT}  
   
-    if search_results:  
-        # Combinar los resultados encontrados en un solo contenido  
-        search_content = "\n".join([result.page_content for result in search_results])  
-
-  
+    if search_content:  
         # Pasar los resultados al modelo para mejorar la redacción  
-        prompt = INITIALIZE_PROMPT.format(search_content=search_content, topic=topic)
-        internal_message = {"role": "user", "content": prompt, "visible": False}  
-  
-        # Obtener la respuesta mejorada del modelo  
-        messages = [system_message, internal_message]  
-        response = model.invoke(messages)  
-  
-        # Crear un mensaje de asistente con la respuesta mejorada  
-        assistant_message = {"role": "assistant", "content": response.content}  
-  
-        # Inicializamos el estado con el mensaje del sistema y la respuesta del asistente  
-        return {  
-            "topic": topic,  
-            "question": None,  
-            "status": "chatbot",  
-            "response": response.content,  
-            "id_user": state["id_user"],  
-            "messages": [system_message, assistant_message],  # Aquí inicializamos messages  
-        }  
+        template = INITIALIZE_PROMPT
+        prompt = render_prompt(INITIALIZE_PROMPT, search_content=search_content, topic=topic)
     else:  
         # Si no se encontraron resultados, usar el modelo directamente  
         logging.info(f"No se encontraron resultados en Azure Search para el topic: {topic}")  
-        prompt = TOPICS_PROMPT.format(topic=topic)  
-  
-        internal_message = {"role": "user", "content": prompt, "visible": False}  
+        template = TOPICS_PROMPT
+        prompt = render_prompt(TOPICS_PROMPT, topic=topic)
   
-        # Obtener la respuesta del modelo directamente  
-        messages = [system_message, internal_message]  
-        response = model.invoke(messages)  
+    # La introducción solo depende del topic, del contenido recuperado y de la versión
+    # del prompt y del modelo: si ya se generó, se reutiliza sin llamar al LLM
+    cache = get_response_cache()
+    cache_key = response_cache_key(
+        "initialize",
+        topic,
+        hashlib.sha256(search_content.encode("utf-8")).hexdigest(),
+        SYSTEM_PROMPT,
+        template,
+        Config.AZURE_DEPLOYMENT_NAME,
+        Config.AZURE_OPENAI_API_VERSION,
+    )
+    content = await cache.get(cache_key)
+    if content is None:
+        response = await model.ainvoke([system_message] + prompt)
+        content = response.content
+        await cache.set(cache_key, content)
+    else:
+        logging.info(f"Introducción del topic {topic} servida desde caché")
   
-        # Crear un mensaje de asistente con los tópicos  
-        assistant_message = {"role": "assistant", "content": response.content}  
+    # Crear un mensaje de asistente con la respuesta mejorada  
+    assistant_message = {"role": "assistant", "content": content}  
   
-        # Inicializamos el estado con el mensaje del sistema y la respuesta del asistente  
-        return {  
-            "topic": topic,  
-            "question": None,  
-            "status": "chatbot",  
-            "response": response.content,  
-            "id_user": state["id_user"],  
-            "messages": [system_message, assistant_message],  # Aquí inicializamos messages  
-        }  
+    # Inicializamos el estado con el mensaje del sistema y la respuesta del asistente  
+    return {  
+        "topic": topic,  
+        "question": None,  
+        "status": "chatbot",  
+        "response": content,  
+        "id_user": state["id_user"],  
+        "document_id": state.get("document_id"),
+        "messages": [system_message, assistant_message],  # Aquí inicializamos messages  
+    }  
     
 
 
 # Código para el chat
-def chatbot(state: TopicsState) -> TopicsState:  
+async def chatbot(state: TopicsState) -> TopicsState:  
     print('entra chatbot')  
     model = load_model()  
   
-    # Asegurar que el historial de mensajes contiene la introducción del tema  
-    if not state["messages"]:  
-        system_message = {"role": "system", "content": SYSTEM_PROMPT}  
-        initial_prompt = TOPICS_PROMPT.format(topic=state["topic"])  
-        internal_message = {"role": "user", "content": initial_prompt, "visible": False}  
-        response = model.invoke([system_message, internal_message])  
-        assistant_message = {"role": "assistant", "content": response.content}  
-  
-        state["messages"] = [system_message, internal_message, assistant_message]  
+    # El historial llega desde el checkpointer de la conversación; si es nueva basta con
+    # el mensaje de sistema, sin una llamada previa al modelo para sembrarla
+    messages = list(state.get("messages") or [])
+    if not messages:
+        messages = [{"role": "system", "content": SYSTEM_PROMPT}]
   
     # Agregar la pregunta actual al historial  
     if state["question"]:  
+        # Una pregunta casi idéntica sobre el mismo tema, hecha tras la misma respuesta
+        # del asistente, se responde desde el caché semántico sin búsqueda ni llamada al LLM
+        context = conversation_context(messages)
         user_message = {"role": "user", "content": state["question"]}  
-        state["messages"].append(user_message)  
+        messages.append(user_message)  
+
+        cached = await asemantic_lookup(state["topic"], state.get("document_id"), state["question"], context)
+        if cached.answer is not None:
+            messages.append({"role": "assistant", "content": cached.answer})
+            # El historial se compacta igual que al generar la respuesta
+            messages = await acompact_history(messages, Config.CHAT_HISTORY_MAX_TOKENS, model)
+            return {
+                "topic": state["topic"],
+                "question": state["question"],
+                "status": "chatbot",
+                "response": cached.answer,
+                "id_user": state["id_user"],
+                "document_id": state.get("document_id"),
+                "messages": messages,
+            }
   
-        # Consultar en Azure Search AI usando la pregunta o el topic  
+        # Consultar en Azure Search AI usando la pregunta o el topic, mientras se compacta
+        # el historial si ha superado el presupuesto de tokens
         vector_store = load_vector_store(load_text_embedding_model())  
         query = state["question"] or state["topic"]  
-        search_type = "similarity"  # Ajustar según tu implementación de Azure Search AI  
-  
-        try:  
-            search_results = vector_store.search(query=query, search_type=search_type)  
-        except Exception as e:  
-            logging.error(f"Error al buscar en Azure Search AI: {e}")  
-            search_results = []  
-  
-        # Crear un mensaje del sistema  
-        system_message = {"role": "system", "content": SYSTEM_PROMPT}  
-  
-        if search_results:  
-            # Combinar los resultados encontrados en un solo contenido  
-            search_content = "\n".join([result.page_content for result in search_results])  
+        search_content, messages = await asyncio.gather(
+            aretrieve_context(vector_store, query, state.get("document_id")),
+            acompact_history(messages, Config.CHAT_HISTORY_MAX_TOKENS, model),
+        )
   
+        if search_content:  
             # Pasar los resultados al modelo para mejorar la redacción  
-            prompt = CHATBOT_PROMPT.format(search_content=search_content, topic=state["topic"], question=state["question"])
-            internal_message = {"role": "user", "content": prompt, "visible": False}  
-  
-            # Obtener la respuesta mejorada del modelo  
-            messages = [system_message, internal_message]  
-            response = model.invoke(messages)  
-  
-            # Crear un mensaje de asistente con la respuesta mejorada  
-            assistant_message = {"role": "assistant", "content": response.content}  
-            state["messages"].append(assistant_message)  
+            prompt = render_prompt(CHATBOT_PROMPT, messages, search_content=search_content, topic=state["topic"], question=state["question"])
         else:  
             # Si no se encontraron resultados, usar el modelo directamente  
             logging.info(f"No se encontraron resultados en Azure Search para la consulta: {query}")  
-            prompt = f"Genera una respuesta para la siguiente pregunta o tema:\n\n{query}"  
-  
-            internal_message = {"role": "user", "content": prompt, "visible": False}  
+            prompt = render_prompt(CHATBOT_NO_CONTEXT_PROMPT, messages, query=query)
   
-            # Obtener la respuesta del modelo directamente  
-            messages = state["messages"] + [internal_message]  
-            response = model.invoke(messages)  
+        # Enviar el historial compactado con las instrucciones fijas tras el mensaje de sistema
+        # y los valores de la pregunta al final, para que el prefijo se sirva del caché del proveedor
+        response = await model.ainvoke(prompt)
   
-            # Crear un mensaje de asistente con la respuesta generada  
-            assistant_message = {"role": "assistant", "content": response.content}  
-            state["messages"].append(assistant_message)  
+        # Crear un mensaje de asistente con la respuesta generada  
+        assistant_message = {"role": "assistant", "content": response.content}  
+        messages.append(assistant_message)  
+        await cached.store(response.content)
   
-    # Devolver el estado actualizado  
+    # Devolver el estado actualizado con el historial compactado
     return {  
         "topic": state["topic"],  
         "question": state["question"],  
         "status": "chatbot",  
-        "response": state["messages"][-1]["content"],  # Último mensaje del asistente  
+        "response": messages[-1]["content"],  # Último mensaje del asistente  
         "id_user": state["id_user"],  
-        "messages": state["messages"],  
+        "document_id": state.get("document_id"),
+        "messages": messages,  
     } 
 
 
@@ -252,8 +309,8 @@ def conditional_routing(state: TopicsState):
 workflow_topics = StateGraph(TopicsState)
 
 # agregar nodos
-workflow_topics.add_node("initialize", initialize_chat)
-workflow_topics.add_node("chatbot", chatbot)
+workflow_topics.add_node("initialize", instrument_node("topics_agent", initialize_chat))
+workflow_topics.add_node("chatbot", instrument_node("topics_agent", chatbot))
 
 # Definir el flujo
 
@@ -271,15 +328,27 @@ workflow_topics.add_conditional_edges(
 workflow_topics.add_edge("initialize", END)
 workflow_topics.add_edge("chatbot", END)
 
-# Compilar el agente
-topics_agent = workflow_topics.compile()
-topics_agent.name = "Topics Generation"
+
+def compile_with_checkpointer(workflow: StateGraph, name: str, checkpointer):
+    """Compila el flujo con un checkpointer, reutilizando el grafo mientras no cambie."""
+
+    def factory():
+        agent = workflow.compile(checkpointer=checkpointer)
+        agent.name = name
+        return agent, []
+
+    return registry.get(f"{name} (checkpointed)", str(id(checkpointer)), factory)
+
+
+def get_topics_agent_with_memory():
+    """Agente de chat compilado con el checkpointer de conversaciones del proceso."""
+    return compile_with_checkpointer(workflow_topics, AGENTS["topics_agent"][1], get_checkpointer())
 
 
 
 # Funciones para el flujo de extracion de topics
 
-def topics_from_training_description_node(state: GenerateTopicsState) -> GenerateTopicsState:
+async def topics_from_training_description_node(state: GenerateTopicsState) -> GenerateTopicsState:
     """Generar topics desde la descripción de la formación."""
     model = load_model()
     
@@ -287,45 +356,58 @@ def topics_from_training_description_node(state: GenerateTopicsState) -> Generat
     logging.info(state)
     nuevo_estado = state.copy()
     
-    prompt = TOPICS_FROM_TRAINING_DESCRIPTION_PROMPT.format(training_name=nuevo_estado["training_name"], description=nuevo_estado["description"])
-    response = model.invoke(prompt)
-
-    if not response or not response.content:
-        print("No se recibió respuesta del modelo")
-        nuevo_estado["status"] = "error"
-    else:
-        result = json.loads(response.content)
-        nuevo_estado["topics_json"] = result
+    prompt = render_prompt(TOPICS_FROM_TRAINING_DESCRIPTION_PROMPT, training_name=nuevo_estado["training_name"], description=nuevo_estado["description"])
+    try:
+        result = await ainvoke_structured(model, prompt, TrainingTopics)
+        nuevo_estado["topics_json"] = result.model_dump()
         nuevo_estado["status"] = "generated"
-        return nuevo_estado
+    except Exception as e:
+        logging.error(f"Error generando topics desde la descripción: {str(e)}")
+        nuevo_estado["status"] = "error"
+    return nuevo_estado
 
 
-def save_embeddings_node(state: GenerateTopicsState) -> GenerateTopicsState:
+async def save_embeddings_node(state: GenerateTopicsState) -> GenerateTopicsState:
     """Guardar embeddings en Azure Search."""
     logging.info("Guardando embeddings en Azure Search...")
     logging.info(state)
     nuevo_estado = state.copy()
-    nuevo_estado["document_id"] = str(uuid.uuid4())
-    save_embeddings(nuevo_estado["document_id"], nuevo_estado["url"])
+    # Una URL ya indexada conserva su document_id y solo se reindexan los fragmentos que cambian
+    nuevo_estado["document_id"] = await asyncio.to_thread(document_id_for, nuevo_estado["url"])
+    # Publicar el progreso de la ingesta como eventos "custom" del stream del grafo
+    writer = get_stream_writer()
+    nuevo_estado["progress"] = await asave_embeddings(
+        nuevo_estado["document_id"],
+        nuevo_estado["url"],
+        on_progress=lambda progress: writer({"progress": progress}),
+    )
     nuevo_estado["status"] = "saved"
     return nuevo_estado
 
-def generate_topics_node(state: GenerateTopicsState) -> GenerateTopicsState:
+async def generate_topics_node(state: GenerateTopicsState) -> GenerateTopicsState:
     """Generar topics."""
     logging.info("Generando topics...")
     logging.info(state)
     nuevo_estado = state.copy()
-    topics_list = generate_topics(nuevo_estado["document_id"])
+    topics_list = await agenerate_topics(nuevo_estado["document_id"])
     nuevo_estado["topics_list"] = topics_list
     nuevo_estado["status"] = "generated"
     return nuevo_estado
 
-def generate_json_topics_node(state: GenerateTopicsState) -> GenerateTopicsState:
+async def reduce_topics_node(state: GenerateTopicsState) -> GenerateTopicsState:
+    """Deduplicar y fusionar los topics por fragmento antes de generar el JSON."""
+    logging.info("Reduciendo topics...")
+    nuevo_estado = state.copy()
+    nuevo_estado["topics_list"] = await areduce_topics(nuevo_estado["topics_list"])
+    nuevo_estado["status"] = "reduced"
+    return nuevo_estado
+
+async def generate_json_topics_node(state: GenerateTopicsState) -> GenerateTopicsState:
     """Generar JSON de topics."""
     logging.info("Generando JSON de topics...")
     logging.info(state)
     nuevo_estado = state.copy()
-    topics_json = generate_json_topics(nuevo_estado["topics_list"], nuevo_estado["training_name"], nuevo_estado["description"], nuevo_estado["url"])
+    topics_json = await agenerate_json_topics(nuevo_estado["topics_list"], nuevo_estado["training_name"], nuevo_estado["description"], nuevo_estado["url"])
     nuevo_estado["topics_json"] = topics_json
     nuevo_estado["status"] = "generated_json"
     return nuevo_estado
@@ -339,10 +421,11 @@ def route(state: GenerateTopicsState):
 workflow_content = StateGraph(GenerateTopicsState)
     
 # Añadir nodos
-workflow_content.add_node("topics_from_training_description", topics_from_training_description_node)
-workflow_content.add_node("save_embeddings", save_embeddings_node)
-workflow_content.add_node("generate_topics", generate_topics_node)
-workflow_content.add_node("generate_json_topics", generate_json_topics_node)
+workflow_content.add_node("topics_from_training_description", instrument_node("content_agent", topics_from_training_description_node))
+workflow_content.add_node("save_embeddings", instrument_node("content_agent", save_embeddings_node))
+workflow_content.add_node("generate_topics", instrument_node("content_agent", generate_topics_node))
+workflow_content.add_node("reduce_topics", instrument_node("content_agent", reduce_topics_node))
+workflow_content.add_node("generate_json_topics", instrument_node("content_agent", generate_json_topics_node))
     
 # Definir transiciones
 workflow_content.add_conditional_edges(
@@ -356,33 +439,96 @@ workflow_content.add_conditional_edges(
 workflow_content.add_edge("topics_from_training_description", END)
 
 workflow_content.add_edge("save_embeddings", "generate_topics")
-workflow_content.add_edge("generate_topics", "generate_json_topics")
+workflow_content.add_edge("generate_topics", "reduce_topics")
+workflow_content.add_edge("reduce_topics", "generate_json_topics")
 
 workflow_content.add_edge("generate_json_topics", END)
-    
-# Estado inicial
-content_agent = workflow_content.compile()
-content_agent.name = "Content Extraction"
 
 
-def feedback_node(state: FeedbackState) -> FeedbackState:
+def get_content_agent_with_checkpoints():
+    """Agente de contenido con checkpoints por nodo, para reanudar trabajos en segundo plano."""
+    checkpointer = get_checkpointer(Config.JOBS_CHECKPOINT_PATH, name="jobs_checkpointer")
+    return compile_with_checkpointer(workflow_content, AGENTS["content_agent"][1], checkpointer)
+
+
+async def feedback_node(state: FeedbackState) -> FeedbackState:
     """Generar feedback."""
     model = load_model()
 
     logging.info("Generando feedback...")
     logging.info(state)
     nuevo_estado = state.copy()
-    prompt = FEEDBACK_PROMPT.format(cuestionario=nuevo_estado["cuestionario"])
-    response = model.invoke(prompt)
+    prompt = render_prompt(FEEDBACK_PROMPT, cuestionario=nuevo_estado["cuestionario"])
+    response = await model.ainvoke(prompt)
     nuevo_estado["feedback"] = response.content
     nuevo_estado["status"] = "generated"
     return nuevo_estado
 
 workflow_feedback = StateGraph(FeedbackState)
-workflow_feedback.add_node("feedback_node", feedback_node)
+workflow_feedback.add_node("feedback_node", instrument_node("feedback_agent", feedback_node))
 
 workflow_feedback.add_edge(START, "feedback_node")
 workflow_feedback.add_edge("feedback_node", END)
 
-feedback_agent = workflow_feedback.compile()
-feedback_agent.name = "Feedback"
+
+# Flujo de cada agente y nombre con el que se publica. Se compilan en su primer
+# uso para que importar este módulo (y arrancar un worker) sea barato.
+AGENTS: Dict[str, Tuple[StateGraph, str]] = {
+    "question_agent": (workflow, "Question Generation"),
+    "bulk_question_agent": (workflow_bulk_questions, "Bulk Question Generation"),
+    "topics_agent": (workflow_topics, "Topics Generation"),
+    "content_agent": (workflow_content, "Content Extraction"),
+    "feedback_agent": (workflow_feedback, "Feedback"),
+}
+
+# Módulos pesados que los clientes importan en su primer uso
+LAZY_MODULES = (
+    "react_agent.chat_model",
+    "langchain_openai",
+    "langchain_community.vectorstores",
+    "pypdf",
+    "langchain_text_splitters",
+    "azure.cosmos",
+    "azure.cosmos.aio",
+)
+
+_compiled: Dict[str, CompiledStateGraph] = {}
+_compile_lock = threading.Lock()
+
+
+def get_agent(name: str) -> CompiledStateGraph:
+    """Agente `name` (clave de `AGENTS`), compilado la primera vez que se pide."""
+    agent = _compiled.get(name)
+    if agent is not None:
+        return agent
+    with _compile_lock:
+        if name not in _compiled:
+            graph, title = AGENTS[name]
+            agent = graph.compile()
+            agent.name = title
+            _compiled[name] = agent
+        return _compiled[name]
+
+
+def __getattr__(name: str) -> Any:
+    # Compatibilidad con `from react_agent.graph import topics_agent` y con langgraph.json
+    if name in AGENTS:
+        return get_agent(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def warm_up() -> None:
+    """Compila todos los agentes, tokeniza los prompts e importa los módulos pesados de antemano.
+
+    Con `preload_app` se ejecuta una vez en el master de gunicorn y los workers
+    lo heredan al hacer fork; los clientes, en cambio, se crean en cada worker.
+    """
+    for module in LAZY_MODULES:
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            logging.warning(f"No se pudo precargar {module}: {e}")
+    for name in AGENTS:
+        get_agent(name)
+    prompt_registry.warm_up()
+    logging.info("Agentes compilados, prompts tokenizados y módulos precargados")
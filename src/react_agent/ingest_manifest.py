@@ -0,0 +1,87 @@
+"""Manifest of the chunks indexed for each training URL.
+
+For every URL the manifest keeps the `document_id` it was indexed under and the
+chunks that were uploaded, mapping each content-derived chunk id to the key the
+vector store assigned to it. Re-ingesting the URL reuses the `document_id` and
+diffs the new chunks against this list. Entries are scoped to the vector store
+backend and index, so switching either starts from scratch.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from react_agent.clients import Closer, config_fingerprint, registry
+from react_agent.configuration import Config
+
+
+def store_scope() -> str:
+    """Vector store al que se refieren los manifiestos (backend e índice)."""
+    if Config.VECTOR_STORE_BACKEND == "local":
+        return f"local:{os.path.abspath(Config.LOCAL_VECTOR_STORE_PATH)}"
+    return f"azure:{Config.VECTOR_STORE_ADDRESS}/{Config.VECTOR_STORE_INDEX_NAME}"
+
+
+class IngestManifest:
+    """Fragmentos indexados por URL de formación, en SQLite."""
+
+    def __init__(self, path: str, store: str) -> None:
+        """Abre (o crea) el manifiesto en `path` para el vector store identificado por `store`."""
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.store = store
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS manifests ("
+            "store TEXT NOT NULL, url TEXT NOT NULL, document_id TEXT NOT NULL, chunks TEXT NOT NULL, "
+            "updated_at REAL NOT NULL, PRIMARY KEY (store, url))"
+        )
+        self._conn.commit()
+
+    def _get(self, url: str) -> Optional[Tuple[str, Dict[str, str]]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT document_id, chunks FROM manifests WHERE store = ? AND url = ?", (self.store, url)
+            ).fetchone()
+        return None if row is None else (row[0], json.loads(row[1]))
+
+    def document_id(self, url: str) -> Optional[str]:
+        """document_id con el que se indexó la URL por última vez."""
+        entry = self._get(url)
+        return None if entry is None else entry[0]
+
+    def chunks(self, url: str, document_id: str) -> Dict[str, str]:
+        """Fragmentos indexados de la URL (id -> clave en el vector store) si se indexó con ese document_id."""
+        entry = self._get(url)
+        return entry[1] if entry is not None and entry[0] == document_id else {}
+
+    def save(self, url: str, document_id: str, chunks: Dict[str, str]) -> None:
+        """Reemplaza el manifiesto de la URL tras una indexación completa."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO manifests (store, url, document_id, chunks, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (self.store, url, document_id, json.dumps(chunks), time.time()),
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        """Cierra la conexión a SQLite."""
+        with self._lock:
+            self._conn.close()
+
+
+def get_ingest_manifest() -> IngestManifest:
+    """Manifiesto de indexación compartido por el proceso."""
+    store = store_scope()
+    fingerprint = config_fingerprint(Config.INGEST_MANIFEST_PATH, store)
+
+    def factory() -> Tuple[IngestManifest, List[Closer]]:
+        manifest = IngestManifest(Config.INGEST_MANIFEST_PATH, store)
+        return manifest, [manifest.close]
+
+    return registry.get("ingest_manifest", fingerprint, factory)
@@ -0,0 +1,185 @@
+"""Streaming ingestion pipeline for training PDFs.
+
+Pages are parsed lazily, split into chunks, embedded in batches and uploaded in
+batches. Each stage runs as its own task connected by bounded queues, so only a
+few batches are held in memory at any time and parsing, embedding and uploading
+overlap.
+
+Chunk ids are derived from the chunk text, so re-ingesting an updated PDF with
+the index of what was already uploaded only embeds and uploads new chunks and
+deletes the ones that disappeared.
+"""
+
+import asyncio
+import hashlib
+import logging
+import unicodedata
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from langchain_core.documents import Document
+
+from react_agent.configuration import Config
+from react_agent.instrumentation import track_call
+from react_agent.pdf_extraction import extract_pages
+
+ProgressCallback = Callable[[Dict[str, int]], None]
+
+_DONE = object()
+
+
+def chunk_id(document_id: str, text: str) -> str:
+    """Id de un fragmento a partir de su texto normalizado: no cambia mientras el texto no cambie."""
+    normalized = " ".join(unicodedata.normalize("NFC", text).split())
+    return f"{document_id}_{hashlib.sha256(normalized.encode('utf-8')).hexdigest()[:32]}"
+
+
+def iter_pages(pdf_path: str) -> Iterator[Document]:
+    """Itera las páginas del PDF en orden; el texto se extrae en el pool de procesos o sale del caché."""
+    yield from extract_pages(pdf_path)
+
+
+def iter_chunks(pages: Iterable[Document], document_id: str, progress: Dict[str, int]) -> Iterator[Document]:
+    """Divide cada página en fragmentos con los metadatos de indexación."""
+    from langchain_text_splitters import CharacterTextSplitter
+
+    text_splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+    i = 0
+    for page in pages:
+        progress["pages"] += 1
+        for doc in text_splitter.split_documents([page]):
+            yield Document(
+                page_content=doc.page_content,
+                metadata={
+                    "id": chunk_id(document_id, doc.page_content),
+                    "document_id": document_id,
+                    "page_number": i + 1,
+                },
+            )
+            i += 1
+            progress["chunks"] += 1
+
+
+def iter_batches(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Agrupa un iterable en listas de como máximo `size` elementos."""
+    batch: List[Any] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def stream_embeddings(
+    document_id: str,
+    pdf_path: str,
+    embeddings: Any,
+    vector_store: Any,
+    *,
+    embedding_batch_size: Optional[int] = None,
+    upload_batch_size: Optional[int] = None,
+    queue_size: Optional[int] = None,
+    on_progress: Optional[ProgressCallback] = None,
+    chunks: Optional[Dict[str, str]] = None,
+) -> Dict[str, int]:
+    """Indexa un PDF en streaming: página -> fragmentos -> embeddings -> subida.
+
+    `chunks` son los fragmentos ya indexados del documento (id -> clave en el
+    vector store): se saltan los que siguen en el PDF, se eliminan los que ya no
+    están y el diccionario se actualiza con el resultado.
+
+    Devuelve los contadores finales de progreso (páginas, fragmentos, fragmentos
+    embebidos y subidos, sin cambios y eliminados).
+    """
+    embedding_batch_size = embedding_batch_size or Config.INGEST_EMBEDDING_BATCH_SIZE
+    upload_batch_size = upload_batch_size or Config.INGEST_UPLOAD_BATCH_SIZE
+    queue_size = queue_size or Config.INGEST_QUEUE_SIZE
+
+    progress = {"pages": 0, "chunks": 0, "embedded": 0, "uploaded": 0, "unchanged": 0, "removed": 0}
+    known = dict(chunks or {})
+    seen: Set[str] = set()
+    embed_queue: asyncio.Queue[Any] = asyncio.Queue(maxsize=queue_size)
+    upload_queue: asyncio.Queue[Any] = asyncio.Queue(maxsize=queue_size)
+
+    def report() -> None:
+        if on_progress is not None:
+            on_progress(dict(progress))
+
+    def changed(docs: Iterable[Document]) -> Iterator[Document]:
+        for doc in docs:
+            key = doc.metadata["id"]
+            # Un texto repetido dentro del documento se indexa una sola vez
+            if key in seen:
+                continue
+            seen.add(key)
+            if key in known:
+                progress["unchanged"] += 1
+                continue
+            yield doc
+
+    async def parse() -> None:
+        # El parseo del PDF es bloqueante: cada lote se produce en un hilo aparte
+        batches = iter_batches(changed(iter_chunks(iter_pages(pdf_path), document_id, progress)), embedding_batch_size)
+        while True:
+            with track_call("pdf", "parse_batch"):
+                batch = await asyncio.to_thread(next, batches, None)
+            if batch is None:
+                break
+            await embed_queue.put(batch)
+        await embed_queue.put(_DONE)
+
+    async def embed() -> None:
+        while (batch := await embed_queue.get()) is not _DONE:
+            with track_call("embeddings", "embed_documents"):
+                vectors = await embeddings.aembed_documents([doc.page_content for doc in batch])
+            progress["embedded"] += len(batch)
+            await upload_queue.put(list(zip(batch, vectors)))
+            report()
+        await upload_queue.put(_DONE)
+
+    async def upload() -> None:
+        pending: List[Tuple[Document, List[float]]] = []
+
+        async def flush(size: int) -> None:
+            batch = pending[:size]
+            ids = [doc.metadata["id"] for doc, _ in batch]
+            with track_call("vector_store", "add_embeddings"):
+                keys = await vector_store.aadd_embeddings(
+                    [(doc.page_content, vector) for doc, vector in batch],
+                    [doc.metadata for doc, _ in batch],
+                    keys=ids,
+                )
+            if chunks is not None:
+                chunks.update(zip(ids, keys or ids))
+            del pending[:size]
+            progress["uploaded"] += len(batch)
+            report()
+
+        while (items := await upload_queue.get()) is not _DONE:
+            pending.extend(items)
+            while len(pending) >= upload_batch_size:
+                await flush(upload_batch_size)
+        if pending:
+            await flush(len(pending))
+
+    tasks = [asyncio.create_task(stage()) for stage in (parse, embed, upload)]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    # Los fragmentos que ya no están en el PDF se eliminan después de subir los nuevos
+    removed = [key for key in known if key not in seen]
+    if removed:
+        with track_call("vector_store", "delete"):
+            await vector_store.adelete([known[key] for key in removed])
+        if chunks is not None:
+            for key in removed:
+                del chunks[key]
+    progress["removed"] = len(removed)
+    report()
+
+    logging.info(f"Documento {document_id} indexado: {progress}")
+    return progress
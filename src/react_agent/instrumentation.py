@@ -0,0 +1,281 @@
+"""Latency, token and cost instrumentation for the agents.
+
+Every graph node is wrapped to record its wall time, every chat model call is
+observed through a LangChain callback to count tokens and cost, and calls to
+downstream services (embeddings, vector store, Cosmos DB, PDF parsing) are
+timed where they are made. Metrics are exported in Prometheus format and each
+measured step is also an OpenTelemetry span.
+
+Both `prometheus-client` and `opentelemetry-api` are optional: without them
+the instrumentation becomes a no-op.
+"""
+
+import contextvars
+import functools
+import inspect
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langgraph.config import get_config
+
+from react_agent.configuration import Config
+
+try:
+    import prometheus_client
+except ImportError:
+    prometheus_client = None
+
+try:
+    from opentelemetry import trace
+except ImportError:
+    trace = None
+
+
+class _NullMetric:
+    """Métrica vacía cuando `prometheus-client` no está instalado."""
+
+    def labels(self, *args: Any, **kwargs: Any) -> "_NullMetric":
+        return self
+
+    def observe(self, value: float) -> None:
+        pass
+
+    def inc(self, value: float = 1) -> None:
+        pass
+
+
+def _histogram(name: str, documentation: str, labels: Tuple[str, ...]) -> Any:
+    if prometheus_client is None:
+        return _NullMetric()
+    return prometheus_client.Histogram(name, documentation, labels)
+
+
+def _counter(name: str, documentation: str, labels: Tuple[str, ...]) -> Any:
+    if prometheus_client is None:
+        return _NullMetric()
+    return prometheus_client.Counter(name, documentation, labels)
+
+
+NODE_DURATION = _histogram(
+    "agent_node_duration_seconds", "Duración de cada nodo de los agentes", ("agent", "node", "status")
+)
+DOWNSTREAM_DURATION = _histogram(
+    "downstream_call_duration_seconds", "Duración de las llamadas a servicios externos", ("service", "operation", "status")
+)
+HTTP_REQUEST_DURATION = _histogram(
+    "http_request_duration_seconds", "Duración de las peticiones HTTP", ("method", "route", "status")
+)
+LLM_TOKENS = _counter("llm_tokens_total", "Tokens consumidos por el LLM", ("agent", "node", "model", "type"))
+LLM_COST = _counter("llm_cost_total", "Coste estimado de las llamadas al LLM", ("agent", "node", "model"))
+LLM_RETRIES = _counter("llm_retries_total", "Reintentos de llamadas al LLM por 429", ("agent", "node"))
+SEMANTIC_CACHE_REQUESTS = _counter(
+    "semantic_cache_requests_total", "Consultas al caché semántico de respuestas del chat", ("result",)
+)
+SEMANTIC_CACHE_SAVED_SECONDS = _counter(
+    "semantic_cache_saved_seconds_total", "Latencia ahorrada por las respuestas servidas desde el caché semántico", ()
+)
+COALESCED_CALLS = _counter(
+    "coalesced_calls_total", "Llamadas servidas por otra idéntica que ya estaba en vuelo", ("operation", "agent", "node")
+)
+FETCH_CACHE_REQUESTS = _counter(
+    "fetch_cache_requests_total", "Descargas de documentos fuente según el caché local (revalidated, miss, stale)", ("result",)
+)
+PROMPT_TOKENS = _counter(
+    "prompt_tokens_total",
+    "Tokens de entrada por plantilla: parte fija y variable al renderizar, enviados y servidos del caché del proveedor",
+    ("template", "part"),
+)
+
+# Nodo en ejecución, para etiquetar las llamadas al LLM y a servicios externos que hace
+_current_node: contextvars.ContextVar[Tuple[str, str]] = contextvars.ContextVar("current_node", default=("", ""))
+
+
+def current_node() -> Tuple[str, str]:
+    """Agente y nodo en ejecución en el contexto actual."""
+    return _current_node.get()
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Any]:
+    """Span de OpenTelemetry (no-op sin `opentelemetry-api`)."""
+    if trace is None:
+        yield None
+        return
+    with trace.get_tracer("react_agent").start_as_current_span(name, attributes=attributes) as current:
+        yield current
+
+
+@contextmanager
+def track_call(service: str, operation: str) -> Iterator[None]:
+    """Mide una llamada a un servicio externo como métrica y como span."""
+    start = time.perf_counter()
+    status = "ok"
+    with span(f"{service}.{operation}", service=service, operation=operation):
+        try:
+            yield
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            DOWNSTREAM_DURATION.labels(service, operation, status).observe(time.perf_counter() - start)
+
+
+def record_retry() -> None:
+    """Cuenta un reintento de llamada al LLM en el nodo actual."""
+    LLM_RETRIES.labels(*current_node()).inc()
+
+
+def _node_name(func: Callable) -> str:
+    """Nombre del nodo en el grafo (el de la función si se llama fuera de LangGraph)."""
+    try:
+        return get_config()["metadata"]["langgraph_node"]
+    except (RuntimeError, KeyError):
+        return func.__name__
+
+
+def instrument_node(agent: str, func: Callable) -> Callable:
+    """Envuelve un nodo del grafo para medir su duración y abrir un span por ejecución."""
+
+    @contextmanager
+    def measure() -> Iterator[None]:
+        node = _node_name(func)
+        token = _current_node.set((agent, node))
+        start = time.perf_counter()
+        status = "ok"
+        with span(f"{agent}.{node}", agent=agent, node=node):
+            try:
+                yield
+            except BaseException:
+                status = "error"
+                raise
+            finally:
+                NODE_DURATION.labels(agent, node, status).observe(time.perf_counter() - start)
+                _current_node.reset(token)
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+            with measure():
+                return await func(*args, **kwargs)
+
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        with measure():
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """Callback de LangChain que mide la latencia y los tokens de cada llamada al modelo."""
+
+    # Se ejecuta en el propio contexto de la llamada para leer el nodo en curso
+    run_inline = True
+
+    def __init__(self) -> None:
+        """Crea el handler sin llamadas en curso."""
+        self._runs: Dict[UUID, Tuple[float, Tuple[str, str], str, Any]] = {}
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        """Anota el inicio de la llamada, su nodo y su plantilla, y abre su span."""
+        labels = current_node()
+        template = _prompt_template(messages)
+        current = None
+        if trace is not None:
+            current = trace.get_tracer("react_agent").start_span(
+                "azure_openai.chat", attributes={"agent": labels[0], "node": labels[1], "template": template}
+            )
+        self._runs[run_id] = (time.perf_counter(), labels, template, current)
+
+    def _finish(self, run_id: UUID, status: str) -> Optional[Tuple[Tuple[str, str], str]]:
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return None
+        start, labels, template, current = run
+        DOWNSTREAM_DURATION.labels("azure_openai", "chat", status).observe(time.perf_counter() - start)
+        if current is not None:
+            current.end()
+        return labels, template
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        """Registra la latencia, los tokens y el coste de la llamada terminada."""
+        run = self._finish(run_id, "ok")
+        if run is None:
+            return
+        if (response.llm_output or {}).get("coalesced"):
+            # Los tokens ya se contaron en la llamada que se compartió
+            return
+        labels, template = run
+        prompt_tokens, cached_tokens, completion_tokens = _token_usage(response)
+        model = (response.llm_output or {}).get("model_name") or Config.AZURE_DEPLOYMENT_NAME or ""
+        LLM_TOKENS.labels(*labels, model, "prompt").inc(prompt_tokens)
+        LLM_TOKENS.labels(*labels, model, "cached_prompt").inc(cached_tokens)
+        LLM_TOKENS.labels(*labels, model, "completion").inc(completion_tokens)
+        LLM_COST.labels(*labels, model).inc(
+            (prompt_tokens - cached_tokens) / 1000 * Config.LLM_PROMPT_COST_PER_1K
+            + cached_tokens / 1000 * Config.LLM_CACHED_PROMPT_COST_PER_1K
+            + completion_tokens / 1000 * Config.LLM_COMPLETION_COST_PER_1K
+        )
+        if template:
+            PROMPT_TOKENS.labels(template, "sent").inc(prompt_tokens)
+            PROMPT_TOKENS.labels(template, "cached").inc(cached_tokens)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        """Registra la latencia de la llamada fallida."""
+        self._finish(run_id, "error")
+
+
+# Prefijo del id del mensaje fijo de un prompt del registro (no se envía al modelo)
+PROMPT_MESSAGE_ID_PREFIX = "prompt:"
+
+
+def _prompt_template(messages: Any) -> str:
+    """Nombre de la plantilla del registro con la que se construyó la llamada ("" si ninguna)."""
+    for batch in messages or []:
+        for message in batch:
+            message_id = getattr(message, "id", None) or ""
+            if message_id.startswith(PROMPT_MESSAGE_ID_PREFIX):
+                return message_id[len(PROMPT_MESSAGE_ID_PREFIX):]
+    return ""
+
+
+def _token_usage(response: LLMResult) -> Tuple[int, int, int]:
+    """Tokens de entrada, de entrada servidos del caché del proveedor y de salida de la respuesta.
+
+    Se leen de `token_usage` o, en streaming, de `usage_metadata`.
+    """
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    if usage:
+        cached_tokens = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+        return usage.get("prompt_tokens", 0), cached_tokens, usage.get("completion_tokens", 0)
+    prompt_tokens = cached_tokens = completion_tokens = 0
+    for generations in response.generations:
+        for generation in generations:
+            metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+            prompt_tokens += metadata.get("input_tokens", 0)
+            cached_tokens += (metadata.get("input_token_details") or {}).get("cache_read") or 0
+            completion_tokens += metadata.get("output_tokens", 0)
+    return prompt_tokens, cached_tokens, completion_tokens
+
+
+metrics_callback = MetricsCallbackHandler()
+
+
+def metrics_payload() -> Tuple[bytes, str]:
+    """Métricas en formato de texto de Prometheus, agregando los workers en modo multiproceso."""
+    if prometheus_client is None:
+        return "# prometheus-client no está instalado\n".encode(), "text/plain; charset=utf-8"
+    registry = prometheus_client.REGISTRY
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return prometheus_client.generate_latest(registry), prometheus_client.CONTENT_TYPE_LATEST
@@ -0,0 +1,244 @@
+"""Background job queue for long-running agent pipelines.
+
+Jobs are stored in a SQLite table shared by every worker process. Each process
+runs a small pool of asyncio workers that claim queued jobs, respecting a
+per-tenant limit of concurrently running jobs. While a job runs, its worker
+refreshes a heartbeat. A job whose heartbeat goes stale (for example because
+the gunicorn worker was recycled) is queued again and resumes from its last
+graph checkpoint, up to `JOBS_MAX_ATTEMPTS` attempts: after that it is marked
+as failed, so a job that keeps crashing its worker is not retried forever.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+
+from react_agent.configuration import Config
+
+JobRunner = Callable[[str, Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+class JobStore:
+    """Tabla persistente de trabajos en SQLite."""
+
+    def __init__(self, path: str) -> None:
+        """Abre (o crea) la tabla de trabajos en la base de datos SQLite `path`."""
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                tenant_id TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                status TEXT NOT NULL,
+                input TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                callback_url TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+
+    def create(self, kind: str, tenant_id: str, job_input: Dict[str, Any], callback_url: Optional[str] = None) -> str:
+        """Registra un trabajo nuevo en estado `queued` y devuelve su id."""
+        job_id = str(uuid.uuid4())
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, tenant_id, kind, status, input, callback_url, created_at, updated_at) "
+                "VALUES (?, ?, ?, 'queued', ?, ?, ?, ?)",
+                (job_id, tenant_id, kind, json.dumps(job_input), callback_url, now, now),
+            )
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Devuelve el trabajo con su entrada y resultado deserializados."""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["input"] = json.loads(job["input"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def claim(
+        self, kind: str, max_per_tenant: int, stale_after: float, max_attempts: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Reclama de forma atómica el trabajo en cola más antiguo cuyo tenant tenga hueco.
+
+        Antes se devuelven a la cola los trabajos cuyo latido lleva más de
+        `stale_after` segundos sin actualizarse, salvo los que ya han agotado
+        `max_attempts` intentos (sin límite si es None), que se marcan como fallidos.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if max_attempts is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'failed', error = ?, updated_at = ? "
+                        "WHERE kind = ? AND status = 'running' AND updated_at < ? AND attempts >= ?",
+                        (f"Abandonado tras {max_attempts} intentos sin terminar", now, kind, now - stale_after, max_attempts),
+                    )
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'queued', updated_at = ? WHERE kind = ? AND status = 'running' AND updated_at < ?",
+                    (now, kind, now - stale_after),
+                )
+                row = self._conn.execute(
+                    """
+                    SELECT j.id FROM jobs j
+                    WHERE j.kind = ? AND j.status = 'queued'
+                      AND (SELECT COUNT(*) FROM jobs r WHERE r.kind = j.kind AND r.tenant_id = j.tenant_id AND r.status = 'running') < ?
+                    ORDER BY j.created_at
+                    LIMIT 1
+                    """,
+                    (kind, max_per_tenant),
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'running', attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                        (now, row["id"]),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self.get(row["id"]) if row is not None else None
+
+    def heartbeat(self, job_id: str) -> None:
+        """Actualiza el latido de un trabajo en ejecución."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET updated_at = ? WHERE id = ? AND status = 'running'", (time.time(), job_id)
+            )
+
+    def finish(self, job_id: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+        """Marca el trabajo como terminado con su resultado o su error."""
+        status = "failed" if error is not None else "succeeded"
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), job_id),
+            )
+
+    def close(self) -> None:
+        """Cierra la conexión a SQLite."""
+        with self._lock:
+            self._conn.close()
+
+
+class JobManager:
+    """Pool local de workers asyncio que ejecutan los trabajos de un tipo."""
+
+    def __init__(self, store: JobStore, kind: str, runner: JobRunner, *, workers: int, max_per_tenant: int) -> None:
+        """Prepara `workers` workers para los trabajos `kind`; se arrancan con `start`."""
+        self.store = store
+        self.kind = kind
+        self.runner = runner
+        self.workers = workers
+        self.max_per_tenant = max_per_tenant
+        self._wakeup = asyncio.Event()
+        self._tasks: list[asyncio.Task[None]] = []
+
+    async def submit(self, tenant_id: str, job_input: Dict[str, Any], callback_url: Optional[str] = None) -> str:
+        """Encola un trabajo y despierta a los workers locales."""
+        job_id = await asyncio.to_thread(self.store.create, self.kind, tenant_id, job_input, callback_url)
+        self._wakeup.set()
+        return job_id
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Consulta un trabajo sin bloquear el event loop."""
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    def start(self) -> None:
+        """Arranca los workers del proceso."""
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Detiene los workers; los trabajos en curso se reanudarán cuando su latido caduque."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _work(self) -> None:
+        while True:
+            job = await asyncio.to_thread(
+                self.store.claim, self.kind, self.max_per_tenant, Config.JOBS_STALE_AFTER, Config.JOBS_MAX_ATTEMPTS
+            )
+            if job is None:
+                # Sin trabajos disponibles: esperar a un submit local o al siguiente sondeo
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=Config.JOBS_POLL_INTERVAL)
+                except TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        job_id = job["id"]
+        logging.info(f"Ejecutando el trabajo {job_id} (intento {job['attempts']})")
+
+        async def beat() -> None:
+            while True:
+                await asyncio.sleep(Config.JOBS_HEARTBEAT_INTERVAL)
+                await asyncio.to_thread(self.store.heartbeat, job_id)
+
+        heartbeat = asyncio.create_task(beat())
+        try:
+            result = await self.runner(job_id, job["input"])
+            await asyncio.to_thread(self.store.finish, job_id, result)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"El trabajo {job_id} falló: {e}")
+            await asyncio.to_thread(self.store.finish, job_id, None, str(e))
+        finally:
+            heartbeat.cancel()
+        if job.get("callback_url"):
+            await notify_callback(job["callback_url"], public_job(await self.get(job_id)))
+
+
+def public_job(job: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Representación del trabajo que se devuelve al cliente."""
+    if job is None:
+        return None
+    return {
+        "job_id": job["id"],
+        "tenant_id": job["tenant_id"],
+        "status": job["status"],
+        "result": job["result"],
+        "error": job["error"],
+        "attempts": job["attempts"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }
+
+
+async def notify_callback(url: str, payload: Optional[Dict[str, Any]]) -> None:
+    """Envía el estado final del trabajo al callback (best-effort)."""
+    try:
+        async with httpx.AsyncClient(timeout=Config.HTTP_TIMEOUT) as client:
+            response = await client.post(url, json=payload)
+            response.raise_for_status()
+    except Exception as e:
+        logging.warning(f"No se pudo notificar el callback {url}: {e}")
@@ -0,0 +1,314 @@
+"""In-process vector store backed by a memory-mapped NumPy matrix.
+
+Vectors are appended to a raw float32 file and documents to a JSON Lines file
+next to it, so every upload batch is persisted as soon as it is written and
+other processes pick up new rows on their next search. Searches scoped to a
+`document_id` are exact over that document's rows. Unscoped searches over large
+indexes go through an IVF (inverted file) index trained with k-means, probing
+only the closest clusters.
+
+Files are never rewritten: adding an id again supersedes its previous row, and
+deletions are appended to a tombstone file that hides the rows written before.
+"""
+
+import asyncio
+import fcntl
+import json
+import os
+import re
+import threading
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from react_agent.configuration import Config
+
+_DOCUMENT_FILTER = re.compile(r"^\s*metadata/document_id eq '((?:[^']|'')*)'\s*$")
+
+# Iteraciones de k-means al entrenar el índice IVF y muestra máxima usada
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_ROWS = 50000
+
+
+def parse_document_filter(filters: Optional[str]) -> Optional[str]:
+    """Extrae el document_id de un filtro OData `metadata/document_id eq '...'`."""
+    if not filters:
+        return None
+    match = _DOCUMENT_FILTER.match(filters)
+    if match is None:
+        raise ValueError(f"Filtro no soportado por el vector store local: {filters}")
+    return match.group(1).replace("''", "'")
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class IVFIndex:
+    """Índice IVF: centroides de k-means y lista de filas por centroide."""
+
+    def __init__(self, matrix: np.ndarray, nlist: int, seed: int = 0) -> None:
+        """Entrena `nlist` centroides con una muestra de `matrix` y asigna todas sus filas."""
+        rng = np.random.default_rng(seed)
+        sample = matrix[rng.choice(len(matrix), size=min(len(matrix), KMEANS_SAMPLE_ROWS), replace=False)]
+        centroids = np.array(sample[rng.choice(len(sample), size=nlist, replace=False)])
+        for _ in range(KMEANS_ITERATIONS):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            for cluster in range(nlist):
+                members = sample[assignment == cluster]
+                if len(members):
+                    centroids[cluster] = members.mean(axis=0)
+            centroids = _normalize_rows(centroids)
+        self.centroids = centroids.astype(np.float32)
+        self.lists: List[List[int]] = [[] for _ in range(nlist)]
+        self.size = 0
+        self.trained_rows = len(matrix)
+        self.add(matrix, 0)
+
+    def add(self, vectors: np.ndarray, start: int) -> None:
+        """Asigna filas nuevas a su centroide más cercano."""
+        for offset, cluster in enumerate(np.argmax(vectors @ self.centroids.T, axis=1)):
+            self.lists[cluster].append(start + offset)
+        self.size = start + len(vectors)
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """Filas de los `nprobe` clusters más cercanos a la consulta."""
+        probes = np.argsort(-(self.centroids @ query))[:nprobe]
+        return np.fromiter((row for cluster in probes for row in self.lists[cluster]), dtype=np.int64)
+
+
+class LocalVectorStore(VectorStore):
+    """Vector store local persistido en `path`, compatible con la interfaz de AzureSearch que usa el agente."""
+
+    def __init__(self, path: str, embedding: Embeddings) -> None:
+        """Abre el índice guardado en `path` (o lo crea vacío); las filas se leen en el primer uso."""
+        self.path = path
+        self.embedding = embedding
+        os.makedirs(path, exist_ok=True)
+        self._vectors_path = os.path.join(path, "vectors.f32")
+        self._docs_path = os.path.join(path, "docs.jsonl")
+        self._meta_path = os.path.join(path, "meta.json")
+        self._lock_path = os.path.join(path, "write.lock")
+        self._deleted_path = os.path.join(path, "deleted.jsonl")
+        self._lock = threading.Lock()
+        self._dimensions: Optional[int] = None
+        self._docs: List[Tuple[str, Dict[str, Any]]] = []
+        self._rows_by_document: Dict[str, List[int]] = {}
+        self._docs_offset = 0
+        self._deleted_offset = 0
+        # Fila vigente de cada id, filas sustituidas o eliminadas y, por id, filas anteriores a su borrado
+        self._live: Dict[str, int] = {}
+        self._dead: Set[int] = set()
+        self._tombstones: Dict[str, int] = {}
+        self._matrix: Optional[np.ndarray] = None
+        self._ivf: Optional[IVFIndex] = None
+
+    @property
+    def embeddings(self) -> Embeddings:
+        """Modelo de embeddings con el que se vectorizan los textos y las consultas."""
+        return self.embedding
+
+    def _refresh(self) -> None:
+        """Carga las filas añadidas al disco desde la última lectura (por este u otro proceso)."""
+        if self._dimensions is None and os.path.exists(self._meta_path):
+            with open(self._meta_path) as f:
+                self._dimensions = json.load(f)["dimensions"]
+        if self._dimensions is None or not os.path.exists(self._docs_path):
+            return
+        with open(self._docs_path, "rb") as f:
+            f.seek(self._docs_offset)
+            # Solo las líneas completas: el escritor añade los vectores antes que los documentos
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                record = json.loads(line)
+                row = len(self._docs)
+                self._docs.append((record["text"], record["metadata"]))
+                self._rows_by_document.setdefault(str(record["metadata"].get("document_id")), []).append(row)
+                self._docs_offset += len(line)
+                self._mark_live(record["id"], row)
+        self._refresh_deleted()
+        if self._matrix is None or len(self._matrix) != len(self._docs):
+            self._matrix = np.memmap(
+                self._vectors_path, dtype=np.float32, mode="r", shape=(len(self._docs), self._dimensions)
+            ) if self._docs else None
+            self._update_ivf()
+
+    def _mark_live(self, doc_id: str, row: int) -> None:
+        if row < self._tombstones.get(doc_id, 0):
+            self._dead.add(row)
+            return
+        previous = self._live.get(doc_id)
+        if previous is not None:
+            self._dead.add(previous)
+        self._live[doc_id] = row
+
+    def _refresh_deleted(self) -> None:
+        """Aplica los borrados añadidos al disco desde la última lectura."""
+        if not os.path.exists(self._deleted_path):
+            return
+        with open(self._deleted_path, "rb") as f:
+            f.seek(self._deleted_offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                record = json.loads(line)
+                self._deleted_offset += len(line)
+                # Las filas de ese id escritas antes del borrado dejan de existir, aunque aún no se hayan leído
+                self._tombstones[record["id"]] = max(self._tombstones.get(record["id"], 0), record["rows"])
+                row = self._live.get(record["id"])
+                if row is not None and row < record["rows"]:
+                    self._dead.add(self._live.pop(record["id"]))
+
+    def _without_dead(self, rows: np.ndarray) -> np.ndarray:
+        if not self._dead:
+            return rows
+        return rows[~np.isin(rows, np.fromiter(self._dead, dtype=np.int64, count=len(self._dead)))]
+
+    def _update_ivf(self) -> None:
+        matrix = self._matrix
+        if matrix is None or len(matrix) < Config.LOCAL_VECTOR_STORE_IVF_MIN_ROWS:
+            self._ivf = None
+        elif self._ivf is None or len(matrix) > 2 * self._ivf.trained_rows:
+            # Se reentrena al duplicarse el índice; entre tanto las filas nuevas se asignan a los centroides
+            self._ivf = IVFIndex(matrix, nlist=int(np.sqrt(len(matrix))))
+        elif len(matrix) > self._ivf.size:
+            self._ivf.add(matrix[self._ivf.size:], self._ivf.size)
+
+    def add_embeddings(
+        self,
+        text_embeddings: Iterable[Tuple[str, List[float]]],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        """Añade textos con sus embeddings ya calculados y los persiste."""
+        text_embeddings = list(text_embeddings)
+        if not text_embeddings:
+            return []
+        metadatas = metadatas or [{} for _ in text_embeddings]
+        vectors = _normalize_rows(np.asarray([vector for _, vector in text_embeddings], dtype=np.float32))
+        ids = [str(metadata.get("id") or uuid.uuid4()) for metadata in metadatas]
+        # El lock de fichero serializa las escrituras de varios workers sobre el mismo índice
+        with self._lock, open(self._lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self._refresh()
+            if self._dimensions is None:
+                self._dimensions = vectors.shape[1]
+                with open(self._meta_path, "w") as f:
+                    json.dump({"dimensions": self._dimensions}, f)
+            elif vectors.shape[1] != self._dimensions:
+                raise ValueError(f"Dimensión {vectors.shape[1]} distinta de la del índice ({self._dimensions})")
+            with open(self._vectors_path, "ab") as f:
+                # Descartar vectores huérfanos de una escritura interrumpida antes de añadir los nuevos
+                f.truncate(len(self._docs) * self._dimensions * vectors.itemsize)
+                f.write(vectors.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self._docs_path, "a", encoding="utf-8") as f:
+                for (text, _), metadata, doc_id in zip(text_embeddings, metadatas, ids):
+                    f.write(json.dumps({"id": doc_id, "text": text, "metadata": metadata}, ensure_ascii=False) + "\n")
+            self._refresh()
+        return ids
+
+    async def aadd_embeddings(
+        self,
+        text_embeddings: Iterable[Tuple[str, List[float]]],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        """Versión async de `add_embeddings`."""
+        return await asyncio.to_thread(self.add_embeddings, list(text_embeddings), metadatas, **kwargs)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        """Elimina los fragmentos con esos ids; devuelve si existía alguno."""
+        if not ids:
+            return False
+        with self._lock, open(self._lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self._refresh()
+            found = [doc_id for doc_id in ids if doc_id in self._live]
+            with open(self._deleted_path, "a", encoding="utf-8") as f:
+                for doc_id in found:
+                    f.write(json.dumps({"id": doc_id, "rows": len(self._docs)}) + "\n")
+            self._refresh_deleted()
+        return bool(found)
+
+    async def adelete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        """Versión async de `delete`."""
+        return await asyncio.to_thread(self.delete, ids, **kwargs)
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, **kwargs: Any) -> List[str]:
+        """Calcula los embeddings de los textos y los añade al índice."""
+        texts = list(texts)
+        return self.add_embeddings(zip(texts, self.embedding.embed_documents(texts)), metadatas)
+
+    async def aadd_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, **kwargs: Any) -> List[str]:
+        """Versión async de `add_texts`."""
+        texts = list(texts)
+        return await self.aadd_embeddings(zip(texts, await self.embedding.aembed_documents(texts)), metadatas)
+
+    def similarity_search_by_vector_with_score(
+        self, embedding: Sequence[float], k: int = 4, *, filters: Optional[str] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        """Los `k` fragmentos más cercanos al vector, con su similitud coseno."""
+        document_id = parse_document_filter(filters or kwargs.get("filter"))
+        query = _normalize_rows(np.asarray([embedding], dtype=np.float32))[0]
+        with self._lock:
+            self._refresh()
+            if self._matrix is None:
+                return []
+            rows: Optional[np.ndarray]
+            if document_id is not None:
+                rows = np.asarray(self._rows_by_document.get(document_id, []), dtype=np.int64)
+            elif self._ivf is not None:
+                rows = self._ivf.candidates(query, Config.LOCAL_VECTOR_STORE_NPROBE)
+            else:
+                rows = np.arange(len(self._docs), dtype=np.int64) if self._dead else None
+            if rows is not None:
+                rows = self._without_dead(rows)
+            vectors = self._matrix if rows is None else self._matrix[rows]
+            if not len(vectors):
+                return []
+            scores = vectors @ query
+            top = np.argsort(-scores)[:k]
+            return [
+                (Document(page_content=self._docs[row][0], metadata=self._docs[row][1]), float(scores[i]))
+                for i, row in ((i, int(i if rows is None else rows[i])) for i in top)
+            ]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        """Búsqueda por similitud de un texto, con puntuación."""
+        return self.similarity_search_by_vector_with_score(self.embedding.embed_query(query), k, **kwargs)
+
+    async def asimilarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        """Versión async de `similarity_search_with_score`."""
+        embedding = await self.embedding.aembed_query(query)
+        return await asyncio.to_thread(self.similarity_search_by_vector_with_score, embedding, k, **kwargs)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        """Búsqueda por similitud de un texto."""
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    async def asimilarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        """Versión async de `similarity_search`."""
+        return [doc for doc, _ in await self.asimilarity_search_with_score(query, k, **kwargs)]
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        *,
+        path: Optional[str] = None,
+        **kwargs: Any,
+    ) -> "LocalVectorStore":
+        """Crea el índice en `path` (por defecto `LOCAL_VECTOR_STORE_PATH`) con los textos dados."""
+        store = cls(path or Config.LOCAL_VECTOR_STORE_PATH, embedding)
+        store.add_texts(texts, metadatas)
+        return store
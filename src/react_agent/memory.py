@@ -0,0 +1,148 @@
+"""Server-side conversation memory for the chat agent.
+
+Conversations are persisted with a LangGraph checkpointer keyed by user and
+topic, so each turn loads only the latest checkpoint of its thread instead of
+relying on the client to resend the history. Once a history exceeds its token
+budget, older turns are folded into a rolling summary message.
+"""
+
+import asyncio
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.language_models import BaseChatModel
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.constants import TAG_NOSTREAM
+
+from react_agent.clients import Closer, config_fingerprint, registry
+from react_agent.configuration import Config
+from react_agent.prompt_registry import render_prompt
+from react_agent.prompts import HISTORY_SUMMARY_PREFIX, HISTORY_SUMMARY_PROMPT
+from react_agent.tokens import message_tokens
+
+
+def conversation_id(id_user: str, topic: str) -> str:
+    """Identificador del hilo de conversación de un usuario sobre un topic."""
+    return f"{id_user}:{topic}"
+
+
+def conversation_config(id_user: str, topic: str) -> Dict[str, Any]:
+    """Configuración de LangGraph que selecciona el hilo de la conversación."""
+    return {"configurable": {"thread_id": conversation_id(id_user, topic)}}
+
+
+def get_checkpointer(path: Optional[str] = None, name: str = "checkpointer") -> BaseCheckpointSaver:
+    """Checkpointer compartido por el event loop actual (por defecto, el de conversaciones).
+
+    Usa SQLite en `path` (`CHAT_MEMORY_PATH` por defecto) si
+    `langgraph-checkpoint-sqlite` está instalado; si no, o si la ruta está
+    vacía, guarda los checkpoints en memoria.
+    """
+    path = Config.CHAT_MEMORY_PATH if path is None else path
+    fingerprint = config_fingerprint(path, id(asyncio.get_running_loop()) if path else None)
+
+    def factory() -> Tuple[BaseCheckpointSaver, List[Closer]]:
+        if path:
+            try:
+                import aiosqlite
+                from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+            except ImportError:
+                logging.warning("langgraph-checkpoint-sqlite no está instalado, los checkpoints se guardarán en memoria")
+            else:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                # La conexión se abre de forma perezosa en el primer acceso (AsyncSqliteSaver.setup)
+                conn = aiosqlite.connect(path)
+                return AsyncSqliteSaver(conn), [conn.close]
+        return MemorySaver(), []
+
+    return registry.get(name, fingerprint, factory)
+
+
+def cached_tokens(message: Dict[str, Any]) -> int:
+    """Tokens del mensaje, contados una sola vez y guardados en el propio mensaje.
+
+    La clave `tokens` se persiste con el historial, así cada turno solo cuenta
+    los mensajes nuevos. El cliente de OpenAI ignora las claves adicionales.
+    """
+    if "tokens" not in message:
+        message["tokens"] = message_tokens(message)
+    return message["tokens"]
+
+
+def trim_history(messages: List[Dict[str, Any]], max_tokens: int) -> List[Dict[str, Any]]:
+    """Recorta el historial al presupuesto de tokens.
+
+    Conserva siempre el mensaje de sistema inicial y los turnos más recientes
+    que quepan en el presupuesto.
+    """
+    if not messages:
+        return messages
+    head = [messages[0]] if messages[0].get("role") == "system" else []
+    budget = max_tokens - sum(cached_tokens(message) for message in head)
+    tail: List[Dict[str, Any]] = []
+    for message in reversed(messages[len(head):]):
+        tokens = cached_tokens(message)
+        if tokens > budget and tail:
+            break
+        tail.append(message)
+        budget -= tokens
+    return head + tail[::-1]
+
+
+def split_history(
+    messages: List[Dict[str, Any]], recent_tokens: int
+) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]], List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Separa el historial en prompt de sistema, resumen previo, turnos antiguos y turnos recientes."""
+    head = [messages[0]] if messages and messages[0].get("role") == "system" and not messages[0].get("summary") else []
+    rest = messages[len(head):]
+    summary = rest[0] if rest and rest[0].get("summary") else None
+    if summary is not None:
+        rest = rest[1:]
+    recent: List[Dict[str, Any]] = []
+    budget = recent_tokens
+    for message in reversed(rest):
+        tokens = cached_tokens(message)
+        if tokens > budget and recent:
+            break
+        recent.append(message)
+        budget -= tokens
+    recent.reverse()
+    return head, summary, rest[:len(rest) - len(recent)], recent
+
+
+async def acompact_history(
+    messages: List[Dict[str, Any]], max_tokens: int, model: BaseChatModel
+) -> List[Dict[str, Any]]:
+    """Compacta el historial cuando supera `max_tokens`.
+
+    El prompt de sistema y los turnos recientes (`CHAT_HISTORY_RECENT_TOKENS`)
+    se conservan literales; los turnos anteriores se integran, junto con el
+    resumen previo, en un único mensaje de resumen. Si el resumen falla se
+    recurre a recortar el historial.
+    """
+    if sum(cached_tokens(message) for message in messages) <= max_tokens:
+        return messages
+    head, summary, older, recent = split_history(messages, Config.CHAT_HISTORY_RECENT_TOKENS)
+    if not older:
+        return trim_history(messages, max_tokens)
+
+    transcript = "\n".join(f"{message['role']}: {message['content']}" for message in older)
+    prompt = render_prompt(
+        HISTORY_SUMMARY_PROMPT,
+        summary=summary["content"][len(HISTORY_SUMMARY_PREFIX):] if summary else "",
+        transcript=transcript,
+    )
+    try:
+        # El resumen es interno: no debe emitirse como tokens en los endpoints de streaming
+        response = await model.bind(max_tokens=Config.CHAT_HISTORY_SUMMARY_TOKENS).ainvoke(
+            prompt, config={"tags": [TAG_NOSTREAM]}
+        )
+    except Exception as e:
+        logging.error(f"Error al resumir el historial, se recorta: {e}")
+        return trim_history(messages, max_tokens)
+
+    logging.info(f"Historial compactado: {len(older)} mensajes resumidos")
+    summary_message = {"role": "system", "content": HISTORY_SUMMARY_PREFIX + response.content, "summary": True}
+    return trim_history(head + [summary_message] + recent, max_tokens)
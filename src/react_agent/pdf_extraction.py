@@ -0,0 +1,271 @@
+"""Parallel text extraction for training PDFs.
+
+Parsing a PDF is CPU-bound, so pages are extracted by a pool of worker
+processes instead of a thread of the API worker. Each task handles a range of
+`PDF_EXTRACT_PAGES_PER_TASK` pages, results are yielded in page order as soon
+as the next range is ready, and every page has its own timeout so a single
+pathological page cannot stall the ingestion. The extracted text is cached by
+the SHA-256 of the file: indexing the same PDF again skips parsing entirely.
+A range that outlives its timeout is stuck in native code that ignores the
+per-page alarm: its worker is killed and the pool recreated, so a stuck process
+does not keep holding a slot of the pool.
+"""
+
+import concurrent.futures
+import contextlib
+import hashlib
+import logging
+import multiprocessing
+import os
+import signal
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Deque, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import httpx
+from langchain_core.documents import Document
+
+from react_agent.clients import Closer, config_fingerprint, registry
+from react_agent.configuration import Config
+from react_agent.fetch_cache import get_fetch_cache
+from react_agent.instrumentation import track_call
+
+# Margen sobre la suma de timeouts por página antes de dar un rango por perdido
+RANGE_TIMEOUT_MARGIN = 30.0
+
+
+class _PageTimeout(BaseException):
+    """Timeout de una página; no deriva de Exception para que pypdf no pueda tragárselo."""
+
+
+def _page_count(path: str) -> int:
+    """Número de páginas del PDF (se ejecuta en un proceso del pool)."""
+    from pypdf import PdfReader
+
+    return len(PdfReader(path).pages)
+
+
+def _extract_range(path: str, start: int, stop: int, page_timeout: float) -> List[Optional[str]]:
+    """Texto de las páginas [start, stop) (se ejecuta en un proceso del pool).
+
+    Una página que supera `page_timeout` segundos o falla devuelve None.
+    """
+    from pypdf import PdfReader
+
+    def on_timeout(signum: int, frame: Any) -> None:
+        raise _PageTimeout()
+
+    reader = PdfReader(path)
+    texts: List[Optional[str]] = []
+    # Los procesos del pool solo tienen un hilo: SIGALRM interrumpe la extracción de la página
+    previous = signal.signal(signal.SIGALRM, on_timeout)
+    try:
+        for number in range(start, stop):
+            signal.setitimer(signal.ITIMER_REAL, page_timeout)
+            try:
+                texts.append(reader.pages[number].extract_text(extraction_mode="plain").strip())
+            except (Exception, _PageTimeout):
+                texts.append(None)
+            finally:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+    finally:
+        signal.signal(signal.SIGALRM, previous)
+    return texts
+
+
+def file_sha256(path: str) -> str:
+    """Hash del contenido de un fichero, leído por bloques."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class PdfTextCache:
+    """Texto de las páginas de cada PDF por hash de contenido, en SQLite.
+
+    Guarda como mucho `max_files` PDFs; al superarlo se eliminan los usados hace más tiempo.
+    """
+
+    def __init__(self, path: str, max_files: int) -> None:
+        """Abre (o crea) el caché en la base de datos SQLite `path`."""
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.max_files = max_files
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files (file_hash TEXT PRIMARY KEY, pages INTEGER NOT NULL, used_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages (file_hash TEXT NOT NULL, page INTEGER NOT NULL, text TEXT NOT NULL, "
+            "PRIMARY KEY (file_hash, page))"
+        )
+        self._conn.commit()
+
+    def get(self, file_hash: str) -> Optional[List[str]]:
+        """Páginas del PDF si se extrajo completo antes."""
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM files WHERE file_hash = ?", (file_hash,)).fetchone() is None:
+                return None
+            rows = self._conn.execute(
+                "SELECT text FROM pages WHERE file_hash = ? ORDER BY page", (file_hash,)
+            ).fetchall()
+            self._conn.execute("UPDATE files SET used_at = ? WHERE file_hash = ?", (time.time(), file_hash))
+            self._conn.commit()
+        return [row[0] for row in rows]
+
+    def put(self, file_hash: str, pages: List[str]) -> None:
+        """Guarda las páginas de un PDF y descarta los menos usados."""
+        with self._lock:
+            self._conn.execute("DELETE FROM pages WHERE file_hash = ?", (file_hash,))
+            self._conn.executemany(
+                "INSERT INTO pages (file_hash, page, text) VALUES (?, ?, ?)",
+                [(file_hash, number, text) for number, text in enumerate(pages)],
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (file_hash, pages, used_at) VALUES (?, ?, ?)",
+                (file_hash, len(pages), time.time()),
+            )
+            stale = self._conn.execute(
+                "SELECT file_hash FROM files ORDER BY used_at DESC LIMIT -1 OFFSET ?", (self.max_files,)
+            ).fetchall()
+            for (old,) in stale:
+                self._conn.execute("DELETE FROM pages WHERE file_hash = ?", (old,))
+                self._conn.execute("DELETE FROM files WHERE file_hash = ?", (old,))
+            self._conn.commit()
+
+    def close(self) -> None:
+        """Cierra la conexión a SQLite."""
+        with self._lock:
+            self._conn.close()
+
+
+def get_pdf_text_cache() -> Optional[PdfTextCache]:
+    """Caché de texto de PDFs compartido por el proceso (None si está desactivado)."""
+    if not Config.PDF_TEXT_CACHE_PATH:
+        return None
+    fingerprint = config_fingerprint(Config.PDF_TEXT_CACHE_PATH, Config.PDF_TEXT_CACHE_MAX_FILES)
+
+    def factory() -> Tuple[PdfTextCache, List[Closer]]:
+        cache = PdfTextCache(Config.PDF_TEXT_CACHE_PATH, Config.PDF_TEXT_CACHE_MAX_FILES)
+        return cache, [cache.close]
+
+    return registry.get("pdf_text_cache", fingerprint, factory)
+
+
+def get_extraction_pool() -> concurrent.futures.ProcessPoolExecutor:
+    """Pool de procesos para extraer texto de PDFs, creado en el primer uso."""
+    workers = Config.PDF_EXTRACT_WORKERS or os.cpu_count() or 1
+    fingerprint = config_fingerprint(workers)
+
+    def factory() -> Tuple[concurrent.futures.ProcessPoolExecutor, List[Closer]]:
+        # spawn: el worker de la API tiene hilos y un fork podría heredar locks tomados
+        pool = concurrent.futures.ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+        return pool, [lambda: pool.shutdown(wait=False, cancel_futures=True)]
+
+    return registry.get("pdf_extraction_pool", fingerprint, factory)
+
+
+def _restart_pool(pool: concurrent.futures.ProcessPoolExecutor) -> concurrent.futures.ProcessPoolExecutor:
+    """Mata los procesos del pool, incluido el atascado, y devuelve el que lo sustituye.
+
+    Si otra extracción ya lo ha sustituido, solo devuelve el nuevo.
+    """
+    # ProcessPoolExecutor no expone sus procesos hasta Python 3.14 (terminate_workers)
+    processes = list((getattr(pool, "_processes", None) or {}).values())
+    registry.discard("pdf_extraction_pool", pool)
+    for process in processes:
+        process.terminate()
+    return get_extraction_pool()
+
+
+@contextlib.contextmanager
+def local_pdf(pdf_path: str) -> Iterator[str]:
+    """Ruta local del PDF; si es una URL, la del caché de descargas o un fichero temporal."""
+    if urlparse(pdf_path).scheme not in ("http", "https"):
+        yield pdf_path
+        return
+    cache = get_fetch_cache()
+    if cache is not None:
+        with cache.checkout(pdf_path) as path:
+            yield path
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "document.pdf")
+        with track_call("pdf", "download"), httpx.stream("GET", pdf_path, follow_redirects=True, timeout=Config.HTTP_TIMEOUT) as response:
+            response.raise_for_status()
+            with open(path, "wb") as f:
+                for block in response.iter_bytes():
+                    f.write(block)
+        yield path
+
+
+def _extract_pages(path: str, page_timeout: float, pages_per_task: int) -> Iterator[Optional[str]]:
+    """Texto de cada página en orden, extraído en paralelo por rangos."""
+    pool = get_extraction_pool()
+    with track_call("pdf", "page_count"):
+        total = pool.submit(_page_count, path).result(timeout=page_timeout + RANGE_TIMEOUT_MARGIN)
+    ranges = [(start, min(start + pages_per_task, total)) for start in range(0, total, pages_per_task)]
+    # Como mucho dos rangos por proceso en vuelo, para no acumular el texto de todo el PDF
+    window = 2 * (Config.PDF_EXTRACT_WORKERS or os.cpu_count() or 1)
+    pending: Deque[Tuple[int, int, concurrent.futures.Future[List[Optional[str]]]]] = deque()
+    next_range = 0
+    while pending or next_range < len(ranges):
+        while next_range < len(ranges) and len(pending) < window:
+            start, stop = ranges[next_range]
+            pending.append((start, stop, pool.submit(_extract_range, path, start, stop, page_timeout)))
+            next_range += 1
+        start, stop, future = pending.popleft()
+        try:
+            texts = future.result(timeout=page_timeout * (stop - start) + RANGE_TIMEOUT_MARGIN)
+        except (concurrent.futures.TimeoutError, BrokenProcessPool) as e:
+            logging.warning(f"Sin texto para las páginas {start + 1}-{stop} de {path}: {type(e).__name__}")
+            texts = [None] * (stop - start)
+            if isinstance(e, BrokenProcessPool) or not future.cancel():
+                pool = _restart_pool(pool)
+                # Los rangos que no habían terminado en el pool anterior se envían al nuevo
+                pending = deque(
+                    (start, stop, future if _succeeded(future) else pool.submit(_extract_range, path, start, stop, page_timeout))
+                    for start, stop, future in pending
+                )
+        yield from texts
+
+
+def _succeeded(future: concurrent.futures.Future[Any]) -> bool:
+    return future.done() and not future.cancelled() and future.exception() is None
+
+
+def extract_pages(pdf_path: str) -> Iterator[Document]:
+    """Páginas del PDF en orden, con el texto cacheado por hash o extraído en el pool de procesos.
+
+    Las páginas que superan `PDF_EXTRACT_PAGE_TIMEOUT` o fallan se devuelven vacías
+    y el PDF no se cachea, para volver a intentarlo en la siguiente indexación.
+    """
+    with local_pdf(pdf_path) as path:
+        cache = get_pdf_text_cache()
+        file_hash = file_sha256(path)
+        texts: Optional[List[str]] = cache.get(file_hash) if cache is not None else None
+        if texts is not None:
+            logging.info(f"Texto de {pdf_path} servido desde el caché de PDFs")
+            for number, text in enumerate(texts):
+                yield Document(page_content=text, metadata={"source": pdf_path, "page": number})
+            return
+
+        extracted: List[str] = []
+        complete = True
+        for number, page_text in enumerate(_extract_pages(path, Config.PDF_EXTRACT_PAGE_TIMEOUT, Config.PDF_EXTRACT_PAGES_PER_TASK)):
+            if page_text is None:
+                logging.warning(f"Página {number + 1} de {pdf_path} sin texto: timeout o error al extraerla")
+                complete = False
+            extracted.append(page_text or "")
+            yield Document(page_content=page_text or "", metadata={"source": pdf_path, "page": number})
+        if cache is not None and complete:
+            cache.put(file_hash, extracted)
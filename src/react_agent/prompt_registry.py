@@ -0,0 +1,96 @@
+"""Registry of the split prompts and their token accounting.
+
+The static part of every prompt is tokenized once, at startup or on first use,
+instead of on every call. Rendering a prompt returns the static part as a
+system message, tagged with the template name, followed by the dynamic part as
+the last user message. The tag lets the metrics callback attribute the prompt
+and cached tokens reported by the provider to each template. Azure OpenAI only
+caches prefixes of at least 1024 tokens, so shorter static parts are reported
+at startup as not cacheable.
+"""
+
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+from react_agent.instrumentation import PROMPT_MESSAGE_ID_PREFIX, PROMPT_TOKENS
+from react_agent.prompts import PROMPTS, SplitPrompt
+from react_agent.tokens import count_tokens
+
+# Tamaño mínimo del prefijo que el proveedor guarda en su caché de prompts
+PROMPT_CACHE_MIN_TOKENS = 1024
+
+ChatMessage = Union[BaseMessage, Dict[str, Any]]
+
+
+class PromptRegistry:
+    """Prompts partidos por nombre, con los tokens de su parte fija contados una sola vez."""
+
+    def __init__(self, prompts: Iterable[SplitPrompt] = ()) -> None:
+        """Registra `prompts`; sus tokens se cuentan en `warm_up` o en el primer uso."""
+        self._lock = threading.Lock()
+        self._prompts: Dict[str, SplitPrompt] = {}
+        self._static_tokens: Dict[str, int] = {}
+        for prompt in prompts:
+            self.register(prompt)
+
+    def register(self, prompt: SplitPrompt) -> None:
+        """Añade un prompt; otro distinto con el mismo nombre es un error."""
+        with self._lock:
+            current = self._prompts.get(prompt.name)
+            if current is not None and current != prompt:
+                raise ValueError(f"Ya hay otro prompt registrado como {prompt.name}")
+            self._prompts[prompt.name] = prompt
+
+    def static_tokens(self, prompt: SplitPrompt) -> int:
+        """Tokens de la parte fija del prompt, contados en el primer uso."""
+        tokens = self._static_tokens.get(prompt.name)
+        if tokens is None:
+            self.register(prompt)
+            tokens = self._static_tokens[prompt.name] = count_tokens(prompt.static)
+        return tokens
+
+    def warm_up(self) -> Dict[str, int]:
+        """Tokeniza la parte fija de todos los prompts registrados y devuelve sus tokens."""
+        with self._lock:
+            prompts = list(self._prompts.values())
+        tokens = {prompt.name: self.static_tokens(prompt) for prompt in prompts}
+        short = sorted(name for name, count in tokens.items() if count < PROMPT_CACHE_MIN_TOKENS)
+        logging.info(f"{len(tokens)} prompts tokenizados; sin caché del proveedor por ser cortos: {', '.join(short)}")
+        return tokens
+
+    def render(
+        self, prompt: SplitPrompt, history: Optional[Sequence[ChatMessage]] = None, **values: Any
+    ) -> List[ChatMessage]:
+        """Mensajes para el modelo: la parte fija como mensaje de sistema y la variable al final.
+
+        Con `history`, la parte fija se coloca tras su mensaje de sistema inicial,
+        para que el prefijo común incluya también el historial de la conversación.
+        """
+        static = SystemMessage(content=prompt.static, id=f"{PROMPT_MESSAGE_ID_PREFIX}{prompt.name}")
+        dynamic = prompt.dynamic.format(**values)
+        PROMPT_TOKENS.labels(prompt.name, "static").inc(self.static_tokens(prompt))
+        PROMPT_TOKENS.labels(prompt.name, "dynamic").inc(count_tokens(dynamic))
+
+        history = list(history or [])
+        split = 1 if history and _role(history[0]) == "system" else 0
+        return history[:split] + [static] + history[split:] + [HumanMessage(content=dynamic)]
+
+
+def _role(message: ChatMessage) -> str:
+    return message.type if isinstance(message, BaseMessage) else message.get("role", "")
+
+
+prompt_registry = PromptRegistry(PROMPTS)
+
+
+def render_prompt(prompt: SplitPrompt, history: Optional[Sequence[ChatMessage]] = None, **values: Any) -> List[ChatMessage]:
+    """Renderiza un prompt con el registro del proceso."""
+    return prompt_registry.render(prompt, history, **values)
+
+
+def warm_up() -> Dict[str, int]:
+    """Tokeniza de antemano la parte fija de los prompts del proceso."""
+    return prompt_registry.warm_up()
@@ -1,26 +1,48 @@
-"""Default prompts used by the agent."""
+"""Default prompts used by the agent.
+
+Every prompt is split into a static part, the instructions and output format
+shared by all calls, and a dynamic part with the values of each call. The
+static part is sent first as a system message and the dynamic part last, so
+consecutive calls share the longest possible prefix and the provider can serve
+it from its prompt cache.
+"""
+
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class SplitPrompt:
+    """Prompt partido en instrucciones fijas (`static`) y valores de cada llamada (`dynamic`).
+
+    `dynamic` es una plantilla de `str.format`; `static` se envía tal cual.
+    """
+
+    name: str
+    static: str
+    dynamic: str
+
 
 SYSTEM_PROMPT = """
     Eres un asistente de IA que ayuda a los usuarios a aprender sobre un tema específico.
-    Siempre debes responder en español y de forma amistosa y proactiva, ya que eres el equivalente a un coach para el usuario. 
-    Responde en un formato Markdown que pueda ser renderizado en Streamlit. 
+    Siempre debes responder en español y de forma amistosa y proactiva, ya que eres el equivalente a un coach para el usuario.
+    Responde en un formato Markdown que pueda ser renderizado en Streamlit.
     La explicación debe ser clara y estructurada.
 """
 
 
-QUESTION_PROMPT = """
-       Genera un conjunto de preguntas 5 de selección múltiple en formato JSON basado en el siguiente tema:
+QUESTION_PROMPT = SplitPrompt(
+    name="question",
+    static="""
+       Genera un conjunto de preguntas 5 de selección múltiple en formato JSON basado en el tema que se indica al final.
 
-        Tema: {text}
+        El JSON debe seguir exactamente esta estructura, copiando el id, el TrainingID y el TopicID indicados:
 
-        El JSON debe seguir exactamente esta estructura:
-
-        {{
-            "id": "{uuid}",
-            "TrainingID": "{training_id}",
-            "TopicID": "{topic_id}"	,
+        {
+            "id": "<id indicado>",
+            "TrainingID": "<TrainingID indicado>",
+            "TopicID": "<TopicID indicado>",
             "Questions": [
-        {{
+        {
             "QuestionID": <Número incremental de la pregunta>,
             "Question": "<Texto de la pregunta>",
             "Options": [
@@ -30,10 +52,10 @@ QUESTION_PROMPT = """
                 "<Opción 4>"
             ],
             "CorrectAnswer": <Índice de la opción correcta (0-3)>
-            }},
+            },
         ...
         ]
-    }}
+    }
 
     - Reglas para la generación de preguntas:
     - Debe haber al menos 3 preguntas relacionadas con el tema.
@@ -44,19 +66,27 @@ QUESTION_PROMPT = """
     No incluyas texto adicional fuera del JSON.
 
     El JSON debe ser válido y cumplir con la estructura especificada.
-"""
+""",
+    dynamic="""id: {uuid}
+TrainingID: {training_id}
+TopicID: {topic_id}
 
-TOPICS_PROMPT = """
-    Explica el tema "{topic}" en un formato Markdown que pueda ser renderizado en Streamlit. 
+Tema: {text}""",
+)
+
+TOPICS_PROMPT = SplitPrompt(
+    name="topics",
+    static="""
+    Explica el tema que se indica al final en un formato Markdown que pueda ser renderizado en Streamlit.
     La explicación debe ser clara y estructurada con secciones, títulos y ejemplos de código cuando sea relevante.
-    
+
     Formato esperado:
     - Usa encabezados con `##` o `###` para dividir las secciones.
     - Si el tema incluye código, usa bloques con triple comilla invertida (` ```python ... ``` `).
     - Usa listas, negritas y cursivas cuando sea útil para mejorar la comprensión.
-    
+
     Ejemplo de salida esperada para "Decoradores en Python":
-    
+
     ```
     ## 👉 Qué son los Decoradores en Python
     Los **decoradores** son funciones que modifican el comportamiento de otras funciones o métodos sin alterar su código fuente. Se usan para agregar funcionalidades como logging, control de acceso, validación de datos, etc.
@@ -87,73 +117,162 @@ TOPICS_PROMPT = """
     ```
 
     Devuelve solo el texto en formato Markdown sin explicaciones adicionales.
-    """
+    """,
+    dynamic='Tema: "{topic}"',
+)
 
-INITIALIZE_PROMPT = """
-    Analiza el siguiente contenido: {search_content}. Si el contenido está relacionado con el tema {topic}, mejora su redacción para que sea más claro y atractivo para el usuario. 
-    Si el contenido no está relacionado con el tema {topic} consulta informacion csobre el tema.
-"""
-CHATBOT_PROMPT = """
-    Analiza el siguiente contenido: {search_content}. Si el contenido está relacionado con el tema {topic}, mejora su redacción para que sea más claro y atractivo para el usuario. 
-    Si el contenido no está relacionado con el tema {topic}, redacta información relevante y precisa en respuesta a la siguiente pregunta del usuario: {question}.
-"""
+INITIALIZE_PROMPT = SplitPrompt(
+    name="initialize",
+    static="""
+    Analiza el contenido que se indica al final. Si el contenido está relacionado con el tema indicado, mejora su redacción para que sea más claro y atractivo para el usuario.
+    Si el contenido no está relacionado con el tema indicado consulta informacion sobre el tema.
+""",
+    dynamic="""Tema: {topic}
+
+Contenido:
+{search_content}""",
+)
+
+CHATBOT_PROMPT = SplitPrompt(
+    name="chatbot",
+    static="""
+    Analiza el contenido que se indica al final. Si el contenido está relacionado con el tema indicado, mejora su redacción para que sea más claro y atractivo para el usuario.
+    Si el contenido no está relacionado con el tema indicado, redacta información relevante y precisa en respuesta a la pregunta del usuario.
+""",
+    dynamic="""Tema: {topic}
+
+Contenido:
+{search_content}
+
+Pregunta del usuario: {question}""",
+)
 
+CHATBOT_NO_CONTEXT_PROMPT = SplitPrompt(
+    name="chatbot_no_context",
+    static="Genera una respuesta para la pregunta o tema que se indica a continuación.",
+    dynamic="{query}",
+)
 
-GENERATE_JSON_TOPICS_PROMPT = """
-Dada la siguiente lista de temas [{lista}], genera un JSON con la siguiente estructura:
 
-{{
-    "trainingName": "{training_name}",
-    "description": "{description}",
-    "attachment": "{url}",
+GENERATE_JSON_TOPICS_PROMPT = SplitPrompt(
+    name="generate_json_topics",
+    static="""
+Dada la lista de temas que se indica al final, genera un JSON con la siguiente estructura, copiando el nombre, la descripción y el adjunto indicados:
+
+{
+    "trainingName": "<Nombre de la formación indicado>",
+    "description": "<Descripción indicada>",
+    "attachment": "<Adjunto indicado>",
     "topics": [
-        {{
+        {
             "topicName": "<Nombre del tema>",
             "items": [
-                {{
+                {
                     "itemName": "<Nombre del subtema o concepto dentro del tema>"
-                }}
+                }
             ]
-        }}
+        }
     ]
-}}
+}
 
 El JSON debe ser válido y cumplir con la estructura especificada, sin incluir texto adicional fuera del JSON.
-"""
+""",
+    dynamic="""Nombre de la formación: {training_name}
+Descripción: {description}
+Adjunto: {url}
 
+Lista de temas: [{lista}]""",
+)
 
 
-TOPICS_GET_PROMPT = """
-    Extrae los temas principales de este contenido: {content}
-"""
+MERGE_TOPICS_PROMPT = SplitPrompt(
+    name="merge_topics",
+    static="""
+Al final se indican temas extraídos de distintas partes de un mismo documento.
+
+Fusiona los temas repetidos o que tratan lo mismo, agrupa los subtemas bajo su tema principal y conserva el orden en que aparecen.
+Devuelve solo la lista resultante, un tema por línea, sin numeración ni texto adicional.
+""",
+    dynamic="{lista}",
+)
 
 
-TOPICS_FROM_TRAINING_DESCRIPTION_PROMPT = """
-Dada la siguiente {training_name} y {description}, genera los temas principales de la capacitación. Genera un JSON con la siguiente estructura:
+TOPICS_GET_PROMPT = SplitPrompt(
+    name="topics_get",
+    static="""
+    Extrae los temas principales del contenido que se indica a continuación.
+""",
+    dynamic="{content}",
+)
 
-{{
-    "trainingName": "{training_name}",
-    "description": "{description}",
+
+TOPICS_FROM_TRAINING_DESCRIPTION_PROMPT = SplitPrompt(
+    name="topics_from_training_description",
+    static="""
+Dados el nombre y la descripción de una capacitación, que se indican al final, genera los temas principales de la capacitación. Genera un JSON con la siguiente estructura, copiando el nombre y la descripción indicados:
+
+{
+    "trainingName": "<Nombre de la capacitación indicado>",
+    "description": "<Descripción indicada>",
     "attachment": "",
     "topics": [
-        {{
+        {
             "topicName": "<Nombre del tema>",
             "items": [
-                {{
+                {
                     "itemName": "<Nombre del subtema o concepto dentro del tema>"
-                }}
+                }
             ]
-        }}
+        }
     ]
-}}
+}
 
 Asegúrate de que la descripción del curso sea clara y concisa, resaltando los objetivos de aprendizaje y las habilidades que se desarrollarán. La lista de temas y subtemas debe reflejar con precisión la estructura del curso, organizando los contenidos de manera lógica.
 
 No incluyas texto adicional fuera del JSON. El JSON debe ser válido y cumplir con la estructura especificada.
-"""
+""",
+    dynamic="""Nombre de la capacitación: {training_name}
+Descripción: {description}""",
+)
 
-FEEDBACK_PROMPT = """
-    A partir de las respuestas proporcionadas en el siguiente {cuestionario}, brinda al usuario un feedback detallado sobre su nivel de conocimientos. Destaca los aspectos positivos y señala áreas de mejora específicas para fortalecer su comprensión del tema.
-"""
+FEEDBACK_PROMPT = SplitPrompt(
+    name="feedback",
+    static="""
+    A partir de las respuestas proporcionadas en el cuestionario que se indica al final, brinda al usuario un feedback detallado sobre su nivel de conocimientos. Destaca los aspectos positivos y señala áreas de mejora específicas para fortalecer su comprensión del tema.
+""",
+    dynamic="""Cuestionario:
+{cuestionario}""",
+)
+
+
+HISTORY_SUMMARY_PREFIX = "Resumen de la conversación hasta ahora:\n"
+
+HISTORY_SUMMARY_PROMPT = SplitPrompt(
+    name="history_summary",
+    static="""
+    Resume la conversación entre un usuario y su coach de aprendizaje que se indica al final para poder continuarla sin el historial completo.
+    Conserva las dudas del usuario, lo que ya se le ha explicado, los ejemplos relevantes y cualquier preferencia que haya indicado.
+    Integra el resumen anterior si lo hay. Responde solo con el resumen, en español y de forma concisa.
+""",
+    dynamic="""Resumen anterior:
+{summary}
+
+Conversación:
+{transcript}""",
+)
 
 
+# Prompts que el registro tokeniza al arrancar
+PROMPTS = (
+    QUESTION_PROMPT,
+    TOPICS_PROMPT,
+    INITIALIZE_PROMPT,
+    CHATBOT_PROMPT,
+    CHATBOT_NO_CONTEXT_PROMPT,
+    GENERATE_JSON_TOPICS_PROMPT,
+    MERGE_TOPICS_PROMPT,
+    TOPICS_GET_PROMPT,
+    TOPICS_FROM_TRAINING_DESCRIPTION_PROMPT,
+    FEEDBACK_PROMPT,
+    HISTORY_SUMMARY_PROMPT,
+)
@@ -0,0 +1,270 @@
+"""Client-side rate limiting for the shared Azure OpenAI deployment.
+
+Every chat model call takes one request and its estimated tokens from two
+token buckets sized to the deployment's requests-per-minute and
+tokens-per-minute quotas. The bucket state lives in a small memory-mapped file
+locked with `flock`, so all gunicorn workers on the host draw from the same
+budget.
+
+Calls are scheduled by priority class: interactive chat can drain the buckets,
+while feedback and batch topic extraction must leave a reserve for the classes
+above them. A 429 pauses every worker for the `retry-after` Azure returns and
+empties the buckets, so traffic ramps back up gradually.
+"""
+
+import abc
+import asyncio
+import fcntl
+import logging
+import mmap
+import os
+import random
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+
+from react_agent.concurrency import is_rate_limit_error, retry_after_seconds
+from react_agent.configuration import Config
+from react_agent.instrumentation import current_node, record_retry
+from react_agent.tokens import MESSAGE_OVERHEAD_TOKENS, count_tokens
+
+if TYPE_CHECKING:
+    # Para mypy el mixin extiende el modelo de OpenAI con el que se combina
+    from langchain_openai.chat_models.base import BaseChatOpenAI as _ChatModelBase
+else:
+    _ChatModelBase = object
+
+# Fracción de cada bucket que una clase debe dejar libre para las de mayor prioridad
+PRIORITY_RESERVE = {"interactive": 0.0, "standard": 0.1, "batch": 0.3}
+
+# Clase de prioridad de cada agente (etiqueta de `instrument_node`)
+AGENT_PRIORITY = {
+    "topics_agent": "interactive",
+    "feedback_agent": "standard",
+    "question_agent": "standard",
+    "bulk_question_agent": "batch",
+    "content_agent": "batch",
+}
+
+# Espera máxima entre comprobaciones del bucket, para reaccionar a las devoluciones de tokens
+MAX_POLL_INTERVAL = 1.0
+
+# Niveles de los buckets de peticiones y de tokens, última recarga y fin de la pausa por 429
+_STATE = struct.Struct("<4d")
+
+
+def priority_of(agent: str) -> str:
+    """Clase de prioridad de las llamadas hechas por un agente."""
+    return AGENT_PRIORITY.get(agent, "standard")
+
+
+class SharedTokenBuckets:
+    """Buckets de peticiones y tokens por minuto compartidos entre procesos a través de un fichero mapeado."""
+
+    def __init__(self, path: str, requests_per_minute: float, tokens_per_minute: float) -> None:
+        """Abre el fichero de estado en `path`; si no existía, los buckets empiezan llenos."""
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        with self._locked_file():
+            if os.fstat(self._fd).st_size < _STATE.size:
+                os.ftruncate(self._fd, _STATE.size)
+                fresh = True
+            else:
+                fresh = False
+            self._mmap = mmap.mmap(self._fd, _STATE.size)
+            if fresh:
+                # Un bucket nuevo empieza lleno
+                self._write(requests_per_minute, tokens_per_minute, time.time(), 0.0)
+
+    @contextmanager
+    def _locked_file(self) -> Iterator[None]:
+        # flock excluye a otros procesos; el lock de hilo, a los hilos de este
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _read(self) -> List[float]:
+        return list(_STATE.unpack_from(self._mmap, 0))
+
+    def _write(self, requests: float, tokens: float, refilled_at: float, paused_until: float) -> None:
+        _STATE.pack_into(self._mmap, 0, requests, tokens, refilled_at, paused_until)
+
+    def _refill(self, now: float) -> List[float]:
+        requests, tokens, refilled_at, paused_until = self._read()
+        elapsed = max(0.0, now - refilled_at)
+        requests = min(self.requests_per_minute, requests + elapsed * self.requests_per_minute / 60)
+        tokens = min(self.tokens_per_minute, tokens + elapsed * self.tokens_per_minute / 60)
+        return [requests, tokens, now, paused_until]
+
+    def try_acquire(self, tokens: int, priority: str = "standard") -> float:
+        """Toma una petición y `tokens` si hay saldo por encima de la reserva de la clase.
+
+        Devuelve 0 si se concedieron o los segundos que conviene esperar antes de
+        volver a intentarlo.
+        """
+        reserve = PRIORITY_RESERVE.get(priority, PRIORITY_RESERVE["standard"])
+        now = time.time()
+        with self._locked_file():
+            state = self._refill(now)
+            requests, available, _, paused_until = state
+            if paused_until > now:
+                self._write(*state)
+                return paused_until - now
+            waits = [0.0]
+            if self.requests_per_minute:
+                missing = 1 + reserve * self.requests_per_minute - requests
+                waits.append(missing * 60 / self.requests_per_minute)
+            if self.tokens_per_minute:
+                # Una llamada mayor que el bucket se concede con el bucket lleno para no bloquearla siempre
+                needed = min(tokens, (1 - reserve) * self.tokens_per_minute)
+                missing = needed + reserve * self.tokens_per_minute - available
+                waits.append(missing * 60 / self.tokens_per_minute)
+            wait = max(waits)
+            if wait <= 0:
+                state[0] -= 1 if self.requests_per_minute else 0
+                state[1] -= tokens if self.tokens_per_minute else 0
+            self._write(*state)
+            return max(0.0, wait)
+
+    def adjust(self, tokens: int) -> None:
+        """Corrige el bucket de tokens con la diferencia entre el uso real y el estimado."""
+        if not self.tokens_per_minute or not tokens:
+            return
+        with self._locked_file():
+            state = self._refill(time.time())
+            state[1] = max(-self.tokens_per_minute, min(self.tokens_per_minute, state[1] - tokens))
+            self._write(*state)
+
+    def pause(self, seconds: float) -> None:
+        """Detiene las llamadas de todos los procesos y vacía los buckets tras un 429."""
+        with self._locked_file():
+            state = self._refill(time.time())
+            state[0] = min(state[0], 0.0)
+            state[1] = min(state[1], 0.0)
+            state[3] = max(state[3], time.time() + seconds)
+            self._write(*state)
+
+    def close(self) -> None:
+        """Libera el mapeo y el descriptor del fichero de estado."""
+        self._mmap.close()
+        os.close(self._fd)
+
+
+class RateLimitedChatModel(_ChatModelBase, metaclass=abc.ABCMeta):
+    """Mixin para modelos de chat que pasa cada llamada por los buckets compartidos.
+
+    Los 429 se reintentan aquí hasta `LLM_MAX_RETRIES` veces tras la pausa que
+    indique Azure, así que el cliente HTTP del SDK no debe reintentarlos por su cuenta.
+    La clase concreta indica los buckets a usar con `_rate_limiter`.
+    """
+
+    @abc.abstractmethod
+    def _rate_limiter(self) -> SharedTokenBuckets:
+        """Buckets compartidos que limitan las llamadas de este modelo."""
+
+    def _estimated_tokens(self, messages: List[BaseMessage], **kwargs: Any) -> int:
+        prompt = sum(count_tokens(str(message.content)) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+        completion = kwargs.get("max_tokens") or getattr(self, "max_tokens", None) or Config.LLM_RATE_LIMIT_COMPLETION_TOKENS
+        return prompt + completion
+
+    def _backoff(self, error: BaseException, attempt: int) -> float:
+        delay = retry_after_seconds(error) or 2**attempt * (1 + random.random())
+        logging.warning(f"429 de Azure OpenAI, pausa de {delay:.1f}s para todos los workers")
+        self._rate_limiter().pause(delay)
+        record_retry()
+        return delay
+
+    def _settle(self, result: ChatResult, estimated: int) -> None:
+        usage = (result.llm_output or {}).get("token_usage") or {}
+        if usage.get("total_tokens"):
+            self._rate_limiter().adjust(usage["total_tokens"] - estimated)
+
+    def _acquire(self, tokens: int) -> None:
+        limiter, priority = self._rate_limiter(), priority_of(current_node()[0])
+        while (wait := limiter.try_acquire(tokens, priority)) > 0:
+            time.sleep(min(wait, MAX_POLL_INTERVAL))
+
+    async def _aacquire(self, tokens: int) -> None:
+        limiter, priority = self._rate_limiter(), priority_of(current_node()[0])
+        while (wait := limiter.try_acquire(tokens, priority)) > 0:
+            await asyncio.sleep(min(wait, MAX_POLL_INTERVAL) * (1 + random.random() / 10))
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        estimated = self._estimated_tokens(messages, **kwargs)
+        for attempt in range(Config.LLM_MAX_RETRIES + 1):
+            self._acquire(estimated)
+            try:
+                result = super()._generate(messages, stop, run_manager, **kwargs)
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == Config.LLM_MAX_RETRIES:
+                    raise
+                self._backoff(e, attempt)
+                continue
+            self._settle(result, estimated)
+            return result
+        raise RuntimeError("unreachable")
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        estimated = self._estimated_tokens(messages, **kwargs)
+        for attempt in range(Config.LLM_MAX_RETRIES + 1):
+            await self._aacquire(estimated)
+            try:
+                result = await super()._agenerate(messages, stop, run_manager, **kwargs)
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == Config.LLM_MAX_RETRIES:
+                    raise
+                self._backoff(e, attempt)
+                continue
+            self._settle(result, estimated)
+            return result
+        raise RuntimeError("unreachable")
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        estimated = self._estimated_tokens(messages, **kwargs)
+        for attempt in range(Config.LLM_MAX_RETRIES + 1):
+            await self._aacquire(estimated)
+            started = False
+            try:
+                async for chunk in super()._astream(messages, stop, run_manager, **kwargs):
+                    started = True
+                    yield chunk
+                return
+            except Exception as e:
+                # Solo se reintenta si el cliente aún no ha recibido ningún token
+                if started or not is_rate_limit_error(e) or attempt == Config.LLM_MAX_RETRIES:
+                    raise
+                self._backoff(e, attempt)
+
@@ -0,0 +1,133 @@
+"""Response cache for deterministic-enough LLM calls with pluggable backends."""
+
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Protocol, Tuple
+
+from react_agent.clients import Closer, config_fingerprint, registry
+from react_agent.configuration import Config
+
+
+def response_cache_key(namespace: str, *parts: Any) -> str:
+    """Construye una clave estable a partir del espacio de nombres y sus partes."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return f"{namespace}:{digest.hexdigest()}"
+
+
+class ResponseCache(Protocol):
+    """Interfaz común de los backends de caché de respuestas."""
+
+    async def get(self, key: str) -> Optional[str]:
+        """Devuelve el valor cacheado o None si no existe o expiró."""
+        ...
+
+    async def set(self, key: str, value: str) -> None:
+        """Guarda un valor con el TTL configurado."""
+        ...
+
+
+class NullCache:
+    """Backend que no guarda nada (caché desactivado)."""
+
+    async def get(self, key: str) -> Optional[str]:
+        """Siempre es un fallo de caché."""
+        return None
+
+    async def set(self, key: str, value: str) -> None:
+        """No guarda nada."""
+
+
+class InMemoryCache:
+    """Caché LRU en proceso con TTL y tamaño máximo."""
+
+    def __init__(self, max_entries: int, ttl: float) -> None:
+        """Crea un caché vacío de como mucho `max_entries` valores que expiran tras `ttl` segundos."""
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, Tuple[float, str]] = OrderedDict()
+
+    async def get(self, key: str) -> Optional[str]:
+        """Devuelve el valor si no ha expirado y lo marca como usado."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    async def set(self, key: str, value: str) -> None:
+        """Guarda el valor y expulsa los menos usados si se supera el tamaño."""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class RedisCache:
+    """Caché en un servidor compatible con Redis (la expulsión LRU la hace el servidor).
+
+    Los errores de conexión se registran y se tratan como fallos de caché para
+    no romper la petición.
+    """
+
+    def __init__(self, url: str, ttl: float) -> None:
+        """Conecta con el servidor de `url`; los valores expiran tras `ttl` segundos."""
+        try:
+            from redis.asyncio import Redis
+        except ImportError as e:
+            raise ImportError(
+                "RESPONSE_CACHE_BACKEND=redis requiere el paquete `redis`. Instálalo con `pip install redis`."
+            ) from e
+        self.ttl = ttl
+        self.client = Redis.from_url(url, decode_responses=True)
+
+    async def get(self, key: str) -> Optional[str]:
+        """Lee el valor de Redis."""
+        try:
+            return await self.client.get(key)
+        except Exception as e:
+            logging.warning(f"Error leyendo del caché de respuestas: {e}")
+            return None
+
+    async def set(self, key: str, value: str) -> None:
+        """Escribe el valor en Redis con expiración."""
+        try:
+            await self.client.set(key, value, ex=max(1, int(self.ttl)))
+        except Exception as e:
+            logging.warning(f"Error escribiendo en el caché de respuestas: {e}")
+
+
+def get_response_cache() -> ResponseCache:
+    """Backend de caché de respuestas configurado, compartido por el proceso."""
+    backend = (Config.RESPONSE_CACHE_BACKEND or "none").lower()
+    fingerprint = config_fingerprint(
+        backend,
+        Config.RESPONSE_CACHE_URL,
+        Config.RESPONSE_CACHE_TTL,
+        Config.RESPONSE_CACHE_MAX_ENTRIES,
+        # El cliente async de Redis queda ligado al event loop en el que se crea
+        id(asyncio.get_running_loop()) if backend == "redis" else None,
+    )
+
+    def factory() -> Tuple[ResponseCache, list[Closer]]:
+        if backend == "memory":
+            return InMemoryCache(Config.RESPONSE_CACHE_MAX_ENTRIES, Config.RESPONSE_CACHE_TTL), []
+        if backend == "redis":
+            cache = RedisCache(Config.RESPONSE_CACHE_URL, Config.RESPONSE_CACHE_TTL)
+            return cache, [cache.client.aclose]
+        return NullCache(), []
+
+    return registry.get("response_cache", fingerprint, factory)
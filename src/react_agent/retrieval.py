@@ -0,0 +1,182 @@
+"""Retrieval stage for the chat agent.
+
+Candidates come from a hybrid (BM25 + vector) search scoped to the training's
+document. They are reranked locally with a cheap lexical scorer, chunks that
+repeat the 200-character splitter overlap are deduplicated, and the best ones
+are packed into the prompt up to a token budget.
+"""
+
+import logging
+import math
+import re
+import unicodedata
+from collections import Counter
+from typing import List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from react_agent.coalescing import SingleFlight
+from react_agent.configuration import Config
+from react_agent.instrumentation import track_call
+from react_agent.tokens import count_tokens
+
+# Peso de la puntuación del buscador frente a la puntuación léxica local
+SEARCH_SCORE_WEIGHT = 0.5
+# Parámetros estándar de BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Mayor solapamiento que puede haber entre fragmentos consecutivos (chunk_overlap del splitter)
+MAX_OVERLAP_CHARS = 200
+# Solapamiento mínimo para considerarlo repetición y no coincidencia casual
+MIN_OVERLAP_CHARS = 20
+# Similitud de shingles a partir de la cual dos fragmentos se consideran el mismo
+DUPLICATE_THRESHOLD = 0.8
+
+_WORD = re.compile(r"\w+")
+
+_search_flight = SingleFlight("retrieval")
+
+
+def tokenize(text: str) -> List[str]:
+    """Palabras en minúsculas y sin tildes, para comparar términos en español."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return _WORD.findall(text)
+
+
+def document_filter(document_id: Optional[str]) -> Optional[str]:
+    """Filtro OData que limita la búsqueda a los fragmentos de un documento."""
+    if not document_id:
+        return None
+    return f"metadata/document_id eq '{document_id.replace(chr(39), chr(39) * 2)}'"
+
+
+def _normalize(scores: Sequence[float]) -> List[float]:
+    high = max(scores, default=0.0)
+    if high <= 0:
+        return [0.0 for _ in scores]
+    return [max(score, 0.0) / high for score in scores]
+
+
+def bm25_scores(query: str, texts: Sequence[str]) -> List[float]:
+    """Puntuación BM25 de cada texto para la consulta, con los propios textos como corpus."""
+    docs = [Counter(tokenize(text)) for text in texts]
+    lengths = [sum(doc.values()) for doc in docs]
+    avg_length = sum(lengths) / len(lengths) if lengths else 0.0
+    scores = []
+    for doc, length in zip(docs, lengths):
+        score = 0.0
+        for term in set(tokenize(query)):
+            frequency = doc.get(term, 0)
+            if not frequency:
+                continue
+            containing = sum(1 for other in docs if term in other)
+            idf = math.log(1 + (len(docs) - containing + 0.5) / (containing + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / (avg_length or 1))
+            score += idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+        scores.append(score)
+    return scores
+
+
+def rerank(query: str, candidates: Sequence[Tuple[Document, float]]) -> List[Document]:
+    """Ordena los candidatos combinando la puntuación del buscador con BM25 local."""
+    if not candidates:
+        return []
+    search = _normalize([score for _, score in candidates])
+    lexical = _normalize(bm25_scores(query, [doc.page_content for doc, _ in candidates]))
+    combined = [
+        SEARCH_SCORE_WEIGHT * semantic + (1 - SEARCH_SCORE_WEIGHT) * keyword
+        for semantic, keyword in zip(search, lexical)
+    ]
+    order = sorted(range(len(candidates)), key=lambda i: combined[i], reverse=True)
+    return [candidates[i][0] for i in order]
+
+
+def _shingles(text: str, size: int = 5) -> set:
+    words = tokenize(text)
+    return {tuple(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+
+
+def _overlap(left: str, right: str) -> int:
+    """Longitud del mayor sufijo de `left` que es prefijo de `right`."""
+    for length in range(min(MAX_OVERLAP_CHARS, len(left), len(right)), MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:length]):
+            return length
+    return 0
+
+
+def dedupe_chunks(documents: Sequence[Document]) -> List[Document]:
+    """Elimina fragmentos repetidos y el texto solapado entre fragmentos contiguos.
+
+    Se respeta el orden de entrada, así que ante un duplicado se conserva el de
+    mejor ranking.
+    """
+    kept: List[Document] = []
+    kept_shingles: List[set] = []
+    for doc in documents:
+        shingles = _shingles(doc.page_content)
+        if any(len(shingles & other) / len(shingles | other) >= DUPLICATE_THRESHOLD for other in kept_shingles):
+            continue
+        content = doc.page_content
+        for other in kept:
+            # El splitter repite el final de un fragmento al inicio del siguiente
+            content = content[_overlap(other.page_content, content):]
+            overlap = _overlap(content, other.page_content)
+            content = content[:len(content) - overlap]
+        if not content.strip():
+            continue
+        kept.append(Document(page_content=content, metadata=doc.metadata))
+        kept_shingles.append(shingles)
+    return kept
+
+
+def pack_context(documents: Sequence[Document], max_tokens: int) -> List[Document]:
+    """Selecciona fragmentos por ranking hasta llenar el presupuesto de tokens.
+
+    Los seleccionados se devuelven en el orden del documento para que el texto
+    de fragmentos contiguos se lea seguido.
+    """
+    packed: List[Tuple[int, Document]] = []
+    budget = max_tokens
+    for rank, doc in enumerate(documents):
+        tokens = count_tokens(doc.page_content)
+        if tokens <= budget:
+            packed.append((rank, doc))
+            budget -= tokens
+    packed.sort(key=lambda item: (
+        str(item[1].metadata.get("document_id", "")),
+        item[1].metadata.get("page_number", item[0]),
+    ))
+    return [doc for _, doc in packed]
+
+
+async def asearch_candidates(vector_store: VectorStore, query: str, document_id: Optional[str] = None) -> List[Tuple[Document, float]]:
+    """Candidatos con su puntuación: búsqueda híbrida si el vector store la soporta."""
+    k = Config.RETRIEVAL_CANDIDATES
+    filters = document_filter(document_id)
+    if hasattr(vector_store, "ahybrid_search_with_score"):
+        with track_call("vector_store", "hybrid_search"):
+            return await vector_store.ahybrid_search_with_score(query, k=k, filters=filters)
+    with track_call("vector_store", "similarity_search"):
+        return await vector_store.asimilarity_search_with_score(query, k=k, filters=filters)
+
+
+async def aretrieve_context(vector_store: VectorStore, query: str, document_id: Optional[str] = None) -> str:
+    """Contexto para el prompt: candidatos reordenados, sin solapamientos y acotados en tokens.
+
+    Las búsquedas idénticas simultáneas (mismo vector store, consulta y
+    documento) comparten una sola llamada al buscador.
+    """
+    try:
+        if Config.LLM_COALESCING:
+            key = f"{id(vector_store)}:{document_id}:{' '.join(query.split())}"
+            candidates = await _search_flight.ado(key, lambda: asearch_candidates(vector_store, query, document_id))
+        else:
+            candidates = await asearch_candidates(vector_store, query, document_id)
+    except Exception as e:
+        logging.error(f"Error al buscar en el vector store: {e}")
+        return ""
+    documents = pack_context(dedupe_chunks(rerank(query, candidates)), Config.RETRIEVAL_MAX_TOKENS)
+    logging.info(f"Contexto recuperado: {len(documents)} de {len(candidates)} fragmentos candidatos")
+    return "\n".join(doc.page_content for doc in documents)
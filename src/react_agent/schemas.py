@@ -0,0 +1,49 @@
+"""Pydantic schemas for the structured outputs requested from the model.
+
+Field names match the JSON documents stored in Cosmos DB and Azure Search, so
+a validated object can be dumped and persisted as-is.
+"""
+
+from typing import List
+
+from pydantic import BaseModel, Field
+
+
+class Question(BaseModel):
+    """Pregunta de selección múltiple."""
+
+    QuestionID: int = Field(..., description="Número incremental de la pregunta")
+    Question: str = Field(..., description="Texto de la pregunta")
+    Options: List[str] = Field(..., min_length=4, max_length=4, description="Las cuatro opciones")
+    CorrectAnswer: int = Field(..., ge=0, le=3, description="Índice de la opción correcta (0-3)")
+
+
+class QuestionSet(BaseModel):
+    """Cuestionario de un tema de una formación."""
+
+    id: str
+    TrainingID: str
+    TopicID: str
+    Questions: List[Question] = Field(..., min_length=1)
+
+
+class TopicItem(BaseModel):
+    """Subtema o concepto dentro de un tema."""
+
+    itemName: str
+
+
+class Topic(BaseModel):
+    """Tema de una formación con sus subtemas."""
+
+    topicName: str
+    items: List[TopicItem] = Field(default_factory=list)
+
+
+class TrainingTopics(BaseModel):
+    """Estructura de temas de una formación."""
+
+    trainingName: str
+    description: str
+    attachment: str = ""
+    topics: List[Topic] = Field(..., min_length=1)
@@ -0,0 +1,249 @@
+"""Semantic answer cache for chatbot questions.
+
+Answers are stored per topic and training document together with the embedding
+of the question that produced them. A new question about the same topic whose
+embedding is close enough to a stored one (cosine similarity above
+`SEMANTIC_CACHE_THRESHOLD`) gets the stored answer without a vector search or a
+completion. Answers are also scoped to the previous assistant turn of the
+conversation, so a follow-up such as "¿puedes darme un ejemplo?" only matches
+answers given at the same point of a conversation and never one written for
+another learner's thread. Entries of a document are dropped when it is re-indexed, and the
+prompts and model deployment are part of the key so changing them starts over.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from react_agent.clients import Closer, config_fingerprint, get_embeddings, registry
+from react_agent.configuration import Config
+from react_agent.instrumentation import (
+    SEMANTIC_CACHE_REQUESTS,
+    SEMANTIC_CACHE_SAVED_SECONDS,
+)
+from react_agent.prompts import CHATBOT_PROMPT, SYSTEM_PROMPT
+
+
+def _normalize_topic(topic: str) -> str:
+    return " ".join(topic.lower().split())
+
+
+def conversation_context(messages: Sequence[Dict[str, Any]]) -> str:
+    """Hash del último turno del asistente, o "" si la conversación aún no tiene ninguno."""
+    for message in reversed(messages):
+        if message.get("role") == "assistant":
+            return hashlib.sha256(str(message.get("content") or "").encode("utf-8")).hexdigest()
+    return ""
+
+
+def answer_version() -> str:
+    """Versión de las respuestas: cambia con los prompts y el deployment del modelo."""
+    parts = (SYSTEM_PROMPT, CHATBOT_PROMPT, Config.AZURE_DEPLOYMENT_NAME, Config.AZURE_OPENAI_API_VERSION)
+    return hashlib.sha256("\0".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+
+
+class SemanticAnswerCache:
+    """Respuestas con el embedding de su pregunta, en SQLite, buscadas por similitud coseno.
+
+    Cada tema de un documento guarda como mucho `max_per_topic` respuestas; al
+    superarlo se eliminan las más antiguas.
+    """
+
+    def __init__(self, path: str, threshold: float, ttl: float, max_per_topic: int) -> None:
+        """Abre (o crea) el caché en la base de datos SQLite `path`."""
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_per_topic = max_per_topic
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, topic TEXT NOT NULL, document_id TEXT NOT NULL, "
+            "version TEXT NOT NULL, question TEXT NOT NULL, vector BLOB NOT NULL, answer TEXT NOT NULL, "
+            "latency REAL NOT NULL, created_at REAL NOT NULL, context TEXT NOT NULL DEFAULT '')"
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(answers)")]
+        if "context" not in columns:
+            # Cachés creados antes de acotar las respuestas a la conversación
+            self._conn.execute("ALTER TABLE answers ADD COLUMN context TEXT NOT NULL DEFAULT ''")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS answers_scope ON answers (document_id, topic, version)")
+        self._conn.commit()
+
+    def lookup(
+        self, topic: str, document_id: Optional[str], version: str, vector: Sequence[float], context: str = ""
+    ) -> Optional[Tuple[str, float, float]]:
+        """Respuesta más parecida por encima del umbral: (respuesta, segundos que costó, similitud).
+
+        Solo se consideran las respuestas dadas tras el mismo turno del asistente (`context`).
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT vector, answer, latency FROM answers "
+                "WHERE document_id = ? AND topic = ? AND version = ? AND context = ? AND created_at >= ?",
+                (document_id or "", _normalize_topic(topic), version, context, time.time() - self.ttl),
+            ).fetchall()
+        if not rows:
+            return None
+        query = np.array(vector, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1
+        # Los vectores se guardan normalizados: el producto escalar es la similitud coseno
+        scores = np.stack([np.frombuffer(row[0], dtype=np.float32) for row in rows]) @ query
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+        return rows[best][1], rows[best][2], float(scores[best])
+
+    def store(
+        self,
+        topic: str,
+        document_id: Optional[str],
+        version: str,
+        question: str,
+        vector: Sequence[float],
+        answer: str,
+        latency: float,
+        context: str = "",
+    ) -> None:
+        """Guarda una respuesta y recorta las más antiguas del tema."""
+        normalized = np.array(vector, dtype=np.float32)
+        normalized /= np.linalg.norm(normalized) or 1
+        scope = (document_id or "", _normalize_topic(topic), version)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO answers (topic, document_id, version, question, vector, answer, latency, created_at, context) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (scope[1], scope[0], version, question, normalized.tobytes(), answer, latency, time.time(), context),
+            )
+            self._conn.execute(
+                "DELETE FROM answers WHERE document_id = ? AND topic = ? AND version = ? AND id NOT IN "
+                "(SELECT id FROM answers WHERE document_id = ? AND topic = ? AND version = ? ORDER BY id DESC LIMIT ?)",
+                (*scope, *scope, self.max_per_topic),
+            )
+            self._conn.commit()
+
+    def invalidate(self, document_id: Optional[str], topic: Optional[str] = None) -> int:
+        """Elimina las respuestas de un documento (o solo las de uno de sus temas)."""
+        with self._lock:
+            if topic is None:
+                cursor = self._conn.execute("DELETE FROM answers WHERE document_id = ?", (document_id or "",))
+            else:
+                cursor = self._conn.execute(
+                    "DELETE FROM answers WHERE document_id = ? AND topic = ?", (document_id or "", _normalize_topic(topic))
+                )
+            self._conn.commit()
+        return cursor.rowcount
+
+    def close(self) -> None:
+        """Cierra la conexión a SQLite."""
+        with self._lock:
+            self._conn.close()
+
+
+def get_semantic_cache() -> Optional[SemanticAnswerCache]:
+    """Caché semántico de respuestas compartido por el proceso (None si está desactivado)."""
+    if not Config.SEMANTIC_CACHE_ENABLED:
+        return None
+    fingerprint = config_fingerprint(
+        Config.SEMANTIC_CACHE_PATH,
+        Config.SEMANTIC_CACHE_THRESHOLD,
+        Config.SEMANTIC_CACHE_TTL,
+        Config.SEMANTIC_CACHE_MAX_PER_TOPIC,
+    )
+
+    def factory() -> Tuple[SemanticAnswerCache, List[Closer]]:
+        cache = SemanticAnswerCache(
+            Config.SEMANTIC_CACHE_PATH,
+            Config.SEMANTIC_CACHE_THRESHOLD,
+            Config.SEMANTIC_CACHE_TTL,
+            Config.SEMANTIC_CACHE_MAX_PER_TOPIC,
+        )
+        return cache, [cache.close]
+
+    return registry.get("semantic_cache", fingerprint, factory)
+
+
+class SemanticLookup:
+    """Resultado de buscar una pregunta en el caché, con lo necesario para guardar su respuesta."""
+
+    def __init__(self, topic: str, document_id: Optional[str], question: str, context: str = "") -> None:
+        """Prepara la búsqueda; el embedding de la pregunta se calcula al consultar el caché."""
+        self.topic = topic
+        self.document_id = document_id
+        self.question = question
+        self.context = context
+        self.version = answer_version()
+        self.vector: Optional[List[float]] = None
+        self.answer: Optional[str] = None
+        self.started = time.perf_counter()
+
+    async def store(self, answer: str) -> None:
+        """Guarda la respuesta generada con el tiempo que costó obtenerla."""
+        cache = get_semantic_cache()
+        if cache is None or self.vector is None or not answer:
+            return
+        latency = time.perf_counter() - self.started
+        try:
+            await asyncio.to_thread(
+                cache.store,
+                self.topic,
+                self.document_id,
+                self.version,
+                self.question,
+                self.vector,
+                answer,
+                latency,
+                self.context,
+            )
+        except Exception as e:
+            logging.warning(f"Error guardando en el caché semántico: {e}")
+
+
+async def asemantic_lookup(
+    topic: str, document_id: Optional[str], question: str, context: str = ""
+) -> SemanticLookup:
+    """Busca una respuesta cacheada para una pregunta casi idéntica sobre el mismo tema.
+
+    `context` identifica el punto de la conversación (ver `conversation_context`).
+
+    Los errores (embeddings o SQLite) se registran y se tratan como un fallo de
+    caché para no romper la conversación.
+    """
+    lookup = SemanticLookup(topic, document_id, question, context)
+    cache = get_semantic_cache()
+    if cache is None:
+        return lookup
+    try:
+        lookup.vector = await get_embeddings().aembed_query(question)
+        found = await asyncio.to_thread(cache.lookup, topic, document_id, lookup.version, lookup.vector, context)
+    except Exception as e:
+        logging.warning(f"Error consultando el caché semántico: {e}")
+        return lookup
+    if found is None:
+        SEMANTIC_CACHE_REQUESTS.labels("miss").inc()
+        return lookup
+    lookup.answer, saved, similarity = found
+    SEMANTIC_CACHE_REQUESTS.labels("hit").inc()
+    # Tiempo ahorrado: lo que costó la respuesta original menos lo que ha costado encontrarla
+    SEMANTIC_CACHE_SAVED_SECONDS.inc(max(0.0, saved - (time.perf_counter() - lookup.started)))
+    logging.info(f"Respuesta del topic {topic} servida desde el caché semántico (similitud {similarity:.3f})")
+    return lookup
+
+
+def invalidate_document(document_id: str) -> None:
+    """Descarta las respuestas cacheadas de un documento tras reindexarlo."""
+    cache = get_semantic_cache()
+    if cache is None:
+        return
+    removed = cache.invalidate(document_id)
+    if removed:
+        logging.info(f"Caché semántico: {removed} respuestas del documento {document_id} descartadas")
@@ -71,6 +71,14 @@ class QuestionState(TypedDict):
     status: str = "pending"
 
 
+class BulkQuestionState(TypedDict):
+    """Estado de la generación masiva de preguntas."""
+    items: List[Dict[str, str]]  # text, training_id y topic_id de cada tema
+    questions: List[Optional[Dict[str, Any]]]  # Cuestionario generado por tema (None si falló)
+    results: List[Dict[str, Any]]  # Estado final por tema
+    status: str
+
+
 class TopicsState(TypedDict):
     # Messages have the type "list". The `add_messages` function
     # in the annotation defines how this state key should be updated
@@ -82,6 +90,7 @@ class TopicsState(TypedDict):
     status: str  # "start" para explicación, "question" para responder preguntas
     response: Optional[str] = None  # Se llenará con la respuesta generada
     id_user: str
+    document_id: Optional[str]  # Documento de la formación al que se limita la búsqueda
     messages: List[Dict[str, str]]  # Agregamos el historial de mensajes
 
 
@@ -93,6 +102,7 @@ class GenerateTopicsState(TypedDict):
     url: Optional[str]
     topics_list: List[str]
     topics_json: List[Dict[str, Any]]
+    progress: Dict[str, int]  # Páginas, fragmentos, embebidos y subidos durante la ingesta
 
 
 class FeedbackState(TypedDict):
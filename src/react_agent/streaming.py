@@ -0,0 +1,40 @@
+"""Server-Sent Events helpers for streaming agent tokens to the client."""
+
+import json
+import logging
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+from langgraph.constants import TAG_NOSTREAM
+from langgraph.graph.state import CompiledStateGraph
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Serializa un evento en formato Server-Sent Events."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def stream_agent(
+    agent: CompiledStateGraph,
+    initial_state: Dict[str, Any],
+    build_result: Callable[[Dict[str, Any]], Dict[str, Any]],
+    config: Optional[Dict[str, Any]] = None,
+) -> AsyncIterator[str]:
+    """Ejecuta el agente emitiendo cada token del modelo como evento `token`.
+
+    Al terminar el grafo (y por tanto después de que el checkpointer haya
+    guardado el estado final) se emite un evento `end` con el resultado
+    construido a partir del estado final. Si la respuesta salió de un caché no
+    habrá tokens previos y el evento `end` trae la respuesta completa.
+    """
+    try:
+        async for event in agent.astream_events(initial_state, config, version="v2"):
+            kind = event["event"]
+            if kind == "on_chat_model_stream" and TAG_NOSTREAM not in event.get("tags", []):
+                content = event["data"]["chunk"].content
+                if content:
+                    yield sse_event("token", {"content": content, "node": event["metadata"].get("langgraph_node")})
+            elif kind == "on_chain_end" and not event.get("parent_ids"):
+                yield sse_event("end", build_result(event["data"]["output"]))
+    except Exception as e:
+        logging.error(f"Error durante el streaming del agente {agent.name}: {e}")
+        yield sse_event("error", {"detail": str(e)})
@@ -0,0 +1,172 @@
+"""Structured output for model completions.
+
+Completions are requested in JSON mode (or with function calling) and validated
+against a Pydantic schema. When the model output is still malformed (code
+fences, trailing prose, trailing commas or a completion cut off by the token
+limit) it is repaired locally instead of paying for another model call.
+"""
+
+import json
+import logging
+from typing import Any, List, Tuple, Type, TypeVar
+
+from langchain_core.language_models import BaseChatModel, LanguageModelInput
+from langchain_core.messages import BaseMessage
+from pydantic import BaseModel, ValidationError
+
+from react_agent.configuration import Config
+
+SchemaT = TypeVar("SchemaT", bound=BaseModel)
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+def _close(prefix: str, stack: List[str]) -> str:
+    body = prefix.rstrip()
+    if body.endswith(","):
+        body = body[:-1]
+    return body + "".join(reversed(stack))
+
+
+def _repair(text: str) -> Tuple[str, bool]:
+    """Devuelve el primer valor JSON de `text` reparado e indica si estaba completo."""
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        raise ValueError("No se encontró JSON en la respuesta del modelo")
+
+    out: List[str] = []
+    stack: List[str] = []
+    # Puntos donde se puede truncar sin romper el JSON: tras abrir un contenedor o antes de una coma
+    checkpoints: List[Tuple[int, List[str]]] = []
+    in_string = escape = False
+    for char in text[min(starts):]:
+        if in_string:
+            out.append(char)
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char in _CLOSERS:
+            stack.append(_CLOSERS[char])
+            out.append(char)
+            checkpoints.append((len(out), list(stack)))
+            continue
+        elif char in "}]":
+            # Eliminar comas finales ("[1, 2,]") y cerrar con el delimitador esperado
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            out.append(stack.pop())
+            if not stack:
+                # Se ignora el texto que el modelo añada después del JSON
+                return "".join(out), True
+            continue
+        elif char == ",":
+            checkpoints.append((len(out), list(stack)))
+        out.append(char)
+
+    # Salida truncada: cerrar la cadena abierta y los contenedores, o retroceder
+    # hasta el último elemento completo si lo último quedó a medias
+    candidates = [_close("".join(out) + ('"' if in_string else ""), stack)]
+    candidates += [_close("".join(out[:length]), closers) for length, closers in reversed(checkpoints)]
+    for candidate in candidates:
+        try:
+            json.loads(candidate, strict=False)
+        except json.JSONDecodeError:
+            continue
+        return candidate, False
+    raise ValueError("No se pudo reparar el JSON de la respuesta del modelo")
+
+
+def repair_json(text: str) -> str:
+    """Extrae y repara el primer objeto o lista JSON de una completion."""
+    return _repair(text)[0]
+
+
+def parse_partial_json(text: str) -> Any:
+    """Parsea el JSON de una completion, completa o truncada.
+
+    Acepta cualquier prefijo de una respuesta en streaming y devuelve el valor
+    con los elementos completos recibidos hasta el momento.
+    """
+    return json.loads(repair_json(text), strict=False)
+
+
+def _drop_invalid_tail(data: Any, error: ValidationError) -> bool:
+    """Elimina el último elemento de una lista si es el que no valida (cortado por el límite de tokens)."""
+    for detail in error.errors():
+        loc = detail["loc"]
+        for depth in range(len(loc) - 1, -1, -1):
+            if not isinstance(loc[depth], int):
+                continue
+            try:
+                container = data
+                for key in loc[:depth]:
+                    container = container[key]
+            except (KeyError, IndexError, TypeError):
+                continue
+            if isinstance(container, list) and loc[depth] == len(container) - 1:
+                container.pop()
+                return True
+    return False
+
+
+def parse_structured(text: str, schema: Type[SchemaT]) -> SchemaT:
+    """Repara y valida una completion contra `schema`.
+
+    Si la completion estaba truncada, se descartan los elementos finales que
+    quedaron incompletos y se conservan los demás.
+    """
+    repaired, complete = _repair(text)
+    data = json.loads(repaired, strict=False)
+    while True:
+        try:
+            return schema.model_validate(data)
+        except ValidationError as e:
+            if complete or not _drop_invalid_tail(data, e):
+                raise
+
+
+def _raw_text(message: BaseMessage) -> str:
+    """Texto JSON de la respuesta cruda: argumentos de la tool call o contenido."""
+    for call in getattr(message, "invalid_tool_calls", None) or []:
+        if call.get("args"):
+            return call["args"]
+    for call in getattr(message, "tool_calls", None) or []:
+        return json.dumps(call["args"])
+    return message.content
+
+
+def structured_model(model: BaseChatModel, schema: Type[BaseModel]):
+    """Modelo que devuelve la salida cruda y la validada contra `schema`."""
+    return model.with_structured_output(schema, method=Config.STRUCTURED_OUTPUT_METHOD, include_raw=True)
+
+
+def _validated(output: dict, schema: Type[SchemaT]) -> SchemaT:
+    if output.get("parsed") is not None:
+        return output["parsed"]
+    logging.warning(f"Salida estructurada inválida, reparándola localmente: {output.get('parsing_error')}")
+    return parse_structured(_raw_text(output["raw"]), schema)
+
+
+def invoke_structured(model: BaseChatModel, prompt: LanguageModelInput, schema: Type[SchemaT]) -> SchemaT:
+    """Invoca el modelo y devuelve su salida validada contra `schema`.
+
+    Con `STRUCTURED_OUTPUT_METHOD=none` se usa la completion en texto libre.
+    """
+    if Config.STRUCTURED_OUTPUT_METHOD == "none":
+        return parse_structured(model.invoke(prompt).content, schema)
+    return _validated(structured_model(model, schema).invoke(prompt), schema)
+
+
+async def ainvoke_structured(model: BaseChatModel, prompt: LanguageModelInput, schema: Type[SchemaT]) -> SchemaT:
+    """Versión async de `invoke_structured`."""
+    if Config.STRUCTURED_OUTPUT_METHOD == "none":
+        return parse_structured((await model.ainvoke(prompt)).content, schema)
+    return _validated(await structured_model(model, schema).ainvoke(prompt), schema)
@@ -0,0 +1,42 @@
+"""Token counting helpers shared by the history and prompt budgeting code."""
+
+import functools
+import logging
+from typing import Any, Dict, Iterable, Optional
+
+from react_agent.configuration import Config
+
+# Tokens fijos que añade el formato de chat por cada mensaje (rol y separadores)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@functools.lru_cache(maxsize=1)
+def _encoding() -> Optional[Any]:
+    """Carga una única vez el tokenizador configurado, si está disponible."""
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding(Config.TOKENIZER_ENCODING)
+    except Exception as e:
+        logging.warning(f"Tokenizador {Config.TOKENIZER_ENCODING} no disponible, se estimarán los tokens: {e}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Cuenta los tokens de un texto (aproximación de 4 caracteres por token sin tokenizador)."""
+    if not text:
+        return 0
+    encoding = _encoding()
+    if encoding is None:
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text))
+
+
+def message_tokens(message: Dict[str, Any]) -> int:
+    """Tokens que ocupa un mensaje de chat `{"role": ..., "content": ...}`."""
+    return count_tokens(str(message.get("content") or "")) + MESSAGE_OVERHEAD_TOKENS
+
+
+def messages_tokens(messages: Iterable[Dict[str, Any]]) -> int:
+    """Tokens totales de una lista de mensajes de chat."""
+    return sum(message_tokens(message) for message in messages)
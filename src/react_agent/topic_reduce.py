@@ -0,0 +1,142 @@
+"""Hierarchical reduction of the per-chunk topics of a document.
+
+`agenerate_topics` returns one topic list per chunk, so for a long manual the
+final JSON synthesis would receive thousands of mostly repeated lines. Before
+that call the lists are split into single topics and near-duplicates are folded
+together locally by embedding similarity. If the result is still over the
+token budget, it is cut into bounded groups that the model merges in parallel,
+level by level, until it fits.
+"""
+
+import logging
+import re
+from typing import Iterable, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+
+from react_agent.concurrency import gather_bounded
+from react_agent.prompt_registry import render_prompt
+from react_agent.prompts import MERGE_TOPICS_PROMPT
+from react_agent.tokens import count_tokens
+
+# Viñetas, numeración y marcado Markdown al principio de cada línea
+_BULLET = re.compile(r"^\s*(?:[-*•+]+|\d+[.)]|#+)\s*")
+_MARKUP = re.compile(r"[*_`]+")
+
+
+def _normalize(topic: str) -> str:
+    return " ".join(topic.lower().split())
+
+
+def split_topics(outputs: Iterable[str]) -> List[str]:
+    """Separa las respuestas del modelo en temas sueltos, sin viñetas ni duplicados exactos.
+
+    Las líneas sin viñeta que terminan en ":" son frases de introducción
+    ("Los temas principales son:") y se descartan.
+    """
+    topics: List[str] = []
+    seen = set()
+    for output in outputs:
+        for line in str(output or "").splitlines():
+            if not _BULLET.match(line) and line.rstrip().endswith(":"):
+                continue
+            topic = _MARKUP.sub("", _BULLET.sub("", line)).strip(" \t:.-")
+            key = _normalize(topic)
+            if key and key not in seen:
+                seen.add(key)
+                topics.append(topic)
+    return topics
+
+
+def cluster_topics(topics: Sequence[str], vectors: Sequence[Sequence[float]], threshold: float) -> List[str]:
+    """Agrupa los temas cuya similitud coseno con el primero de un grupo supera `threshold`.
+
+    Devuelve el primer tema de cada grupo, en el orden del documento.
+    """
+    if not topics:
+        return []
+    matrix = np.array(vectors, dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True).clip(min=1e-12)
+    leaders: List[int] = []
+    for index in range(len(topics)):
+        if leaders and float(np.max(matrix[leaders] @ matrix[index])) >= threshold:
+            continue
+        leaders.append(index)
+    return [topics[index] for index in leaders]
+
+
+def group_by_tokens(topics: Sequence[str], max_tokens: int) -> List[List[str]]:
+    """Parte la lista en grupos consecutivos de como mucho `max_tokens` tokens."""
+    groups: List[List[str]] = []
+    current: List[str] = []
+    size = 0
+    for topic in topics:
+        tokens = count_tokens(topic) + 1
+        if current and size + tokens > max_tokens:
+            groups.append(current)
+            current, size = [], 0
+        current.append(topic)
+        size += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+def topics_tokens(topics: Sequence[str]) -> int:
+    """Tokens que ocupa la lista de temas, uno por línea."""
+    return sum(count_tokens(topic) + 1 for topic in topics)
+
+
+async def _adeduplicate(topics: List[str], embeddings: Optional[Embeddings], threshold: float) -> List[str]:
+    if embeddings is None or len(topics) < 2:
+        return topics
+    try:
+        vectors = await embeddings.aembed_documents(topics)
+    except Exception as e:
+        # Sin embeddings la reducción sigue, solo con los duplicados exactos eliminados
+        logging.warning(f"No se pudieron agrupar los topics por similitud: {e}")
+        return topics
+    return cluster_topics(topics, vectors, threshold)
+
+
+async def areduce_topics(
+    outputs: Iterable[str],
+    model: BaseChatModel,
+    embeddings: Optional[Embeddings],
+    *,
+    threshold: float,
+    group_tokens: int,
+    max_tokens: int,
+    max_levels: int,
+    max_concurrency: int,
+    max_retries: int,
+) -> List[str]:
+    """Reduce los temas por fragmento a una lista compacta de como mucho `max_tokens` tokens.
+
+    Cada nivel fusiona en paralelo grupos de `group_tokens` tokens; un grupo
+    cuya fusión falla se conserva tal cual. Se detiene al caber en el
+    presupuesto, tras `max_levels` niveles o cuando un nivel no reduce la lista.
+    `max_retries` son los reintentos ante 429 de cada fusión; con un modelo que
+    ya los reintenta por su cuenta debe ser 0.
+    """
+    topics = await _adeduplicate(split_topics(outputs), embeddings, threshold)
+    logging.info(f"{len(topics)} topics tras eliminar duplicados ({topics_tokens(topics)} tokens)")
+
+    async def merge(group: List[str]) -> str:
+        response = await model.ainvoke(render_prompt(MERGE_TOPICS_PROMPT, lista="\n".join(group)))
+        return str(response.content)
+
+    for level in range(max_levels):
+        if topics_tokens(topics) <= max_tokens:
+            break
+        groups = group_by_tokens(topics, group_tokens)
+        merged = await gather_bounded(merge, groups, max_concurrency=max_concurrency, max_retries=max_retries)
+        reduced = split_topics(result if result else "\n".join(group) for result, group in zip(merged, groups))
+        reduced = await _adeduplicate(reduced, embeddings, threshold)
+        logging.info(f"Nivel {level + 1} de reducción: {len(groups)} grupos, {len(topics)} -> {len(reduced)} topics")
+        if len(reduced) >= len(topics):
+            break
+        topics = reduced
+    return topics
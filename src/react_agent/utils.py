@@ -1,63 +1,81 @@
 """Utility & helper functions."""
+import asyncio
 import uuid
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage
 from react_agent.prompts import QUESTION_PROMPT, TOPICS_GET_PROMPT, GENERATE_JSON_TOPICS_PROMPT
-from langchain.chains import LLMChain
-from langchain_openai import AzureOpenAIEmbeddings
-from langchain_community.vectorstores import AzureSearch
-from langchain_text_splitters import CharacterTextSplitter
-from langchain_community.document_loaders import PyPDFLoader
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableLambda
+from langchain_core.vectorstores import VectorStore
 from react_agent.state import QuestionState
-from azure.cosmos import CosmosClient
 from typing import List, Dict, Any, Literal
-from langchain_openai import AzureChatOpenAI
-from langchain.prompts import PromptTemplate
-from azure.core.credentials import AzureKeyCredential
-from azure.search.documents.indexes import SearchIndexClient
-from langchain.schema import Document   
+from langchain_core.documents import Document
 
 from react_agent.configuration import Config
+from react_agent.concurrency import gather_bounded
+from react_agent.instrumentation import track_call
+from react_agent.ingestion import ProgressCallback, chunk_id, stream_embeddings
+from react_agent.ingest_manifest import get_ingest_manifest
+from react_agent.pdf_extraction import extract_pages
+from react_agent.prompt_registry import render_prompt
+from react_agent.schemas import QuestionSet, TrainingTopics
+from react_agent.semantic_cache import invalidate_document
+from react_agent import topic_reduce
+from react_agent.structured_output import ainvoke_structured, invoke_structured
+from react_agent.clients import get_async_cosmos_container, get_chat_model, get_cosmos_container, get_embeddings, get_vector_store
 import json
 import logging
 
 
 config = Config()
 
-def load_model() -> AzureChatOpenAI:
-    """Load and configure the Azure OpenAI model."""
-    return AzureChatOpenAI(
-        azure_endpoint=Config.AZURE_OPENAI_ENDPOINT,
-        azure_deployment=Config.AZURE_DEPLOYMENT_NAME,
-        api_version=Config.AZURE_OPENAI_API_VERSION,
-        api_key=Config.AZURE_OPENAI_API_KEY,
-        temperature=0.7,
-    )
+def load_model() -> BaseChatModel:
+    """Devuelve el modelo de Azure OpenAI compartido por el proceso."""
+    return get_chat_model()
 
 
-def generate_questions(state: QuestionState, model: AzureChatOpenAI) -> Dict[str, Any] :
+def generate_questions(state: QuestionState, model: BaseChatModel) -> Dict[str, Any] :
     """Generar pregunta de seleccion multiple"""
     try:
-        prompt = QUESTION_PROMPT.format(text=state["text"], uuid=str(uuid.uuid4()), training_id=state["training_id"], topic_id=state["topic_id"])
-        response = model.invoke(prompt)
-        logging.info(response)
-
-        if not response or not response.content:
-            print("No se recibió respuesta del modelo")
-            return {"messages": "No se recibió respuesta del modelo"}
-            
-        content = response.content
-        data = json.loads(content)
-        return data
+        question_id = str(uuid.uuid4())
+        prompt = render_prompt(QUESTION_PROMPT, text=state["text"], uuid=question_id, training_id=state["training_id"], topic_id=state["topic_id"])
+        questions = invoke_structured(model, prompt, QuestionSet)
+        logging.info(questions)
+        return _questions_document(questions, question_id, state)
+    except Exception as e:
+        print(f"Error al generar preguntas: {str(e)}")
+        return {"messages": f"Error al generar preguntas: {str(e)}"}
+
+
+async def agenerate_questions(state: QuestionState, model: BaseChatModel) -> Dict[str, Any]:
+    """Versión async de `generate_questions`."""
+    try:
+        return await agenerate_questions_or_raise(state, model)
     except Exception as e:
         print(f"Error al generar preguntas: {str(e)}")
         return {"messages": f"Error al generar preguntas: {str(e)}"}
 
 
+async def agenerate_questions_or_raise(state: QuestionState, model: BaseChatModel) -> Dict[str, Any]:
+    """Como `agenerate_questions`, pero propaga los errores (p. ej. 429) a quien la llama."""
+    question_id = str(uuid.uuid4())
+    prompt = render_prompt(QUESTION_PROMPT, text=state["text"], uuid=question_id, training_id=state["training_id"], topic_id=state["topic_id"])
+    questions = await ainvoke_structured(model, prompt, QuestionSet)
+    logging.info(questions)
+    return _questions_document(questions, question_id, state)
+
+
+def _questions_document(questions: QuestionSet, question_id: str, state: QuestionState) -> Dict[str, Any]:
+    """Documento de Cosmos DB del cuestionario, con los ids fijados por el servidor y no por el modelo."""
+    document = questions.model_dump()
+    document.update(id=question_id, TrainingID=state["training_id"], TopicID=state["topic_id"])
+    return document
+
+
 def save_to_cosmos(state: QuestionState):
     """Guarda las preguntas en Cosmos DB."""
-    client = CosmosClient(config.COSMOS_ENDPOINT, credential=config.COSMOS_KEY)
-    database = client.get_database_client(config.COSMOS_DATABASE_NAME)
-    container = database.get_container_client(config.COSMOS_CONTAINER_NAME)
+    container = get_cosmos_container()
     
     try:
         container.create_item(state["questions"])
@@ -67,49 +85,176 @@ def save_to_cosmos(state: QuestionState):
         return QuestionState(text=state.text, questions=state.questions, status="error")
 
 
-def load_text_embedding_model() -> AzureOpenAIEmbeddings:
-    return AzureOpenAIEmbeddings(
-        azure_endpoint=config.AZURE_TEXT_EMBEDDING_ENDPOINT,
-        azure_deployment=config.AZURE_TEXT_EMBEDDING_DEPLOYMENT,
-        api_version=config.AZURE_TEXT_EMBEDDING_API_VERSION,
-        api_key=config.AZURE_TEXT_EMBEDDING_API_KEY,
-    )
+async def asave_to_cosmos(state: QuestionState):
+    """Versión async de `save_to_cosmos` usando el cliente async de Cosmos DB."""
+    container = get_async_cosmos_container()
+
+    try:
+        with track_call("cosmos", "create_item"):
+            await container.create_item(state["questions"])
+        return QuestionState(text=state["text"], questions=state["questions"], status="saved")
+    except Exception as e:
+        logging.error(f"Error al guardar en Cosmos DB: {str(e)}")
+        return QuestionState(text=state["text"], questions=state["questions"], status="error")
 
 
-def load_vector_store( embeddings: AzureOpenAIEmbeddings) -> AzureSearch:
-    return AzureSearch(
-        azure_search_endpoint=config.VECTOR_STORE_ADDRESS,
-        azure_search_key=config.VECTOR_STORE_PASSWORD,
-        index_name=config.VECTOR_STORE_INDEX_NAME,
-        embedding_function=embeddings.embed_query
-    )
+# Máximo de operaciones por batch transaccional de Cosmos DB
+COSMOS_MAX_BATCH_OPERATIONS = 100
 
+_partition_key_paths: Dict[str, List[str]] = {}
 
-def save_embeddings(document_id: str, pdf_path: str):
-    """Guarda los embeddings en Azure Search."""  
-    embeddings = load_text_embedding_model()  
-    vector_store = load_vector_store(embeddings)  
-    loader = PyPDFLoader(pdf_path)  
-    documents = loader.load()  
+
+async def _get_partition_key_paths(container) -> List[str]:
+    """Rutas de la clave de partición del contenedor (configuradas o leídas una vez)."""
+    if config.COSMOS_PARTITION_KEY_PATH:
+        return [config.COSMOS_PARTITION_KEY_PATH]
+    if container.id not in _partition_key_paths:
+        properties = await container.read()
+        _partition_key_paths[container.id] = properties["partitionKey"]["paths"]
+    return _partition_key_paths[container.id]
+
+
+def _partition_key_value(item: Dict[str, Any], paths: List[str]):
+    """Extrae el valor de la clave de partición de un documento (None en las rutas que no tiene)."""
+    values = []
+    for path in paths:
+        value: Any = item
+        for part in path.strip("/").split("/"):
+            value = value.get(part) if isinstance(value, dict) else None
+        values.append(value)
+    return values[0] if len(values) == 1 else values
+
+
+async def asave_questions_batch(question_sets: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Guarda muchos cuestionarios en Cosmos DB con batches transaccionales por partición.
+
+    Devuelve el estado de cada cuestionario en el mismo orden. Si un batch falla,
+    sus documentos se reintentan uno a uno para aislar el que provoca el error.
+    Los documentos sin valor para la clave de partición se rechazan sin enviarlos.
+    """
+    container = get_async_cosmos_container()
+    paths = await _get_partition_key_paths(container)
+    statuses: List[Dict[str, Any]] = [{"id": item.get("id"), "status": "pending"} for item in question_sets]
+
+    # Agrupar por partición y dividir en batches del tamaño máximo permitido
+    partitions: Dict[str, List[int]] = {}
+    for i, item in enumerate(question_sets):
+        partition_key = _partition_key_value(item, paths)
+        if partition_key is None or (isinstance(partition_key, list) and None in partition_key):
+            logging.error(f"Cuestionario {item.get('id')} sin valor para la clave de partición {paths}")
+            statuses[i].update(status="error", error=f"Falta la clave de partición {', '.join(paths)}")
+            continue
+        partitions.setdefault(json.dumps(partition_key), []).append(i)
+    batches = [
+        (json.loads(key), indices[start:start + COSMOS_MAX_BATCH_OPERATIONS])
+        for key, indices in partitions.items()
+        for start in range(0, len(indices), COSMOS_MAX_BATCH_OPERATIONS)
+    ]
+
+    async def save_batch(batch) -> None:
+        partition_key, indices = batch
+        try:
+            with track_call("cosmos", "execute_item_batch"):
+                await container.execute_item_batch([("create", (question_sets[i],)) for i in indices], partition_key=partition_key)
+            for i in indices:
+                statuses[i]["status"] = "saved"
+            return
+        except Exception as e:
+            logging.warning(f"Batch de Cosmos DB fallido para la partición {partition_key}, guardando uno a uno: {e}")
+        for i in indices:
+            try:
+                with track_call("cosmos", "create_item"):
+                    await container.create_item(question_sets[i])
+                statuses[i]["status"] = "saved"
+            except Exception as e:
+                logging.error(f"Error al guardar en Cosmos DB: {str(e)}")
+                statuses[i].update(status="error", error=str(e))
+
+    await gather_bounded(save_batch, batches, max_concurrency=config.COSMOS_MAX_CONCURRENCY)
+    return statuses
+
+
+def load_text_embedding_model() -> Embeddings:
+    """Devuelve el modelo de embeddings compartido por el proceso."""
+    return get_embeddings()
+
+
+def load_vector_store(embeddings: Embeddings | None = None) -> VectorStore:
+    """Devuelve el vector store compartido por el proceso (Azure Search o el índice local)."""
+    return get_vector_store(embeddings)
+
+
+def _load_indexed_docs(document_id: str, pdf_path: str) -> List[Document]:
+    """Carga el PDF y lo divide en fragmentos listos para indexar."""
+    # Importación diferida: solo hace falta al indexar un PDF
+    from langchain_text_splitters import CharacterTextSplitter
+
+    documents = list(extract_pages(pdf_path))
   
     # Dividir el texto en fragmentos para indexarlo  
     text_splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=200)  
     docs = text_splitter.split_documents(documents)  
   
-    indexed_docs = [  
+    return [  
         Document(  
             page_content=doc.page_content,  # Contenido del fragmento  
             metadata={  # Agregar metadatos  
-                "id": f"{document_id}_{i}",  # Genera un ID único para cada fragmento  
+                "id": chunk_id(document_id, doc.page_content),  # Id derivado del texto del fragmento
                 "document_id": document_id,  
                 "page_number": i + 1  # Número de página como metadato (opcional)  
             }  
         )  
         for i, doc in enumerate(docs)  
     ]  
-  
-    vector_store.add_documents(documents=indexed_docs)  
+
+
+def document_id_for(url: str) -> str:
+    """document_id de una formación: el de su última indexación o uno nuevo."""
+    return get_ingest_manifest().document_id(url) or str(uuid.uuid4())
+
+
+def save_embeddings(document_id: str, pdf_path: str) -> Dict[str, int]:
+    """Guarda los embeddings en Azure Search, subiendo solo los fragmentos nuevos."""  
+    embeddings = load_text_embedding_model()  
+    vector_store = load_vector_store(embeddings)  
+    manifest = get_ingest_manifest()
+    known = manifest.chunks(pdf_path, document_id)
+    current = {doc.metadata["id"]: doc for doc in _load_indexed_docs(document_id, pdf_path)}
+
+    new_docs = [doc for key, doc in current.items() if key not in known]
+    removed = [key for key in known if key not in current]
+    chunks = {key: value for key, value in known.items() if key in current}
+    if new_docs:
+        ids = [doc.metadata["id"] for doc in new_docs]
+        chunks.update(zip(ids, vector_store.add_documents(documents=new_docs, ids=ids)))
+    if removed:
+        vector_store.delete([known[key] for key in removed])
+    manifest.save(pdf_path, document_id, chunks)
+
+    report = {"uploaded": len(new_docs), "unchanged": len(current) - len(new_docs), "removed": len(removed)}
+    if new_docs or removed:
+        invalidate_document(document_id)
+    logging.info(f"Documentos indexados con ID: {document_id}: {report}")
+    return report
+
+
+async def asave_embeddings(document_id: str, pdf_path: str, on_progress: ProgressCallback | None = None) -> Dict[str, int]:
+    """Versión async de `save_embeddings` que indexa el PDF en streaming."""
+    embeddings = load_text_embedding_model()
+    vector_store = load_vector_store(embeddings)
+    manifest = get_ingest_manifest()
+    chunks = await asyncio.to_thread(manifest.chunks, pdf_path, document_id)
+    progress = await stream_embeddings(
+        document_id, pdf_path, embeddings, vector_store, on_progress=on_progress, chunks=chunks
+    )
+    # El manifiesto solo se actualiza tras una indexación completa; si se interrumpe,
+    # la siguiente vuelve a subir los fragmentos nuevos con las mismas claves
+    await asyncio.to_thread(manifest.save, pdf_path, document_id, chunks)
+    if progress["uploaded"] or progress["removed"]:
+        # Las respuestas cacheadas se basaban en el contenido anterior del documento
+        await asyncio.to_thread(invalidate_document, document_id)
     logging.info(f"Documentos indexados con ID: {document_id}")
+    return progress
 
     
 def generate_topics(document_id: str) -> List[str]:  
@@ -134,42 +279,82 @@ def generate_topics(document_id: str) -> List[str]:
         return []  
   
     model = load_model()  
-    prompt = PromptTemplate(  
-        input_variables=["content"],  
-        template=TOPICS_GET_PROMPT,  
-    )  
-    chain = LLMChain(llm=model, prompt=prompt)  
+    prompt = RunnableLambda(lambda values: render_prompt(TOPICS_GET_PROMPT, **values))
+    chain = prompt | model | StrOutputParser()
   
     # Generar temas para cada fragmento del documento  
     topics = []  
     for result in search_results:  
-        content = result["content"]  
-        result_topics = chain.run(content)  
+        content = result.page_content  
+        result_topics = chain.invoke({"content": content})
         topics.append(result_topics)  
   
     return topics  
 
 
-def generate_json_topics(lista_topics: List[str], training_name: str, description: str, url: str) -> Dict[str, Any]:
-    """Genera un JSON con los temas para el índice de Azure Search."""
-    model = load_model()
+async def agenerate_topics(document_id: str) -> List[str]:
+    """Versión async de `generate_topics`."""
+    vector_store = load_vector_store(load_text_embedding_model())
 
-    prompt = GENERATE_JSON_TOPICS_PROMPT.format(lista=lista_topics, training_name=training_name, description=description, url=url)
-    response = model.invoke(prompt)    
+    try:
+        search_results = await vector_store.asearch(query="*", search_type="similarity", filter=f"metadata/document_id eq '{document_id}'")
+    except Exception as e:
+        logging.error(f"Error al buscar en el vector store: {e}")
+        return []
 
-    if not response or not response.content:
-        print("No se recibió respuesta del modelo")
-        return {"messages": "No se recibió respuesta del modelo"}
-    else:
-        result = json.loads(response.content)
-        return result
+    if not search_results:
+        logging.error(f"No se encontraron documentos con document_id: {document_id}")
+        return []
 
+    model = load_model()
+    prompt = RunnableLambda(lambda values: render_prompt(TOPICS_GET_PROMPT, **values))
+    chain = prompt | model | StrOutputParser()
 
+    # Extraer los temas de cada fragmento en paralelo, conservando el orden original
+    topics = await gather_bounded(
+        chain.ainvoke,
+        [{"content": result.page_content} for result in search_results],
+        max_concurrency=config.TOPICS_MAX_CONCURRENCY,
+        # El modelo ya reintenta los 429 con su propio backoff
+        max_retries=0,
+    )
+    return [topic for topic in topics if topic is not None]
 
 
+async def areduce_topics(lista_topics: List[str]) -> List[str]:
+    """Compacta los temas por fragmento para que la síntesis del JSON quepa en el contexto."""
+    return await topic_reduce.areduce_topics(
+        lista_topics,
+        load_model(),
+        load_text_embedding_model(),
+        threshold=config.TOPICS_CLUSTER_THRESHOLD,
+        group_tokens=config.TOPICS_REDUCE_GROUP_TOKENS,
+        max_tokens=config.TOPICS_REDUCE_MAX_TOKENS,
+        max_levels=config.TOPICS_REDUCE_MAX_LEVELS,
+        max_concurrency=config.TOPICS_MAX_CONCURRENCY,
+        max_retries=0,
+    )
 
 
+def generate_json_topics(lista_topics: List[str], training_name: str, description: str, url: str) -> Dict[str, Any]:
+    """Genera un JSON con los temas para el índice de Azure Search."""
+    model = load_model()
 
+    prompt = render_prompt(GENERATE_JSON_TOPICS_PROMPT, lista=lista_topics, training_name=training_name, description=description, url=url)
+    try:
+        return invoke_structured(model, prompt, TrainingTopics).model_dump()
+    except Exception as e:
+        print(f"Error al generar el JSON de topics: {str(e)}")
+        return {"messages": f"Error al generar el JSON de topics: {str(e)}"}
 
 
+async def agenerate_json_topics(lista_topics: List[str], training_name: str, description: str, url: str) -> Dict[str, Any]:
+    """Versión async de `generate_json_topics`."""
+    model = load_model()
 
+    prompt = render_prompt(GENERATE_JSON_TOPICS_PROMPT, lista=lista_topics, training_name=training_name, description=description, url=url)
+    try:
+        return (await ainvoke_structured(model, prompt, TrainingTopics)).model_dump()
+    except Exception as e:
+        print(f"Error al generar el JSON de topics: {str(e)}")
+        return {"messages": f"Error al generar el JSON de topics: {str(e)}"}
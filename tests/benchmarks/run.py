@@ -0,0 +1,296 @@
+"""Offline load benchmark for the API.
+
+Starts the Azure stand-ins from `tests.benchmarks.stubs` and the FastAPI app
+pointed at them, drives `/generate_questions`, `/chat`, `/generate_topics` and
+`/generate_feedback` at a fixed concurrency and reports latency percentiles,
+throughput, peak RSS of the app process and event-loop lag (measured as the
+latency of a trivial canary request sent while the load runs).
+
+    python -m tests.benchmarks.run --concurrency 8 --requests 50
+
+Nothing leaves the machine, so runs are comparable across commits.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+PAYLOADS: Dict[str, Callable[[int], Dict[str, Any]]] = {
+    "/generate_questions": lambda i: {
+        "text": "La fotosíntesis es el proceso por el que las plantas convierten la luz en energía química. " * 20,
+        "training_id": f"bench-training-{i}",
+        "topic_id": f"bench-topic-{i}",
+    },
+    "/chat": lambda i: {
+        "topic": "Fotosíntesis",
+        "question": f"¿Qué papel tiene la clorofila? (variante {i})",
+        "id_user": f"bench-user-{i % 10}",
+        "document_id": "doc",
+    },
+    "/generate_topics": lambda i: {
+        "training_name": f"Formación {i}",
+        "description": "Curso introductorio de biología vegetal centrado en la fotosíntesis y la respiración celular.",
+        "url": "",
+    },
+    "/generate_feedback": lambda i: {
+        "cuestionario": {
+            "preguntas": [
+                {"pregunta": "¿Dónde ocurre la fotosíntesis?", "respuesta_usuario": "En la mitocondria", "respuesta_correcta": "En el cloroplasto"},
+                {"pregunta": "¿Qué gas se libera?", "respuesta_usuario": "Oxígeno", "respuesta_correcta": "Oxígeno"},
+            ],
+            "intento": i,
+        }
+    },
+}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _percentile(values: List[float], percentile: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))]
+
+
+def _rss_kb(pid: int) -> int:
+    """Memoria residente del proceso en KiB (0 si no se puede leer)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def _self_signed_certificate(directory: str) -> Tuple[str, str]:
+    """Certificado autofirmado para servir los stubs por HTTPS (el SDK de Azure Search no admite HTTP)."""
+    cert, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1", "-subj", "/CN=127.0.0.1",
+         "-addext", "subjectAltName=IP:127.0.0.1", "-keyout", key, "-out", cert],
+        check=True, capture_output=True,
+    )
+    return cert, key
+
+
+def _stub_env(args: argparse.Namespace, stub_url: str) -> Dict[str, str]:
+    return {
+        "BENCH_STUB_URL": stub_url,
+        "BENCH_LATENCY_OPENAI_MS": str(args.openai_latency),
+        "BENCH_LATENCY_SEARCH_MS": str(args.search_latency),
+        "BENCH_LATENCY_COSMOS_MS": str(args.cosmos_latency),
+        "BENCH_JITTER": str(args.jitter),
+        "BENCH_CASSETTE": args.cassette or "",
+        "BENCH_EMBEDDING_DIMENSIONS": "1536",
+    }
+
+
+def _app_env(stub_url: str, cache_dir: str, cert: str) -> Dict[str, str]:
+    """Variables que apuntan el agente a los stubs y aíslan sus cachés en un directorio temporal."""
+    return {
+        "SSL_CERT_FILE": cert,
+        "REQUESTS_CA_BUNDLE": cert,
+        "AZURE_OPENAI_API_KEY": "bench",
+        "AZURE_OPENAI_ENDPOINT": stub_url,
+        "AZURE_DEPLOYMENT_NAME": "bench-chat",
+        "AZURE_OPENAI_API_VERSION": "2024-08-01-preview",
+        "AZURE_TEXT_EMBEDDING_ENDPOINT": stub_url,
+        "AZURE_TEXT_EMBEDDING_API_KEY": "bench",
+        "AZURE_TEXT_EMBEDDING_API_VERSION": "2024-08-01-preview",
+        "AZURE_TEXT_EMBEDDING_DEPLOYMENT": "bench-embedding",
+        "VECTOR_STORE_ADDRESS": stub_url,
+        "VECTOR_STORE_PASSWORD": "bench",
+        "VECTOR_STORE_INDEX_NAME": "bench-index",
+        "VECTOR_STORE_DIMENSIONS": "1536",
+        "COSMOS_ENDPOINT": stub_url + "/",
+        "COSMOS_KEY": "YmVuY2g=",
+        "COSMOS_DATABASE_NAME": "bench",
+        "COSMOS_CONTAINER_NAME": "questions",
+        "RESPONSE_CACHE_BACKEND": "none",
+        "EMBEDDING_CACHE_PATH": os.path.join(cache_dir, "embeddings.sqlite3"),
+        "CHAT_MEMORY_PATH": os.path.join(cache_dir, "conversations.sqlite3"),
+        "JOBS_DB_PATH": os.path.join(cache_dir, "jobs.sqlite3"),
+        "JOBS_CHECKPOINT_PATH": os.path.join(cache_dir, "job_checkpoints.sqlite3"),
+        "LOCAL_VECTOR_STORE_PATH": os.path.join(cache_dir, "vector_index"),
+        "LLM_RATE_LIMIT_STATE_PATH": os.path.join(cache_dir, "llm_rate_limit.bin"),
+        "INGEST_MANIFEST_PATH": os.path.join(cache_dir, "ingest_manifest.sqlite3"),
+        "PDF_TEXT_CACHE_PATH": os.path.join(cache_dir, "pdf_text.sqlite3"),
+        "FETCH_CACHE_PATH": os.path.join(cache_dir, "fetch"),
+        "SEMANTIC_CACHE_PATH": os.path.join(cache_dir, "semantic_answers.sqlite3"),
+        "LANGSMITH_TRACING": "false",
+        "LANGCHAIN_TRACING_V2": "false",
+    }
+
+
+def _start(command: List[str], env: Dict[str, str], log_path: str) -> subprocess.Popen:
+    log = open(log_path, "w")
+    return subprocess.Popen(command, cwd=ROOT, env={**os.environ, **env}, stdout=log, stderr=subprocess.STDOUT)
+
+
+async def _wait_ready(url: str, process: subprocess.Popen, verify: Any = True, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(verify=verify) as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"El proceso terminó al arrancar ({url})")
+            try:
+                await client.get(url, timeout=1)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} no respondió en {timeout} s")
+
+
+async def _drive(client: httpx.AsyncClient, endpoint: str, total: int, concurrency: int) -> Dict[str, Any]:
+    """Lanza `total` peticiones al endpoint con `concurrency` en vuelo y mide cada una."""
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                response = await client.post(endpoint, json=PAYLOADS[endpoint](i))
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            errors += not ok
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "endpoint": endpoint,
+        "requests": total,
+        "errors": errors,
+        "rps": total / elapsed if elapsed else 0.0,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p95_ms": _percentile(latencies, 95) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else float("nan"),
+    }
+
+
+async def _monitor(client: httpx.AsyncClient, pid: int, stop: asyncio.Event, result: Dict[str, Any]) -> None:
+    """Muestrea la RSS del app y la latencia de una petición trivial mientras dura la carga."""
+    canary: List[float] = []
+    while not stop.is_set():
+        result["peak_rss_kb"] = max(result.get("peak_rss_kb", 0), _rss_kb(pid))
+        start = time.perf_counter()
+        try:
+            await client.get("/metrics")
+            canary.append(time.perf_counter() - start)
+        except httpx.HTTPError:
+            pass
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=0.1)
+        except asyncio.TimeoutError:
+            pass
+    result["canary_p50_ms"] = _percentile(canary, 50) * 1000
+    result["canary_p99_ms"] = _percentile(canary, 99) * 1000
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    stub_port, app_port = _free_port(), _free_port()
+    stub_url, app_url = f"https://127.0.0.1:{stub_port}", f"http://127.0.0.1:{app_port}"
+    with tempfile.TemporaryDirectory(prefix="bench-") as cache_dir:
+        cert, key = _self_signed_certificate(cache_dir)
+        stub = _start(
+            [sys.executable, "-m", "uvicorn", "tests.benchmarks.stubs:create_app", "--factory",
+             "--port", str(stub_port), "--log-level", "warning", "--ssl-certfile", cert, "--ssl-keyfile", key],
+            _stub_env(args, stub_url),
+            os.path.join(args.log_dir or cache_dir, "stubs.log"),
+        )
+        app = _start(
+            [sys.executable, "-m", "uvicorn", "react_agent.api:app", "--app-dir", "src",
+             "--port", str(app_port), "--log-level", "warning"],
+            {**_app_env(stub_url, cache_dir, cert), "PYTHONPATH": os.path.join(ROOT, "src")},
+            os.path.join(args.log_dir or cache_dir, "app.log"),
+        )
+        try:
+            await _wait_ready(f"{stub_url}/", stub, verify=cert)
+            await _wait_ready(f"{app_url}/metrics", app)
+            results: Dict[str, Any] = {"concurrency": args.concurrency, "endpoints": []}
+            limits = httpx.Limits(max_connections=args.concurrency + 1)
+            async with httpx.AsyncClient(base_url=app_url, timeout=args.timeout, limits=limits) as client:
+                for endpoint in args.endpoints:
+                    stop = asyncio.Event()
+                    sample: Dict[str, Any] = {}
+                    monitor = asyncio.create_task(_monitor(client, app.pid, stop, sample))
+                    stats = await _drive(client, endpoint, args.requests, args.concurrency)
+                    stop.set()
+                    await monitor
+                    results["endpoints"].append({**stats, **sample})
+            return results
+        finally:
+            for process in (app, stub):
+                process.terminate()
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+
+def _print_table(results: Dict[str, Any]) -> None:
+    columns = ["endpoint", "requests", "errors", "rps", "p50_ms", "p95_ms", "p99_ms", "peak_rss_kb", "canary_p99_ms"]
+    sys.stdout.write(f"concurrency={results['concurrency']}\n")
+    sys.stdout.write("  ".join(f"{column:>20}" if column == "endpoint" else f"{column:>13}" for column in columns) + "\n")
+    for row in results["endpoints"]:
+        cells = []
+        for column in columns:
+            value = row.get(column, "")
+            if column == "endpoint":
+                cells.append(f"{value:>20}")
+            elif isinstance(value, float):
+                cells.append(f"{value:>13.1f}")
+            else:
+                cells.append(f"{value:>13}")
+        sys.stdout.write("  ".join(cells) + "\n")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark offline de la API con stubs de los servicios de Azure")
+    parser.add_argument("--concurrency", type=int, default=8, help="Peticiones en vuelo por endpoint")
+    parser.add_argument("--requests", type=int, default=50, help="Peticiones por endpoint")
+    parser.add_argument("--endpoints", nargs="+", default=list(PAYLOADS), choices=list(PAYLOADS))
+    parser.add_argument("--openai-latency", type=float, default=300, help="Latencia inyectada de Azure OpenAI (ms)")
+    parser.add_argument("--search-latency", type=float, default=50, help="Latencia inyectada de Azure AI Search (ms)")
+    parser.add_argument("--cosmos-latency", type=float, default=20, help="Latencia inyectada de Cosmos DB (ms)")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Variación relativa de la latencia inyectada")
+    parser.add_argument("--cassette", help="Cassette de VCR cuyas respuestas se reproducen en lugar de las sintéticas")
+    parser.add_argument("--timeout", type=float, default=120, help="Timeout por petición (s)")
+    parser.add_argument("--log-dir", help="Directorio donde guardar los logs del app y de los stubs")
+    parser.add_argument("--json", dest="json_path", help="Guarda los resultados en este fichero JSON")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run(args))
+    _print_table(results)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""Local stand-ins for Azure OpenAI, Azure AI Search and Cosmos DB.
+
+A single FastAPI app answers the REST routes the SDKs used by the agents call,
+after sleeping for a configurable injected latency. Responses are synthetic
+(valid JSON for the structured prompts, Markdown otherwise) unless a VCR
+cassette is given, in which case recorded responses are replayed for matching
+routes.
+
+Run it with `uvicorn tests.benchmarks.stubs:create_app --factory`; settings are
+read from the `BENCH_*` environment variables.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import random
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import yaml
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+QUESTION_JSON = {
+    "id": "",
+    "TrainingID": "",
+    "TopicID": "",
+    "Questions": [
+        {
+            "QuestionID": i,
+            "Question": f"¿Pregunta de prueba número {i}?",
+            "Options": ["Opción A", "Opción B", "Opción C", "Opción D"],
+            "CorrectAnswer": i % 4,
+        }
+        for i in range(1, 6)
+    ],
+}
+
+TOPICS_JSON = {
+    "trainingName": "Formación de prueba",
+    "description": "Descripción de prueba",
+    "attachment": "",
+    "topics": [
+        {"topicName": f"Tema {i}", "items": [{"itemName": f"Concepto {i}.{j}"} for j in range(1, 4)]}
+        for i in range(1, 6)
+    ],
+}
+
+MARKDOWN = (
+    "## 👉 Explicación\n"
+    + "Este es un texto sintético que simula la respuesta del modelo con una longitud realista. " * 12
+    + "\n\n```python\nprint('hola')\n```\n"
+)
+
+
+def _latency(service: str) -> float:
+    """Latencia inyectada en segundos para un servicio, con jitter relativo."""
+    base = float(os.getenv(f"BENCH_LATENCY_{service.upper()}_MS", "0")) / 1000
+    jitter = float(os.getenv("BENCH_JITTER", "0.2"))
+    return max(0.0, base * (1 + random.uniform(-jitter, jitter)))
+
+
+def _load_cassette(path: Optional[str]) -> Dict[tuple, List[Dict[str, Any]]]:
+    """Respuestas grabadas de un cassette de VCR indexadas por método y ruta."""
+    recorded: Dict[tuple, List[Dict[str, Any]]] = defaultdict(list)
+    if not path:
+        return recorded
+    with open(path) as f:
+        cassette = yaml.safe_load(f) if not path.endswith(".json") else json.load(f)
+    for interaction in cassette.get("interactions", []):
+        request, response = interaction["request"], interaction["response"]
+        body = response["body"].get("string", b"")
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        headers = {k.lower(): v for k, v in response.get("headers", {}).items()}
+        if "gzip" in (headers.get("content-encoding") or [""])[0]:
+            body = gzip.decompress(body)
+        recorded[(request["method"].upper(), urlsplit(request["uri"]).path)].append(
+            {"status": response["status"]["code"], "body": body}
+        )
+    return recorded
+
+
+def _prompt_text(body: Dict[str, Any]) -> str:
+    return "\n".join(str(message.get("content") or "") for message in body.get("messages", []))
+
+
+def _cached_prefix_tokens(body: Dict[str, Any], seen: set) -> int:
+    """Tokens del prefijo de mensajes de sistema que ya se envió antes, como el caché de prompts de Azure."""
+    prefix = []
+    for message in body.get("messages", []):
+        if message.get("role") != "system":
+            break
+        prefix.append(str(message.get("content") or ""))
+    text = "\n".join(prefix)
+    tokens = len(text) // 4
+    if tokens < 1024:
+        return 0
+    key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    if key not in seen:
+        seen.add(key)
+        return 0
+    return tokens
+
+
+def _completion_content(body: Dict[str, Any]) -> str:
+    prompt = _prompt_text(body)
+    if '"Questions"' in prompt:
+        return json.dumps(QUESTION_JSON, ensure_ascii=False)
+    if '"topics"' in prompt:
+        return json.dumps(TOPICS_JSON, ensure_ascii=False)
+    return MARKDOWN
+
+
+def _vector(text: Any, dimensions: int) -> List[float]:
+    seed = int.from_bytes(hashlib.sha256(json.dumps(text).encode("utf-8")).digest()[:8], "big")
+    rng = random.Random(seed)
+    return [rng.uniform(-1, 1) for _ in range(dimensions)]
+
+
+def create_app() -> FastAPI:
+    """App con las rutas de Azure OpenAI, Azure AI Search y Cosmos DB."""
+    app = FastAPI()
+    dimensions = int(os.getenv("BENCH_EMBEDDING_DIMENSIONS", "1536"))
+    recorded = _load_cassette(os.getenv("BENCH_CASSETTE"))
+    replay_index: Dict[tuple, int] = defaultdict(int)
+    cached_prefixes: set = set()
+    base_url = os.getenv("BENCH_STUB_URL", "https://127.0.0.1:8081")
+
+    @app.middleware("http")
+    async def replay(request: Request, call_next):
+        key = (request.method, request.url.path)
+        if key in recorded:
+            # Se reproducen las respuestas grabadas en orden, en bucle
+            responses = recorded[key]
+            response = responses[replay_index[key] % len(responses)]
+            replay_index[key] += 1
+            await asyncio.sleep(_latency("openai"))
+            return Response(content=response["body"], status_code=response["status"], media_type="application/json")
+        return await call_next(request)
+
+    # Azure OpenAI
+    @app.post("/openai/deployments/{deployment}/chat/completions")
+    async def chat_completions(deployment: str, request: Request):
+        body = await request.json()
+        await asyncio.sleep(_latency("openai"))
+        content = _completion_content(body)
+        usage = {
+            "prompt_tokens": len(_prompt_text(body)) // 4,
+            "completion_tokens": len(content) // 4,
+            "total_tokens": (len(_prompt_text(body)) + len(content)) // 4,
+            "prompt_tokens_details": {"cached_tokens": _cached_prefix_tokens(body, cached_prefixes)},
+        }
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        if not body.get("stream"):
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": deployment,
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+                "usage": usage,
+            }
+
+        async def events():
+            words = content.split(" ")
+            for i, word in enumerate(words):
+                delta = {"content": word if i == 0 else " " + word}
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": deployment,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(0.001)
+            done = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": deployment,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+            yield f"data: {json.dumps(done)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/openai/deployments/{deployment}/embeddings")
+    async def embeddings(deployment: str, request: Request):
+        body = await request.json()
+        await asyncio.sleep(_latency("openai"))
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        return {
+            "object": "list",
+            "model": deployment,
+            "data": [
+                {"object": "embedding", "index": i, "embedding": _vector(text, dimensions)}
+                for i, text in enumerate(inputs)
+            ],
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        }
+
+    # Azure AI Search
+    index_fields = [
+        {"name": "id", "type": "Edm.String", "key": True, "filterable": True},
+        {"name": "content", "type": "Edm.String", "searchable": True},
+        {"name": "content_vector", "type": "Collection(Edm.Single)", "searchable": True,
+         "dimensions": dimensions, "vectorSearchProfile": "myHnswProfile"},
+        {"name": "metadata", "type": "Edm.String", "searchable": True},
+    ]
+
+    @app.get("/indexes('{index}')")
+    async def get_index(index: str):
+        return {"name": index, "fields": index_fields}
+
+    @app.post("/indexes('{index}')/docs/search.post.search")
+    async def search(index: str, request: Request):
+        body = await request.json()
+        await asyncio.sleep(_latency("search"))
+        top = body.get("top") or 4
+        return {
+            "value": [
+                {
+                    "@search.score": 1.0 / (i + 1),
+                    "id": f"doc_{i}",
+                    "content": f"Fragmento {i} recuperado sobre {body.get('search') or 'el tema'}. " + "Texto de contexto. " * 30,
+                    "metadata": json.dumps({"id": f"doc_{i}", "document_id": "doc", "page_number": i + 1}),
+                }
+                for i in range(top)
+            ]
+        }
+
+    @app.post("/indexes('{index}')/docs/search.index")
+    async def index_documents(index: str, request: Request):
+        body = await request.json()
+        await asyncio.sleep(_latency("search"))
+        return {"value": [{"key": doc.get("id"), "status": True, "statusCode": 201} for doc in body.get("value", [])]}
+
+    # Cosmos DB
+    @app.get("/")
+    async def database_account():
+        location = {"name": "local", "databaseAccountEndpoint": base_url + "/"}
+        return {
+            "id": "bench",
+            "writableLocations": [location],
+            "readableLocations": [location],
+            "enableMultipleWriteLocations": False,
+            "userConsistencyPolicy": {"defaultConsistencyLevel": "Session"},
+            "userReplicationPolicy": {"minReplicaSetSize": 1, "maxReplicasetSize": 1},
+            "systemReplicationPolicy": {"minReplicaSetSize": 1, "maxReplicasetSize": 1},
+            "readPolicy": {"primaryReadCoefficient": 1, "secondaryReadCoefficient": 1},
+            "queryEngineConfiguration": "{}",
+        }
+
+    @app.get("/dbs/{database}/colls/{container}")
+    async def read_container(database: str, container: str):
+        await asyncio.sleep(_latency("cosmos"))
+        return {
+            "id": container,
+            "_rid": "bench==",
+            "_self": f"dbs/{database}/colls/{container}/",
+            "partitionKey": {"paths": ["/TrainingID"], "kind": "Hash", "version": 2},
+        }
+
+    @app.post("/dbs/{database}/colls/{container}/docs")
+    async def create_item(database: str, container: str, request: Request):
+        body = await request.json()
+        await asyncio.sleep(_latency("cosmos"))
+        if isinstance(body, list):
+            # Batch transaccional
+            return JSONResponse([{"statusCode": 201, "requestCharge": 1.0} for _ in body], status_code=200)
+        return JSONResponse({**body, "_rid": "bench==", "_etag": uuid.uuid4().hex, "_ts": int(time.time())}, status_code=201)
+
+    return app
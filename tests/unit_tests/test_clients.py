@@ -0,0 +1,46 @@
+import asyncio
+
+from react_agent.clients import ClientRegistry
+
+
+def test_registry_reuses_and_refreshes_clients() -> None:
+    registry = ClientRegistry()
+    created = []
+    closed = []
+
+    def factory():
+        client = object()
+        created.append(client)
+        return client, [lambda: closed.append(client)]
+
+    first = registry.get("model", "v1", factory)
+    assert registry.get("model", "v1", factory) is first
+    assert len(created) == 1
+
+    second = registry.get("model", "v2", factory)
+    assert second is not first
+    assert closed == [first]
+
+
+def test_registry_aclose_awaits_async_closers() -> None:
+    registry = ClientRegistry()
+    closed = []
+
+    async def aclose():
+        closed.append("async")
+
+    registry.get("model", "v1", lambda: (object(), [aclose, lambda: closed.append("sync")]))
+    asyncio.run(registry.aclose())
+    assert closed == ["async", "sync"]
+
+
+def test_registry_forget_drops_clients_without_closing_them() -> None:
+    registry = ClientRegistry()
+    closed = []
+    first = registry.get("model", "v1", lambda: (object(), [lambda: closed.append("closed")]))
+
+    # Lo que hace un worker tras el fork: los clientes del master no se cierran, se recrean
+    registry.forget()
+
+    assert registry.get("model", "v1", lambda: (object(), [])) is not first
+    assert closed == []
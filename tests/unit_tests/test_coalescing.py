@@ -0,0 +1,114 @@
+import asyncio
+import threading
+import time
+from typing import Any, List, Optional
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatResult
+
+from react_agent.coalescing import SingleFlight, SingleFlightChatModel
+
+
+class _SlowFakeModel(FakeListChatModel):
+    calls: List[str] = []
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        self.calls.append(messages[-1].content)
+        time.sleep(0.05)
+        return super()._generate(messages, stop, run_manager, **kwargs)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        self.calls.append(messages[-1].content)
+        await asyncio.sleep(0.05)
+        return FakeListChatModel._generate(self, messages, stop, run_manager, **kwargs)
+
+
+class _CoalescingFakeModel(SingleFlightChatModel, _SlowFakeModel):
+    pass
+
+
+def test_concurrent_identical_calls_share_one_upstream_call() -> None:
+    model = _CoalescingFakeModel(responses=["uno", "dos", "tres"], calls=[])
+
+    async def run():
+        return await asyncio.gather(
+            model.ainvoke("¿Qué es la fotosíntesis?"),
+            model.ainvoke("  ¿Qué es la   fotosíntesis? "),
+            model.ainvoke("¿Qué es la fotosíntesis?"),
+            model.ainvoke("Otra pregunta"),
+        )
+
+    responses = asyncio.run(run())
+
+    assert len(model.calls) == 2
+    assert responses[0].content == responses[1].content == responses[2].content
+    assert responses[3].content != responses[0].content
+    # Cada petición recibe su propio mensaje
+    assert responses[0] is not responses[1]
+
+
+def test_sequential_calls_are_not_coalesced() -> None:
+    model = _CoalescingFakeModel(responses=["uno", "dos"], calls=[])
+
+    async def run():
+        first = await model.ainvoke("hola")
+        second = await model.ainvoke("hola")
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert len(model.calls) == 2
+    assert (first.content, second.content) == ("uno", "dos")
+
+
+def test_leader_cancellation_does_not_cancel_followers() -> None:
+    flight = SingleFlight("test")
+    calls = []
+
+    async def work() -> str:
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def run():
+        leader = asyncio.create_task(flight.ado("k", work))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.ado("k", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(run()) == "ok"
+    assert calls == [1]
+
+
+def test_sync_calls_from_threads_share_result_and_errors() -> None:
+    flight = SingleFlight("test")
+    calls = []
+    results = []
+    started = threading.Event()
+
+    def work() -> str:
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        raise ValueError("fallo upstream")
+
+    def call() -> None:
+        try:
+            flight.do("k", work)
+        except ValueError as e:
+            results.append(str(e))
+
+    threads = [threading.Thread(target=call)]
+    threads[0].start()
+    started.wait()
+    threads += [threading.Thread(target=call) for _ in range(3)]
+    for thread in threads[1:]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [1]
+    assert results == ["fallo upstream"] * 4
@@ -0,0 +1,42 @@
+import asyncio
+
+from react_agent.concurrency import gather_bounded
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+def test_gather_bounded_keeps_order_and_isolates_failures() -> None:
+    active = 0
+    peak = 0
+
+    async def work(item: int) -> int:
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01 * (5 - item % 5))
+        active -= 1
+        if item == 3:
+            raise ValueError("boom")
+        return item * 10
+
+    results = asyncio.run(gather_bounded(work, list(range(10)), max_concurrency=3))
+
+    assert results == [0, 10, 20, None, 40, 50, 60, 70, 80, 90]
+    assert peak <= 3
+
+
+def test_gather_bounded_retries_rate_limits() -> None:
+    calls = {}
+
+    async def work(item: str) -> str:
+        calls[item] = calls.get(item, 0) + 1
+        if calls[item] == 1:
+            raise RateLimited()
+        return item.upper()
+
+    results = asyncio.run(gather_bounded(work, ["a", "b"], max_concurrency=2, base_delay=0.01))
+
+    assert results == ["A", "B"]
+    assert calls == {"a": 2, "b": 2}
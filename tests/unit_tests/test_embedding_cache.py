@@ -0,0 +1,41 @@
+import asyncio
+
+from langchain_core.embeddings import Embeddings
+
+from react_agent.embedding_cache import CachedEmbeddings, EmbeddingStore
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def test_cached_embeddings_only_embeds_misses_in_batches() -> None:
+    inner = CountingEmbeddings()
+    cached = CachedEmbeddings(inner, EmbeddingStore(":memory:", 100), "ada", batch_size=2)
+
+    first = cached.embed_documents(["a", "bb", "a", "ccc"])
+    second = cached.embed_documents(["bb", "dddd"])
+
+    assert first == [[1.0, 1.0], [2.0, 1.0], [1.0, 1.0], [3.0, 1.0]]
+    assert second == [[2.0, 1.0], [4.0, 1.0]]
+    assert inner.calls == [["a", "bb"], ["ccc"], ["dddd"]]
+    assert asyncio.run(cached.aembed_query("ccc")) == [3.0, 1.0]
+    assert len(inner.calls) == 3
+
+
+def test_embedding_store_evicts_least_recently_used() -> None:
+    store = EmbeddingStore(":memory:", max_entries=2)
+    store.put_many({"a": [1.0]})
+    store.put_many({"b": [2.0]})
+    store.get_many(["a"])
+    store.put_many({"c": [3.0]})
+
+    assert set(store.get_many(["a", "b", "c"])) == {"a", "c"}
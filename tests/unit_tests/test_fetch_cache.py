@@ -0,0 +1,126 @@
+import hashlib
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from react_agent.fetch_cache import FetchCache
+
+
+class _Documents(BaseHTTPRequestHandler):
+    """Servidor de documentos con ETag que registra cada petición."""
+
+    files = {}
+    requests = []
+
+    def do_GET(self) -> None:
+        body = self.files.get(self.path)
+        etag = f'"{hashlib.md5(body).hexdigest()}"' if body is not None else None
+        self.requests.append((self.path, self.headers.get("If-None-Match")))
+        if body is None:
+            self.send_response(404)
+            self.end_headers()
+        elif self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+        else:
+            self.send_response(200)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def server():
+    _Documents.files, _Documents.requests = {}, []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Documents)
+    thread = threading.Thread(target=httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    yield httpd, f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _cache(tmp_path, max_bytes: int = 1 << 20) -> FetchCache:
+    return FetchCache(str(tmp_path / "fetch"), max_bytes, httpx.Client())
+
+
+def test_unchanged_documents_are_revalidated_without_downloading(tmp_path, server) -> None:
+    _, url = server
+    _Documents.files["/manual.pdf"] = b"%PDF v1" * 100
+    cache = _cache(tmp_path)
+
+    first = cache.fetch(f"{url}/manual.pdf")
+    second = cache.fetch(f"{url}/manual.pdf")
+
+    assert first == second
+    assert open(first, "rb").read() == b"%PDF v1" * 100
+    assert _Documents.requests[0][1] is None
+    assert _Documents.requests[1][1] is not None
+
+    _Documents.files["/manual.pdf"] = b"%PDF v2"
+    third = cache.fetch(f"{url}/manual.pdf")
+    assert third != first
+    assert open(third, "rb").read() == b"%PDF v2"
+
+
+def test_same_content_behind_two_urls_is_stored_once(tmp_path, server) -> None:
+    _, url = server
+    _Documents.files["/a.pdf"] = _Documents.files["/b.pdf"] = b"%PDF igual"
+    cache = _cache(tmp_path)
+
+    assert cache.fetch(f"{url}/a.pdf") == cache.fetch(f"{url}/b.pdf")
+
+
+def test_least_recently_used_documents_are_evicted(tmp_path, server) -> None:
+    _, url = server
+    for name in "abc":
+        _Documents.files[f"/{name}.pdf"] = name.encode() * 400
+    cache = _cache(tmp_path, max_bytes=1000)
+
+    a = cache.fetch(f"{url}/a.pdf")
+    b = cache.fetch(f"{url}/b.pdf")
+    cache.fetch(f"{url}/a.pdf")
+    c = cache.fetch(f"{url}/c.pdf")
+
+    assert open(a, "rb").read() == b"a" * 400
+    assert open(c, "rb").read() == b"c" * 400
+    with pytest.raises(FileNotFoundError):
+        open(b, "rb")
+
+
+def test_cached_copy_is_served_when_the_server_is_down(tmp_path, server) -> None:
+    httpd, url = server
+    _Documents.files["/manual.pdf"] = b"%PDF"
+    cache = _cache(tmp_path)
+    path = cache.fetch(f"{url}/manual.pdf")
+
+    httpd.shutdown()
+    httpd.server_close()
+
+    assert cache.fetch(f"{url}/manual.pdf") == path
+    with pytest.raises(httpx.HTTPError):
+        cache.fetch(f"{url}/otro.pdf")
+
+
+def test_checked_out_documents_survive_eviction(tmp_path, server) -> None:
+    _, url = server
+    for name in "ab":
+        _Documents.files[f"/{name}.pdf"] = name.encode() * 800
+    cache = _cache(tmp_path, max_bytes=1000)
+
+    with cache.checkout(f"{url}/a.pdf") as path:
+        blob = cache.fetch(f"{url}/a.pdf")
+        cache.fetch(f"{url}/b.pdf")
+
+        assert not os.path.exists(blob)
+        assert open(path, "rb").read() == b"a" * 800
+
+    assert not list((tmp_path / "fetch").glob("checkout-*"))
@@ -0,0 +1,48 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+SRC = str(Path(__file__).resolve().parents[2] / "src")
+
+# Módulos que solo deben cargarse cuando un worker los necesita
+LAZY_MODULES = (
+    "langchain_openai",
+    "langchain_community",
+    "langchain.chains",
+    "azure.cosmos",
+    "azure.search",
+    "pypdf",
+)
+
+_PROBE = """
+import json, sys
+import react_agent.api
+from react_agent import graph
+print(json.dumps({"loaded": [m for m in %r if m in sys.modules], "compiled": sorted(graph._compiled)}))
+""" % (LAZY_MODULES,)
+
+
+def _slowest_imports(stderr: str, limit: int = 15) -> str:
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.strip()))
+    return "\n".join(f"{us / 1000:8.1f} ms  {name}" for us, name in sorted(rows, reverse=True)[:limit])
+
+
+def test_importing_the_api_is_lazy() -> None:
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [SRC, os.environ.get("PYTHONPATH")]))}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE], capture_output=True, text=True, env=env, timeout=120
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+    probe = json.loads(result.stdout.strip().splitlines()[-1])
+
+    # El perfil de importación acompaña al fallo para ver qué se ha vuelto a cargar al arrancar
+    profile = _slowest_imports(result.stderr)
+    assert probe["loaded"] == [], f"Importados al arrancar: {probe['loaded']}\n{profile}"
+    assert probe["compiled"] == [], f"Agentes compilados al importar: {probe['compiled']}\n{profile}"
@@ -0,0 +1,81 @@
+import asyncio
+
+from langchain.schema import Document
+
+from react_agent import ingestion
+from react_agent.ingest_manifest import IngestManifest
+
+
+class FakeEmbeddings:
+    async def aembed_documents(self, texts):
+        return [[float(len(text))] for text in texts]
+
+
+class FakeVectorStore:
+    def __init__(self):
+        self.batches = []
+        self.deleted = []
+
+    async def aadd_embeddings(self, text_embeddings, metadatas, keys=None):
+        self.batches.append([metadata["id"] for metadata in metadatas])
+        return [f"key-{key}" for key in keys]
+
+    async def adelete(self, ids):
+        self.deleted.extend(ids)
+
+
+def test_stream_embeddings_uploads_in_bounded_batches(monkeypatch) -> None:
+    pages = [Document(page_content=f"pagina {i}") for i in range(7)]
+    monkeypatch.setattr(ingestion, "iter_pages", lambda pdf_path: iter(pages))
+    vector_store = FakeVectorStore()
+    reports = []
+
+    progress = asyncio.run(
+        ingestion.stream_embeddings(
+            "doc",
+            "manual.pdf",
+            FakeEmbeddings(),
+            vector_store,
+            embedding_batch_size=2,
+            upload_batch_size=3,
+            on_progress=reports.append,
+        )
+    )
+
+    assert progress == {"pages": 7, "chunks": 7, "embedded": 7, "uploaded": 7, "unchanged": 0, "removed": 0}
+    ids = [ingestion.chunk_id("doc", page.page_content) for page in pages]
+    assert vector_store.batches == [ids[0:3], ids[3:6], ids[6:7]]
+    assert reports[-1]["uploaded"] == 7
+
+
+def test_chunk_ids_depend_only_on_normalized_text() -> None:
+    assert ingestion.chunk_id("doc", "Hola  mundo\n") == ingestion.chunk_id("doc", "Hola mundo")
+    assert ingestion.chunk_id("doc", "Hola mundo") != ingestion.chunk_id("doc", "Hola mundo!")
+    assert ingestion.chunk_id("doc", "Hola mundo") != ingestion.chunk_id("otro", "Hola mundo")
+
+
+def test_reingesting_uploads_only_changed_chunks_and_deletes_removed_ones(monkeypatch) -> None:
+    manifest = IngestManifest(":memory:", "test")
+    pages = [Document(page_content=text) for text in ("uno", "dos", "tres")]
+    monkeypatch.setattr(ingestion, "iter_pages", lambda pdf_path: iter(pages))
+
+    def ingest() -> tuple:
+        vector_store = FakeVectorStore()
+        chunks = manifest.chunks("manual.pdf", "doc")
+        progress = asyncio.run(
+            ingestion.stream_embeddings("doc", "manual.pdf", FakeEmbeddings(), vector_store, chunks=chunks)
+        )
+        manifest.save("manual.pdf", "doc", chunks)
+        return progress, vector_store
+
+    ingest()
+    # Se corrige una errata en la segunda página y se quita la tercera
+    pages[1:] = [Document(page_content="dos (corregido)")]
+    progress, vector_store = ingest()
+
+    assert (progress["uploaded"], progress["unchanged"], progress["removed"]) == (1, 1, 2)
+    assert vector_store.batches == [[ingestion.chunk_id("doc", "dos (corregido)")]]
+    assert sorted(vector_store.deleted) == sorted(f"key-{ingestion.chunk_id('doc', text)}" for text in ("dos", "tres"))
+    assert set(manifest.chunks("manual.pdf", "doc")) == {ingestion.chunk_id("doc", text) for text in ("uno", "dos (corregido)")}
+    assert manifest.document_id("manual.pdf") == "doc"
+    assert manifest.chunks("manual.pdf", "otro-doc") == {}
@@ -0,0 +1,48 @@
+import asyncio
+from typing import TypedDict
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langgraph.graph import END, START, StateGraph
+
+from react_agent.instrumentation import (
+    MetricsCallbackHandler,
+    current_node,
+    instrument_node,
+    track_call,
+)
+
+prometheus_client = pytest.importorskip("prometheus_client")
+
+
+class _State(TypedDict):
+    value: str
+
+
+def _sample(name: str, **labels: str) -> float:
+    return prometheus_client.REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_nodes_and_llm_calls_are_labelled_with_graph_node() -> None:
+    model = FakeListChatModel(responses=["hola"], callbacks=[MetricsCallbackHandler()])
+    seen = []
+
+    async def answer(state: _State) -> _State:
+        seen.append(current_node())
+        with track_call("vector_store", "test_search"):
+            pass
+        return {"value": (await model.ainvoke(state["value"])).content}
+
+    workflow = StateGraph(_State)
+    workflow.add_node("answer", instrument_node("test_agent", answer))
+    workflow.add_edge(START, "answer")
+    workflow.add_edge("answer", END)
+    before = _sample("agent_node_duration_seconds_count", agent="test_agent", node="answer", status="ok")
+
+    result = asyncio.run(workflow.compile().ainvoke({"value": "hi"}))
+
+    assert result == {"value": "hola"}
+    assert seen == [("test_agent", "answer")]
+    assert _sample("agent_node_duration_seconds_count", agent="test_agent", node="answer", status="ok") == before + 1
+    assert _sample("downstream_call_duration_seconds_count", service="vector_store", operation="test_search", status="ok") >= 1
+    assert _sample("downstream_call_duration_seconds_count", service="azure_openai", operation="chat", status="ok") >= 1
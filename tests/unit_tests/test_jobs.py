@@ -0,0 +1,45 @@
+import time
+
+from react_agent.jobs import JobStore
+
+
+def test_claim_respects_per_tenant_limit() -> None:
+    store = JobStore(":memory:")
+    first = store.create("topics", "a", {"n": 1})
+    store.create("topics", "a", {"n": 2})
+    other = store.create("topics", "b", {"n": 3})
+
+    assert store.claim("topics", max_per_tenant=1, stale_after=60)["id"] == first
+    assert store.claim("topics", max_per_tenant=1, stale_after=60)["id"] == other
+    assert store.claim("topics", max_per_tenant=1, stale_after=60) is None
+
+    store.finish(first, {"ok": True})
+    assert store.get(first)["status"] == "succeeded"
+    assert store.get(first)["result"] == {"ok": True}
+    assert store.claim("topics", max_per_tenant=1, stale_after=60)["input"] == {"n": 2}
+
+
+def test_stale_running_job_is_claimed_again() -> None:
+    store = JobStore(":memory:")
+    job_id = store.create("topics", "a", {})
+    store.claim("topics", max_per_tenant=1, stale_after=60)
+    time.sleep(0.01)
+
+    job = store.claim("topics", max_per_tenant=1, stale_after=0)
+
+    assert job["id"] == job_id
+    assert job["attempts"] == 2
+
+
+def test_job_is_failed_after_max_attempts() -> None:
+    store = JobStore(":memory:")
+    job_id = store.create("topics", "a", {})
+    store.claim("topics", max_per_tenant=1, stale_after=60, max_attempts=2)
+    time.sleep(0.01)
+    assert store.claim("topics", max_per_tenant=1, stale_after=0, max_attempts=2)["attempts"] == 2
+    time.sleep(0.01)
+
+    assert store.claim("topics", max_per_tenant=1, stale_after=0, max_attempts=2) is None
+    job = store.get(job_id)
+    assert job["status"] == "failed"
+    assert "2 intentos" in job["error"]
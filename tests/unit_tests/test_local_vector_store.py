@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from react_agent.configuration import Config
+from react_agent.local_vector_store import LocalVectorStore, parse_document_filter
+
+
+def _vectors(count: int, dimensions: int = 8, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).normal(size=(count, dimensions)).astype(np.float32)
+
+
+def test_rows_persist_and_are_visible_to_other_instances(tmp_path) -> None:
+    embedding = DeterministicFakeEmbedding(size=8)
+    writer = LocalVectorStore(str(tmp_path), embedding)
+    reader = LocalVectorStore(str(tmp_path), embedding)
+    vectors = _vectors(4)
+
+    writer.add_embeddings(
+        [(f"texto {i}", v.tolist()) for i, v in enumerate(vectors)],
+        [{"id": f"d1_{i}", "document_id": "d1" if i < 2 else "d2"} for i in range(4)],
+    )
+
+    results = reader.similarity_search_by_vector_with_score(vectors[3].tolist(), k=1)
+    assert results[0][0].page_content == "texto 3"
+    assert results[0][1] == pytest.approx(1.0)
+
+
+def test_document_filter_scopes_search(tmp_path) -> None:
+    store = LocalVectorStore(str(tmp_path), DeterministicFakeEmbedding(size=8))
+    vectors = _vectors(6)
+    store.add_embeddings(
+        [(f"texto {i}", v.tolist()) for i, v in enumerate(vectors)],
+        [{"document_id": "a" if i % 2 else "b"} for i in range(6)],
+    )
+
+    results = store.similarity_search_by_vector_with_score(
+        vectors[0].tolist(), k=10, filters="metadata/document_id eq 'a'"
+    )
+
+    assert {doc.metadata["document_id"] for doc, _ in results} == {"a"}
+    assert len(results) == 3
+    with pytest.raises(ValueError):
+        parse_document_filter("metadata/page_number gt 3")
+
+
+def test_ivf_index_finds_exact_matches(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(Config, "LOCAL_VECTOR_STORE_IVF_MIN_ROWS", 100)
+    store = LocalVectorStore(str(tmp_path), DeterministicFakeEmbedding(size=16))
+    vectors = _vectors(400, dimensions=16)
+    store.add_embeddings([(f"texto {i}", v.tolist()) for i, v in enumerate(vectors)])
+
+    assert store._ivf is not None
+    hits = sum(
+        store.similarity_search_by_vector_with_score(vectors[i].tolist(), k=1)[0][0].page_content == f"texto {i}"
+        for i in range(0, 400, 20)
+    )
+    assert hits == 20
+
+
+def test_deleted_and_replaced_rows_are_not_returned(tmp_path) -> None:
+    embedding = DeterministicFakeEmbedding(size=8)
+    writer = LocalVectorStore(str(tmp_path), embedding)
+    reader = LocalVectorStore(str(tmp_path), embedding)
+    vectors = _vectors(3)
+    writer.add_embeddings(
+        [(f"texto {i}", v.tolist()) for i, v in enumerate(vectors)],
+        [{"id": f"d_{i}", "document_id": "d"} for i in range(3)],
+    )
+    # Un id repetido sustituye a la fila anterior
+    writer.add_embeddings([("texto 1 v2", vectors[1].tolist())], [{"id": "d_1", "document_id": "d"}])
+
+    assert writer.delete(["d_0", "missing"]) is True
+    assert writer.delete(["missing"]) is False
+
+    for filters in (None, "metadata/document_id eq 'd'"):
+        results = reader.similarity_search_by_vector_with_score(vectors[0].tolist(), k=10, filters=filters)
+        assert sorted(doc.page_content for doc, _ in results) == ["texto 1 v2", "texto 2"]
+
+    # Volver a subir un id eliminado lo restaura
+    writer.add_embeddings([("texto 0", vectors[0].tolist())], [{"id": "d_0", "document_id": "d"}])
+    assert reader.similarity_search_by_vector_with_score(vectors[0].tolist(), k=1)[0][0].page_content == "texto 0"
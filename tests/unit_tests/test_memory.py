@@ -0,0 +1,54 @@
+import asyncio
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from react_agent.memory import acompact_history, conversation_id, trim_history
+from react_agent.prompts import HISTORY_SUMMARY_PREFIX
+from react_agent.tokens import message_tokens
+
+
+def test_trim_history_keeps_system_prompt_and_recent_turns() -> None:
+    system = {"role": "system", "content": "sistema"}
+    turns = [{"role": "user" if i % 2 == 0 else "assistant", "content": f"turno {i} " * 20} for i in range(10)]
+    budget = message_tokens(system) + sum(message_tokens(turn) for turn in turns[-3:])
+
+    trimmed = trim_history([system] + turns, budget)
+
+    assert trimmed == [system] + turns[-3:]
+
+
+def test_trim_history_keeps_latest_message_even_if_over_budget() -> None:
+    messages = [{"role": "user", "content": "x" * 1000}]
+    assert trim_history(messages, 1) == messages
+
+
+def test_conversation_id_is_scoped_by_user_and_topic() -> None:
+    assert conversation_id("u1", "decoradores") != conversation_id("u1", "generadores")
+    assert conversation_id("u1", "decoradores") != conversation_id("u2", "decoradores")
+
+
+def test_compact_history_summarizes_older_turns(monkeypatch) -> None:
+    from react_agent.configuration import Config
+
+    system = {"role": "system", "content": "sistema"}
+    turns = [{"role": "user" if i % 2 == 0 else "assistant", "content": f"turno {i} " * 20} for i in range(10)]
+    recent_budget = sum(message_tokens(turn) for turn in turns[-2:])
+    monkeypatch.setattr(Config, "CHAT_HISTORY_RECENT_TOKENS", recent_budget)
+    model = FakeListChatModel(responses=["resumen 1", "resumen 2"])
+
+    compacted = asyncio.run(acompact_history([system] + turns, recent_budget * 3, model))
+
+    assert compacted[0] == system
+    assert compacted[1] == {"role": "system", "content": HISTORY_SUMMARY_PREFIX + "resumen 1", "summary": True, "tokens": compacted[1]["tokens"]}
+    assert compacted[2:] == turns[-2:]
+
+    # El siguiente compactado integra el resumen previo en lugar de acumular resúmenes
+    longer = compacted + turns[:4]
+    recompacted = asyncio.run(acompact_history(longer, recent_budget * 3, model))
+    assert [m.get("summary", False) for m in recompacted].count(True) == 1
+    assert recompacted[1]["content"].endswith("resumen 2")
+
+
+def test_compact_history_keeps_short_histories_untouched() -> None:
+    messages = [{"role": "system", "content": "sistema"}, {"role": "user", "content": "hola"}]
+    assert asyncio.run(acompact_history(messages, 1000, FakeListChatModel(responses=[]))) == messages
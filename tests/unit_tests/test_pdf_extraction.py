@@ -0,0 +1,146 @@
+import concurrent.futures
+import time
+
+import pypdf
+
+from react_agent import pdf_extraction
+from react_agent.clients import registry
+from react_agent.configuration import Config
+from react_agent.pdf_extraction import (
+    PdfTextCache,
+    _extract_pages,
+    _extract_range,
+    extract_pages,
+)
+
+
+def _write_pdf(path, texts) -> None:
+    """PDF mínimo con una línea de texto por página."""
+    count = len(texts)
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [%s] /Count %d >>" % (" ".join(f"{4 + 2 * i} 0 R" for i in range(count)), count),
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, text in enumerate(texts):
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>"
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    body = b"%PDF-1.4\n"
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(body))
+        body += f"{number} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+    xref = len(body)
+    body += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    body += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    body += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    path.write_bytes(body)
+
+
+def test_pages_are_extracted_in_parallel_in_order_and_cached(tmp_path, monkeypatch) -> None:
+    pdf = tmp_path / "manual.pdf"
+    _write_pdf(pdf, [f"Pagina {i}" for i in range(5)])
+    monkeypatch.setattr(Config, "PDF_EXTRACT_WORKERS", 2)
+    monkeypatch.setattr(Config, "PDF_EXTRACT_PAGES_PER_TASK", 2)
+    monkeypatch.setattr(Config, "PDF_TEXT_CACHE_PATH", str(tmp_path / "pdf_text.sqlite3"))
+    try:
+        pages = list(extract_pages(str(pdf)))
+
+        assert [page.page_content for page in pages] == [f"Pagina {i}" for i in range(5)]
+        assert [page.metadata["page"] for page in pages] == list(range(5))
+
+        # La segunda vez el texto sale del caché, sin pasar por el pool
+        monkeypatch.setattr(pdf_extraction, "_extract_pages", None)
+        assert [page.page_content for page in extract_pages(str(pdf))] == [f"Pagina {i}" for i in range(5)]
+    finally:
+        registry.clear()
+
+
+def test_a_slow_page_times_out_without_losing_the_others(tmp_path, monkeypatch) -> None:
+    pdf = tmp_path / "manual.pdf"
+    _write_pdf(pdf, ["uno", "lenta", "tres"])
+    extract_text = pypdf.PageObject.extract_text
+
+    def slow_extract_text(self, *args, **kwargs):
+        text = extract_text(self, *args, **kwargs)
+        if "lenta" in text:
+            time.sleep(5)
+        return text
+
+    monkeypatch.setattr(pypdf.PageObject, "extract_text", slow_extract_text)
+    started = time.monotonic()
+
+    assert _extract_range(str(pdf), 0, 3, page_timeout=0.2) == ["uno", None, "tres"]
+    assert time.monotonic() - started < 2
+
+
+class _Process:
+    def __init__(self) -> None:
+        self.terminated = False
+
+    def terminate(self) -> None:
+        self.terminated = True
+
+
+class _FakePool:
+    """Pool en el proceso que se atasca en el rango que empieza en `stuck` y no termina los siguientes."""
+
+    def __init__(self, stuck: int = -1) -> None:
+        self.stuck = stuck
+        self.submitted = []
+        self._processes = {1: _Process()}
+
+    def submit(self, fn, path, *args):
+        future = concurrent.futures.Future()
+        if fn is pdf_extraction._page_count:
+            future.set_result(6)
+            return future
+        start, stop, _ = args
+        self.submitted.append(start)
+        future.set_running_or_notify_cancel()
+        if self.stuck < 0 or start < self.stuck:
+            future.set_result([f"p{number}" for number in range(start, stop)])
+        return future
+
+
+def test_a_stuck_range_kills_the_pool_and_resubmits_the_rest(monkeypatch) -> None:
+    stuck, fresh = _FakePool(stuck=2), _FakePool()
+    pools = [stuck, fresh]
+    monkeypatch.setattr(pdf_extraction, "get_extraction_pool", lambda: pools[0])
+    monkeypatch.setattr(pdf_extraction, "_restart_pool", lambda pool: pools.pop(0) and pools[0])
+    monkeypatch.setattr(pdf_extraction, "RANGE_TIMEOUT_MARGIN", 0.05)
+    monkeypatch.setattr(Config, "PDF_EXTRACT_WORKERS", 1)
+
+    texts = list(_extract_pages("manual.pdf", page_timeout=0.0, pages_per_task=2))
+
+    assert texts == ["p0", "p1", None, None, "p4", "p5"]
+    assert stuck.submitted == [0, 2, 4]
+    assert fresh.submitted == [4]
+
+
+def test_restarting_the_pool_terminates_its_processes(monkeypatch) -> None:
+    pool = _FakePool()
+    discarded = []
+    monkeypatch.setattr(registry, "discard", lambda name, client: discarded.append((name, client)))
+    monkeypatch.setattr(pdf_extraction, "get_extraction_pool", lambda: "nuevo")
+
+    assert pdf_extraction._restart_pool(pool) == "nuevo"
+    assert pool._processes[1].terminated
+    assert discarded == [("pdf_extraction_pool", pool)]
+
+
+def test_text_cache_keeps_the_most_recently_used_files() -> None:
+    cache = PdfTextCache(":memory:", max_files=2)
+    cache.put("a", ["a1", "a2"])
+    cache.put("b", ["b1"])
+    assert cache.get("a") == ["a1", "a2"]
+
+    cache.put("c", ["c1"])
+
+    assert cache.get("b") is None
+    assert cache.get("a") == ["a1", "a2"]
+    assert cache.get("c") == ["c1"]
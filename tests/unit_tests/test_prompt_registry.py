@@ -0,0 +1,75 @@
+from typing import Any, List, Optional
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from react_agent import prompt_registry as registry_module
+from react_agent.instrumentation import MetricsCallbackHandler
+from react_agent.prompt_registry import PromptRegistry
+from react_agent.prompts import PROMPTS, SplitPrompt
+
+prometheus_client = pytest.importorskip("prometheus_client")
+
+
+def _sample(name: str, **labels: str) -> float:
+    return prometheus_client.REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_static_parts_come_first_and_are_tokenized_once(monkeypatch) -> None:
+    counted: List[str] = []
+    monkeypatch.setattr(registry_module, "count_tokens", lambda text: counted.append(text) or len(text))
+    prompt = SplitPrompt("test_first", "Instrucciones fijas {sin formatear}", "Tema: {topic}")
+    registry = PromptRegistry([prompt])
+
+    assert registry.warm_up() == {"test_first": len(prompt.static)}
+    first = registry.render(prompt, topic="Decoradores")
+    second = registry.render(prompt, topic="Generadores")
+
+    assert [m.type for m in first] == ["system", "human"]
+    assert first[0] == second[0] and first[0].content == "Instrucciones fijas {sin formatear}"
+    assert [m.content for m in (first[1], second[1])] == ["Tema: Decoradores", "Tema: Generadores"]
+    assert counted.count(prompt.static) == 1
+
+
+def test_history_keeps_the_shared_prefix_before_the_new_turn() -> None:
+    prompt = SplitPrompt("test_history", "Fijo", "Pregunta: {question}")
+    history = [{"role": "system", "content": "Sistema"}, {"role": "user", "content": "Hola"}]
+
+    messages = PromptRegistry().render(prompt, history, question="¿Qué es?")
+
+    assert messages[0] == history[0] and messages[2] == history[1]
+    assert messages[1].content == "Fijo"
+    assert messages[-1].content == "Pregunta: ¿Qué es?"
+
+
+def test_prompt_names_are_unique() -> None:
+    assert len({prompt.name for prompt in PROMPTS}) == len(PROMPTS)
+    with pytest.raises(ValueError):
+        PromptRegistry([SplitPrompt("a", "x", ""), SplitPrompt("a", "y", "")])
+
+
+class _CachingModel(FakeListChatModel):
+    """Informa como servidos del caché los tokens del mensaje de sistema a partir de la segunda llamada."""
+
+    calls: int = 0
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        cached = 100 if self.calls else 0
+        self.calls += 1
+        usage = {"prompt_tokens": 150, "completion_tokens": 5, "prompt_tokens_details": {"cached_tokens": cached}}
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="ok"))], llm_output={"token_usage": usage})
+
+
+def test_provider_and_cached_tokens_are_reported_per_template() -> None:
+    prompt = SplitPrompt("test_metrics", "Instrucciones", "{value}")
+    model = _CachingModel(responses=["ok"], callbacks=[MetricsCallbackHandler()])
+    registry = PromptRegistry([prompt])
+
+    for value in ("a", "b"):
+        model.invoke(registry.render(prompt, value=value))
+
+    assert _sample("prompt_tokens_total", template="test_metrics", part="sent") == 300
+    assert _sample("prompt_tokens_total", template="test_metrics", part="cached") == 100
+    assert _sample("prompt_tokens_total", template="test_metrics", part="static") > 0
@@ -0,0 +1,102 @@
+import asyncio
+from types import SimpleNamespace
+from typing import Any, List, Optional
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatResult
+
+from react_agent.rate_limiter import (
+    RateLimitedChatModel,
+    SharedTokenBuckets,
+    priority_of,
+)
+
+
+class _RateLimitError(Exception):
+    status_code = 429
+
+    def __init__(self) -> None:
+        super().__init__("Too Many Requests")
+        self.response = SimpleNamespace(status_code=429, headers={"retry-after-ms": "50"})
+
+
+def test_buckets_are_shared_between_instances_on_the_same_file(tmp_path) -> None:
+    path = str(tmp_path / "limit.bin")
+    worker_a = SharedTokenBuckets(path, requests_per_minute=2, tokens_per_minute=0)
+    worker_b = SharedTokenBuckets(path, requests_per_minute=2, tokens_per_minute=0)
+
+    assert worker_a.try_acquire(10, "interactive") == 0
+    assert worker_b.try_acquire(10, "interactive") == 0
+    # El bucket compartido está vacío: hay que esperar ~30 s a la siguiente petición
+    assert worker_a.try_acquire(10, "interactive") == pytest.approx(30, abs=1)
+
+
+def test_lower_priorities_leave_a_reserve_for_interactive_calls(tmp_path) -> None:
+    buckets = SharedTokenBuckets(str(tmp_path / "limit.bin"), requests_per_minute=0, tokens_per_minute=1000)
+
+    assert buckets.try_acquire(600, "batch") == 0
+    # Quedan 400 tokens, pero el 30 % está reservado para las clases superiores
+    assert buckets.try_acquire(200, "batch") > 0
+    assert buckets.try_acquire(200, "standard") == 0
+    assert buckets.try_acquire(200, "interactive") == 0
+
+
+def test_actual_usage_corrects_the_estimate(tmp_path) -> None:
+    buckets = SharedTokenBuckets(str(tmp_path / "limit.bin"), requests_per_minute=0, tokens_per_minute=1000)
+
+    assert buckets.try_acquire(900, "interactive") == 0
+    assert buckets.try_acquire(500, "interactive") > 0
+    # La llamada usó 400 tokens menos de los reservados
+    buckets.adjust(-400)
+    assert buckets.try_acquire(500, "interactive") == 0
+
+
+def test_pause_stops_every_worker(tmp_path) -> None:
+    path = str(tmp_path / "limit.bin")
+    worker_a = SharedTokenBuckets(path, requests_per_minute=0, tokens_per_minute=0)
+    worker_b = SharedTokenBuckets(path, requests_per_minute=0, tokens_per_minute=0)
+
+    worker_a.pause(5)
+
+    assert worker_b.try_acquire(1, "interactive") == pytest.approx(5, abs=0.5)
+
+
+def test_agents_map_to_priority_classes() -> None:
+    assert priority_of("topics_agent") == "interactive"
+    assert priority_of("feedback_agent") == "standard"
+    assert priority_of("content_agent") == "batch"
+    assert priority_of("") == "standard"
+
+
+def test_model_retries_rate_limited_calls_after_retry_after(tmp_path) -> None:
+    buckets = SharedTokenBuckets(str(tmp_path / "limit.bin"), requests_per_minute=0, tokens_per_minute=0)
+
+    class _Flaky(FakeListChatModel):
+        failures: List[int] = []
+
+        async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+            if self.failures:
+                self.failures.pop()
+                raise _RateLimitError()
+            return self._generate(messages, stop, run_manager, **kwargs)
+
+    class _LimitedFlaky(RateLimitedChatModel, _Flaky):
+        def _rate_limiter(self) -> SharedTokenBuckets:
+            return buckets
+
+    model = _LimitedFlaky(responses=["hola"], failures=[1])
+
+    response = asyncio.run(model.ainvoke("hi"))
+
+    assert response.content == "hola"
+    assert model.failures == []
+
+
+def test_models_must_declare_their_buckets() -> None:
+    class _Unlimited(RateLimitedChatModel, FakeListChatModel):
+        pass
+
+    with pytest.raises(TypeError):
+        _Unlimited(responses=["hola"])
@@ -0,0 +1,27 @@
+import asyncio
+
+from react_agent.response_cache import InMemoryCache, response_cache_key
+
+
+def test_in_memory_cache_lru_and_ttl() -> None:
+    async def scenario():
+        cache = InMemoryCache(max_entries=2, ttl=60)
+        await cache.set("a", "1")
+        await cache.set("b", "2")
+        assert await cache.get("a") == "1"
+        await cache.set("c", "3")
+        assert await cache.get("b") is None
+        assert await cache.get("a") == "1"
+
+        expired = InMemoryCache(max_entries=2, ttl=-1)
+        await expired.set("a", "1")
+        assert await expired.get("a") is None
+
+    asyncio.run(scenario())
+
+
+def test_response_cache_key_depends_on_every_part() -> None:
+    key = response_cache_key("initialize", "topic", "contenido")
+    assert key.startswith("initialize:")
+    assert key == response_cache_key("initialize", "topic", "contenido")
+    assert key != response_cache_key("initialize", "topic", "otro contenido")
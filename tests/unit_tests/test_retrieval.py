@@ -0,0 +1,42 @@
+from langchain.schema import Document
+
+from react_agent.retrieval import dedupe_chunks, document_filter, pack_context, rerank
+from react_agent.tokens import count_tokens
+
+
+def _doc(text: str, index: int) -> Document:
+    return Document(page_content=text, metadata={"document_id": "d", "page_number": index + 1})
+
+
+def test_rerank_promotes_lexical_matches() -> None:
+    candidates = [
+        (_doc("Los generadores producen valores bajo demanda.", 0), 0.9),
+        (_doc("Un decorador envuelve una función y modifica su comportamiento.", 1), 0.8),
+    ]
+    ranked = rerank("¿Qué hace un decorador en una función?", candidates)
+    assert ranked[0].page_content.startswith("Un decorador")
+
+
+def test_dedupe_removes_splitter_overlap_and_duplicates() -> None:
+    overlap = "texto que el splitter repite entre fragmentos contiguos. "
+    first = _doc("Inicio del primer fragmento. " + overlap, 0)
+    second = _doc(overlap + "Continuación del segundo fragmento.", 1)
+
+    kept = dedupe_chunks([first, second, first])
+
+    assert len(kept) == 2
+    assert kept[1].page_content == "Continuación del segundo fragmento."
+
+
+def test_pack_context_respects_budget_and_document_order() -> None:
+    docs = [_doc(f"fragmento {i} " * 40, i) for i in (3, 1, 2)]
+    budget = count_tokens(docs[0].page_content) * 2
+
+    packed = pack_context(docs, budget)
+
+    assert [d.metadata["page_number"] for d in packed] == [2, 4]
+
+
+def test_document_filter_escapes_quotes() -> None:
+    assert document_filter(None) is None
+    assert document_filter("a'b") == "metadata/document_id eq 'a''b'"
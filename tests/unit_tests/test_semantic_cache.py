@@ -0,0 +1,140 @@
+import asyncio
+import sqlite3
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+from react_agent import graph, semantic_cache
+from react_agent.semantic_cache import (
+    SemanticAnswerCache,
+    SemanticLookup,
+    asemantic_lookup,
+    conversation_context,
+)
+
+
+def _cache(**kwargs) -> SemanticAnswerCache:
+    options = {"threshold": 0.9, "ttl": 3600, "max_per_topic": 10, **kwargs}
+    return SemanticAnswerCache(":memory:", **options)
+
+
+def test_similar_question_on_same_topic_hits() -> None:
+    cache = _cache()
+    cache.store("Decoradores", "doc-1", "v1", "¿Qué es un decorador?", [1.0, 0.0, 0.1], "Un decorador es...", 2.5)
+
+    assert cache.lookup(" decoradores ", "doc-1", "v1", [0.95, 0.0, 0.12])[:2] == ("Un decorador es...", 2.5)
+    # Otra pregunta, otro tema, otro documento u otra versión de los prompts no aciertan
+    assert cache.lookup("Decoradores", "doc-1", "v1", [0.0, 1.0, 0.0]) is None
+    assert cache.lookup("Generadores", "doc-1", "v1", [1.0, 0.0, 0.1]) is None
+    assert cache.lookup("Decoradores", "doc-2", "v1", [1.0, 0.0, 0.1]) is None
+    assert cache.lookup("Decoradores", "doc-1", "v2", [1.0, 0.0, 0.1]) is None
+
+
+def test_reindexing_a_document_invalidates_its_answers() -> None:
+    cache = _cache()
+    cache.store("Decoradores", "doc-1", "v1", "q", [1.0, 0.0], "a", 1.0)
+    cache.store("Generadores", "doc-1", "v1", "q", [1.0, 0.0], "b", 1.0)
+    cache.store("Decoradores", "doc-2", "v1", "q", [1.0, 0.0], "c", 1.0)
+
+    assert cache.invalidate("doc-1", topic="Generadores") == 1
+    assert cache.lookup("Decoradores", "doc-1", "v1", [1.0, 0.0]) is not None
+    assert cache.invalidate("doc-1") == 1
+    assert cache.lookup("Decoradores", "doc-1", "v1", [1.0, 0.0]) is None
+    assert cache.lookup("Decoradores", "doc-2", "v1", [1.0, 0.0]) is not None
+
+
+def test_expired_and_trimmed_entries_are_not_served() -> None:
+    expired = _cache(ttl=-1)
+    expired.store("t", "d", "v", "q", [1.0, 0.0], "a", 1.0)
+    assert expired.lookup("t", "d", "v", [1.0, 0.0]) is None
+
+    small = _cache(max_per_topic=1)
+    small.store("t", "d", "v", "q1", [1.0, 0.0], "old", 1.0)
+    small.store("t", "d", "v", "q2", [0.0, 1.0], "new", 1.0)
+    assert small.lookup("t", "d", "v", [1.0, 0.0]) is None
+    assert small.lookup("t", "d", "v", [0.0, 1.0])[0] == "new"
+
+
+class _KeywordEmbeddings(Embeddings):
+    def _vector(self, text: str) -> List[float]:
+        return [1.0 if "decorador" in text.lower() else 0.0, 1.0 if "generador" in text.lower() else 0.0, 0.1]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._vector(text)
+
+
+def test_lookup_stores_answers_and_serves_paraphrases(monkeypatch) -> None:
+    cache = _cache()
+    monkeypatch.setattr(semantic_cache, "get_semantic_cache", lambda: cache)
+    monkeypatch.setattr(semantic_cache, "get_embeddings", lambda: _KeywordEmbeddings())
+
+    async def run():
+        first = await asemantic_lookup("Python", "doc", "¿Qué es un decorador?")
+        await first.store("Un decorador envuelve una función.")
+        second = await asemantic_lookup("Python", "doc", "Explícame los decoradores")
+        third = await asemantic_lookup("Python", "doc", "¿Qué es un generador?")
+        return first, second, third
+
+    first, second, third = asyncio.run(run())
+
+    assert first.answer is None
+    assert second.answer == "Un decorador envuelve una función."
+    assert third.answer is None
+
+
+def test_follow_ups_only_match_after_the_same_assistant_turn() -> None:
+    cache = _cache()
+    intro = [{"role": "system", "content": "s"}, {"role": "assistant", "content": "Introducción a decoradores"}]
+    other = intro + [{"role": "user", "content": "q"}, {"role": "assistant", "content": "Respuesta para otro alumno"}]
+    cache.store("Decoradores", "doc-1", "v1", "¿puedes darme un ejemplo?", [1.0, 0.0], "Ejemplo A", 1.0, conversation_context(other))
+
+    assert conversation_context([{"role": "system", "content": "s"}]) == ""
+    assert cache.lookup("Decoradores", "doc-1", "v1", [1.0, 0.0], conversation_context(intro)) is None
+    assert cache.lookup("Decoradores", "doc-1", "v1", [1.0, 0.0], conversation_context(other))[0] == "Ejemplo A"
+
+
+def test_caches_created_before_the_context_column_are_migrated(tmp_path) -> None:
+    path = str(tmp_path / "semantic.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE answers (id INTEGER PRIMARY KEY AUTOINCREMENT, topic TEXT NOT NULL, document_id TEXT NOT NULL, "
+        "version TEXT NOT NULL, question TEXT NOT NULL, vector BLOB NOT NULL, answer TEXT NOT NULL, "
+        "latency REAL NOT NULL, created_at REAL NOT NULL)"
+    )
+    conn.close()
+
+    cache = SemanticAnswerCache(path, threshold=0.9, ttl=3600, max_per_topic=10)
+    cache.store("t", "d", "v", "q", [1.0, 0.0], "a", 1.0, "ctx")
+
+    assert cache.lookup("t", "d", "v", [1.0, 0.0], "ctx")[0] == "a"
+
+
+def test_cache_hits_still_compact_the_history(monkeypatch) -> None:
+    lookups = []
+    compacted = []
+
+    async def fake_lookup(topic, document_id, question, context):
+        lookups.append(context)
+        lookup = SemanticLookup(topic, document_id, question, context)
+        lookup.answer = "Respuesta cacheada"
+        return lookup
+
+    async def fake_compact(messages, max_tokens, model):
+        compacted.append(list(messages))
+        return messages[-2:]
+
+    monkeypatch.setattr(graph, "load_model", lambda: None)
+    monkeypatch.setattr(graph, "asemantic_lookup", fake_lookup)
+    monkeypatch.setattr(graph, "acompact_history", fake_compact)
+    history = [{"role": "system", "content": "s"}, {"role": "assistant", "content": "Introducción"}]
+    state = {"topic": "Python", "question": "¿Un ejemplo?", "id_user": "u", "document_id": "doc", "messages": history}
+
+    result = asyncio.run(graph.chatbot(state))
+
+    assert lookups == [conversation_context(history)]
+    assert compacted[0][-1] == {"role": "assistant", "content": "Respuesta cacheada"}
+    assert result["messages"] == compacted[0][-2:]
+    assert result["response"] == "Respuesta cacheada"
@@ -0,0 +1,80 @@
+import asyncio
+import json
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import AIMessageChunk
+from langgraph.constants import TAG_NOSTREAM
+
+from react_agent.streaming import stream_agent
+
+
+class _FakeGraph:
+    """Grafo compilado que emite una lista fija de eventos y, opcionalmente, falla al final."""
+
+    name = "fake_agent"
+
+    def __init__(self, events: List[Dict[str, Any]], error: Optional[Exception] = None) -> None:
+        self.events = events
+        self.error = error
+
+    async def astream_events(self, state: Dict[str, Any], config: Any, version: str):
+        for event in self.events:
+            yield event
+        if self.error is not None:
+            raise self.error
+
+
+def _token(content: str, tags: Optional[List[str]] = None) -> Dict[str, Any]:
+    return {
+        "event": "on_chat_model_stream",
+        "tags": tags or [],
+        "metadata": {"langgraph_node": "chatbot"},
+        "data": {"chunk": AIMessageChunk(content=content)},
+    }
+
+
+def _collect(graph: _FakeGraph) -> List[tuple]:
+    async def run() -> List[str]:
+        return [chunk async for chunk in stream_agent(graph, {}, lambda state: {"response": state["response"]})]
+
+    events = []
+    for chunk in asyncio.run(run()):
+        event, data = chunk.strip().split("\n")
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+def test_tokens_are_streamed_and_internal_calls_filtered() -> None:
+    graph = _FakeGraph([
+        _token("Hola"),
+        _token("resumen interno", tags=[TAG_NOSTREAM]),
+        _token(""),
+        _token(" mundo"),
+    ])
+
+    assert _collect(graph) == [
+        ("token", {"content": "Hola", "node": "chatbot"}),
+        ("token", {"content": " mundo", "node": "chatbot"}),
+    ]
+
+
+def test_single_end_event_from_the_root_chain() -> None:
+    graph = _FakeGraph([
+        _token("Hola"),
+        {"event": "on_chain_end", "parent_ids": ["root"], "data": {"output": {"response": "parcial"}}},
+        {"event": "on_chain_end", "parent_ids": [], "data": {"output": {"response": "Hola", "messages": []}}},
+    ])
+
+    events = _collect(graph)
+
+    assert [event for event, _ in events] == ["token", "end"]
+    assert events[-1] == ("end", {"response": "Hola"})
+
+
+def test_graph_errors_become_an_error_event() -> None:
+    graph = _FakeGraph([_token("Ho")], error=RuntimeError("fallo del modelo"))
+
+    assert _collect(graph) == [
+        ("token", {"content": "Ho", "node": "chatbot"}),
+        ("error", {"detail": "fallo del modelo"}),
+    ]
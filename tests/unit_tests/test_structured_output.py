@@ -0,0 +1,48 @@
+import json
+
+import pytest
+from pydantic import ValidationError
+
+from react_agent.schemas import QuestionSet, TrainingTopics
+from react_agent.structured_output import (
+    parse_partial_json,
+    parse_structured,
+    repair_json,
+)
+
+QUESTIONS = {
+    "id": "q1",
+    "TrainingID": "t1",
+    "TopicID": "p1",
+    "Questions": [
+        {"QuestionID": i, "Question": f"Pregunta {i}", "Options": ["a", "b", "c", "d"], "CorrectAnswer": 0}
+        for i in range(1, 4)
+    ],
+}
+
+
+def test_repair_json_strips_code_fences_trailing_text_and_commas() -> None:
+    text = 'Aquí tienes:\n```json\n{"topics": [{"topicName": "A",},],}\n```\nEspero que sirva.'
+    assert json.loads(repair_json(text)) == {"topics": [{"topicName": "A"}]}
+
+
+def test_parse_partial_json_handles_any_prefix() -> None:
+    text = json.dumps(QUESTIONS)
+    for end in range(1, len(text)):
+        assert isinstance(parse_partial_json(text[:end]), dict)
+    assert parse_partial_json('{"a": [1, 2], "b": "ho') == {"a": [1, 2], "b": "ho"}
+    assert parse_partial_json('{"a": [1, 2], "b') == {"a": [1, 2]}
+
+
+def test_parse_structured_drops_truncated_tail_item() -> None:
+    text = json.dumps(QUESTIONS)
+    truncated = text[: text.rindex('"Options"') + 20]
+
+    questions = parse_structured(truncated, QuestionSet)
+
+    assert [q.QuestionID for q in questions.Questions] == [1, 2]
+
+
+def test_parse_structured_rejects_invalid_complete_output() -> None:
+    with pytest.raises(ValidationError):
+        parse_structured('{"trainingName": "x", "description": "y", "topics": []}', TrainingTopics)
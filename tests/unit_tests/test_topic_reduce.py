@@ -0,0 +1,113 @@
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from react_agent.topic_reduce import (
+    areduce_topics,
+    cluster_topics,
+    group_by_tokens,
+    split_topics,
+    topics_tokens,
+)
+
+
+class _StemEmbeddings(Embeddings):
+    """Temas con la misma primera palabra tienen el mismo vector y los demás son ortogonales."""
+
+    def __init__(self) -> None:
+        # Cada raíz nueva ocupa la siguiente dimensión, así que dos raíces distintas nunca coinciden
+        self.stems: Dict[str, int] = {}
+
+    def _vector(self, text: str) -> List[float]:
+        index = self.stems.setdefault(text.lower().split()[0][:6], len(self.stems))
+        return [float(index == i) for i in range(97)]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._vector(text)
+
+
+class _MergingModel(FakeListChatModel):
+    """Fusiona cada grupo quedándose con la mitad de sus temas."""
+
+    prompts: List[str] = []
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        prompt = str(messages[-1].content)
+        self.prompts.append(prompt)
+        lines = [line for line in prompt.splitlines() if line.startswith("Tema")]
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="\n".join(lines[::2])))])
+
+
+def test_split_topics_strips_bullets_and_intros() -> None:
+    outputs = [
+        "Los temas principales son:\n1. **Decoradores**\n2. Generadores.\n",
+        "- decoradores\n* Context managers\n",
+    ]
+
+    assert split_topics(outputs) == ["Decoradores", "Generadores", "Context managers"]
+
+
+def test_similar_topics_collapse_into_the_first_one() -> None:
+    topics = ["Decoradores en Python", "Generadores", "Decoradores con argumentos"]
+    vectors = _StemEmbeddings().embed_documents(topics)
+
+    assert cluster_topics(topics, vectors, threshold=0.9) == ["Decoradores en Python", "Generadores"]
+
+
+def test_groups_respect_the_token_budget() -> None:
+    groups = group_by_tokens([f"Tema {i:03d}" for i in range(40)], max_tokens=20)
+
+    assert sum(len(group) for group in groups) == 40
+    assert all(topics_tokens(group) <= 20 for group in groups)
+
+
+def test_large_lists_are_merged_level_by_level_until_they_fit() -> None:
+    outputs = [f"- Tema {i:03d}" for i in range(64)]
+    model = _MergingModel(responses=[""], prompts=[])
+
+    topics = asyncio.run(
+        areduce_topics(
+            outputs,
+            model,
+            None,
+            threshold=0.9,
+            group_tokens=40,
+            max_tokens=60,
+            max_levels=5,
+            max_concurrency=4,
+            max_retries=0,
+        )
+    )
+
+    assert topics_tokens(topics) <= 60
+    assert topics[0] == "Tema 000"
+    # Ninguna fusión recibe más temas de los que caben en un grupo
+    assert all(topics_tokens([line for line in prompt.splitlines() if line.startswith("Tema")]) <= 40 for prompt in model.prompts)
+
+
+def test_small_lists_skip_the_model() -> None:
+    model = _MergingModel(responses=[""], prompts=[])
+
+    topics = asyncio.run(
+        areduce_topics(
+            ["- Decoradores\n- Generadores", "- Decoradores con argumentos"],
+            model,
+            _StemEmbeddings(),
+            threshold=0.9,
+            group_tokens=40,
+            max_tokens=1000,
+            max_levels=3,
+            max_concurrency=4,
+            max_retries=0,
+        )
+    )
+
+    assert topics == ["Decoradores", "Generadores"]
+    assert model.prompts == []
@@ -0,0 +1,190 @@
+import asyncio
+from types import SimpleNamespace
+from typing import Any, List, Optional
+
+from langchain_core.documents import Document
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from react_agent import graph, utils
+from react_agent.configuration import Config
+from react_agent.rate_limiter import RateLimitedChatModel, SharedTokenBuckets
+
+
+class _SearchStore:
+    def __init__(self, documents: List[Document]) -> None:
+        self.documents = documents
+        self.filters: List[str] = []
+
+    async def asearch(self, query: str, search_type: str, filter: str) -> List[Document]:
+        self.filters.append(filter)
+        return self.documents
+
+
+class _TopicsModel(FakeListChatModel):
+    """Devuelve como tema el contenido del fragmento y falla con los que contienen "roto"."""
+
+    calls: List[List[BaseMessage]] = []
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        self.calls.append(messages)
+        content = str(messages[-1].content)
+        if "roto" in content:
+            raise ValueError("fragmento roto")
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=f"- {content}"))])
+
+
+def test_agenerate_topics_extracts_topics_per_chunk_in_order(monkeypatch) -> None:
+    store = _SearchStore([Document(page_content=text) for text in ("Decoradores", "roto", "Generadores")])
+    model = _TopicsModel(responses=[""], calls=[])
+    monkeypatch.setattr(utils, "load_text_embedding_model", lambda: None)
+    monkeypatch.setattr(utils, "load_vector_store", lambda embeddings=None: store)
+    monkeypatch.setattr(utils, "load_model", lambda: model)
+
+    topics = asyncio.run(utils.agenerate_topics("doc-1"))
+
+    # El fragmento que falla se descarta sin afectar al orden de los demás
+    assert topics == ["- Decoradores", "- Generadores"]
+    assert store.filters == ["metadata/document_id eq 'doc-1'"]
+    assert len(model.calls) == 3
+    assert all(messages[0].type == "system" for messages in model.calls)
+
+
+def test_agenerate_topics_without_chunks_skips_the_model(monkeypatch) -> None:
+    model = _TopicsModel(responses=[""], calls=[])
+    monkeypatch.setattr(utils, "load_text_embedding_model", lambda: None)
+    monkeypatch.setattr(utils, "load_vector_store", lambda embeddings=None: _SearchStore([]))
+    monkeypatch.setattr(utils, "load_model", lambda: model)
+
+    assert asyncio.run(utils.agenerate_topics("doc-1")) == []
+    assert model.calls == []
+
+
+class _RateLimitError(Exception):
+    def __init__(self) -> None:
+        super().__init__("Too Many Requests")
+        self.response = SimpleNamespace(status_code=429, headers={"retry-after-ms": "10"})
+
+
+def test_throttled_topic_calls_are_retried_only_by_the_model(tmp_path, monkeypatch) -> None:
+    buckets = SharedTokenBuckets(str(tmp_path / "limit.bin"), requests_per_minute=0, tokens_per_minute=0)
+    retries: List[int] = []
+
+    class _Throttled(FakeListChatModel):
+        attempts: int = 0
+
+        async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+            self.attempts += 1
+            raise _RateLimitError()
+
+    class _LimitedThrottled(RateLimitedChatModel, _Throttled):
+        def _rate_limiter(self) -> SharedTokenBuckets:
+            return buckets
+
+    model = _LimitedThrottled(responses=[""])
+    monkeypatch.setattr(Config, "LLM_MAX_RETRIES", 2)
+    monkeypatch.setattr("react_agent.rate_limiter.record_retry", lambda: retries.append(1))
+    monkeypatch.setattr("react_agent.concurrency.record_retry", lambda: retries.append(1))
+    monkeypatch.setattr(utils, "load_text_embedding_model", lambda: None)
+    monkeypatch.setattr(utils, "load_vector_store", lambda embeddings=None: _SearchStore([Document(page_content="Decoradores")]))
+    monkeypatch.setattr(utils, "load_model", lambda: model)
+
+    assert asyncio.run(utils.agenerate_topics("doc-1")) == []
+    # Un intento más los reintentos del modelo, sin que gather_bounded los multiplique
+    assert model.attempts == 3
+    assert len(retries) == 2
+
+
+class _FakeContainer:
+    id = "questions"
+
+    def __init__(self, fail_batches: bool = False, broken: tuple = ()) -> None:
+        self.fail_batches = fail_batches
+        self.broken = broken
+        self.batches: List[tuple] = []
+        self.created: List[str] = []
+
+    async def read(self) -> dict:
+        return {"partitionKey": {"paths": ["/TrainingID"]}}
+
+    async def execute_item_batch(self, operations: list, partition_key: Any) -> list:
+        self.batches.append((partition_key, len(operations)))
+        if self.fail_batches:
+            raise RuntimeError("batch rechazado")
+        return operations
+
+    async def create_item(self, item: dict) -> dict:
+        if item["id"] in self.broken:
+            raise RuntimeError("documento inválido")
+        self.created.append(item["id"])
+        return item
+
+
+def _use_container(monkeypatch, container: _FakeContainer) -> None:
+    monkeypatch.setattr(Config, "COSMOS_PARTITION_KEY_PATH", "")
+    monkeypatch.setattr(utils, "_partition_key_paths", {})
+    monkeypatch.setattr(utils, "get_async_cosmos_container", lambda: container)
+
+
+def _question_set(index: int, training_id: Optional[str]) -> dict:
+    item = {"id": f"q-{index}", "TopicID": f"topic-{index}", "Questions": []}
+    if training_id is not None:
+        item["TrainingID"] = training_id
+    return item
+
+
+def test_questions_are_saved_in_batches_of_100_per_partition(monkeypatch) -> None:
+    container = _FakeContainer()
+    _use_container(monkeypatch, container)
+    items = [_question_set(i, "t1" if i % 3 else "t2") for i in range(240)]
+
+    statuses = asyncio.run(utils.asave_questions_batch(items))
+
+    assert [status["status"] for status in statuses] == ["saved"] * 240
+    assert sorted(container.batches) == [("t1", 60), ("t1", 100), ("t2", 80)]
+    assert container.created == []
+
+
+def test_failed_batches_fall_back_to_one_by_one(monkeypatch) -> None:
+    container = _FakeContainer(fail_batches=True, broken=("q-1",))
+    _use_container(monkeypatch, container)
+
+    statuses = asyncio.run(utils.asave_questions_batch([_question_set(i, "t1") for i in range(3)]))
+
+    assert [status["status"] for status in statuses] == ["saved", "error", "saved"]
+    assert statuses[1]["error"] == "documento inválido"
+    assert container.created == ["q-0", "q-2"]
+
+
+def test_questions_without_partition_key_are_rejected_before_sending(monkeypatch) -> None:
+    container = _FakeContainer()
+    _use_container(monkeypatch, container)
+
+    statuses = asyncio.run(utils.asave_questions_batch([_question_set(0, "t1"), _question_set(1, None)]))
+
+    assert [status["status"] for status in statuses] == ["saved", "error"]
+    assert "TrainingID" in statuses[1]["error"]
+    assert container.batches == [("t1", 1)]
+
+
+def test_bulk_agent_skips_topics_whose_generation_failed(monkeypatch) -> None:
+    container = _FakeContainer()
+    _use_container(monkeypatch, container)
+
+    async def fake_generate(item: dict, model: Any) -> dict:
+        if item["topic_id"] == "roto":
+            raise ValueError("salida inválida")
+        return _question_set(int(item["text"]), item["training_id"])
+
+    monkeypatch.setattr(graph, "load_model", lambda: None)
+    monkeypatch.setattr(graph, "agenerate_questions_or_raise", fake_generate)
+    items = [{"text": str(i), "training_id": "t1", "topic_id": topic} for i, topic in enumerate(["a", "roto", "b"])]
+
+    state = asyncio.run(graph.workflow_bulk_questions.compile().ainvoke({"items": items, "questions": [], "results": [], "status": "start"}))
+
+    assert state["questions"][1] is None
+    assert [result["status"] for result in state["results"]] == ["saved", "error", "saved"]
+    assert "salida inválida" in state["results"][1]["error"]
+    assert state["status"] == "partial"
+    assert container.batches == [("t1", 2)]